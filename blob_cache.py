@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class BlobLRUCache:
+    def __init__(self, max_bytes):
+        """
+        Size-bounded LRU of blob contents.
+
+        Entries are stored per blob path together with the generation they
+        were downloaded at, so a lookup only hits when the caller presents
+        the generation currently reported by the backend.
+
+        :param max_bytes: Total payload budget. Least recently used blobs are
+                          evicted once it is exceeded.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # blob_name -> (generation, bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, blob_name, generation):
+        """
+        Returns the cached bytes for this exact generation, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(blob_name)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            cached_generation, data = entry
+            if cached_generation != generation:
+                # Object changed behind our back (another writer); drop it
+                self._drop(blob_name)
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(blob_name)
+            self.hits += 1
+            return data
+
+    def put(self, blob_name, generation, data):
+        if generation is None or data is None or len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            if blob_name in self._entries:
+                self._drop(blob_name)
+            self._entries[blob_name] = (generation, data)
+            self._size += len(data)
+
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, blob_name):
+        with self._lock:
+            if blob_name in self._entries:
+                self._drop(blob_name)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _drop(self, blob_name):
+        # Caller must hold the lock
+        _, data = self._entries.pop(blob_name)
+        self._size -= len(data)
+
+
+_BLOB_CACHE = None
+_BLOB_CACHE_LOCK = threading.Lock()
+
+
+def get_blob_cache():
+    """
+    Returns the process-wide blob cache, or None when disabled.
+    Size is set with STORAGE_CACHE_MB (default 64, 0 disables caching).
+    """
+    global _BLOB_CACHE
+    max_mb = float(os.getenv("STORAGE_CACHE_MB", "64"))
+    if max_mb <= 0:
+        return None
+
+    with _BLOB_CACHE_LOCK:
+        if _BLOB_CACHE is None:
+            _BLOB_CACHE = BlobLRUCache(max_bytes=int(max_mb * 1024 * 1024))
+        return _BLOB_CACHE
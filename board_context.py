@@ -0,0 +1,178 @@
+import os
+import json
+import asyncio
+import hashlib
+import context_cache
+import lab_engine
+
+# Per-run patient context for the dashboard builders.
+# A board build used to download and parse parsed_raw_data.json and
+# pre_consultation_chat.json once per builder and re-read
+# board_items/encounters.json in every encounter-based track. A
+# PatientRunContext loads the records once, keeps the parsed objects and their
+# prompt serialisations, and holds the parsed encounters board in memory as
+# soon as process_encounter_board produces it.
+#
+# Structured labs (labs.json, generated patients only) are loaded alongside and
+# feed lab_engine when every lab document on file came from them, i.e. is
+# indexed in the generation manifest raw_data.json.
+#
+# input_hash() digests one kind of input (a document type, all records, the
+# chat or the structured labs) so board items can be fingerprinted by exactly
+# what they read.
+
+
+class PatientRunContext:
+    def __init__(self, gcs, patient_id, raw_objects, pre_consultation_chat, structured_labs=None, generated_labs=()):
+        """
+        Use PatientRunContext.load() rather than constructing one directly.
+
+        :param gcs: bucket_ops.AsyncBucketManager
+        :param generated_labs: Lab report .txt names raw_data.json lists as
+                               generated from structured_labs.
+        """
+        self.gcs = gcs
+        self.patient_id = patient_id
+        self.base_path = f"patient_data/{patient_id}"
+        self.raw_objects = raw_objects
+        self.pre_consultation_chat = pre_consultation_chat
+        self.structured_labs = structured_labs
+        self.generated_labs = set(generated_labs)
+        self.shared_context = None
+        # board_item -> object written to board_items/<item>.json during this run
+        self.board_items = {}
+        # Optional callback(item, value) fired as each board item is saved
+        self.on_item = None
+
+        self._context_text = None
+        self._input_hashes = {}
+        self._lab_frame = None
+        self._encounters = None
+        self._encounters_text = None
+        self._encounters_lock = asyncio.Lock()
+
+    @classmethod
+    async def load(cls, gcs, patient_id):
+        # The blobs are independent, so fetch them concurrently
+        raw_data, pre_consultation_chat, labs, manifest = await asyncio.gather(
+            gcs.read_file_as_string(f"patient_data/{patient_id}/parsed_raw_data.json"),
+            gcs.read_file_as_string(f"patient_data/{patient_id}/pre_consultation_chat.json"),
+            gcs.read_file_as_string(f"patient_data/{patient_id}/labs.json"),
+            gcs.read_file_as_string(f"patient_data/{patient_id}/raw_data.json")
+        )
+        structured_labs = None
+        generated_labs = ()
+        if labs:
+            try:
+                structured_labs = json.loads(labs)
+                generated_labs = [entry.get("file") for entry in json.loads(manifest or "{}").get("lab_reports", [])]
+            except (json.JSONDecodeError, AttributeError):
+                print(f"Ignoring unreadable labs.json or raw_data.json for {patient_id}")
+        return cls(gcs, patient_id, json.loads(raw_data), json.loads(pre_consultation_chat), structured_labs, generated_labs)
+
+    @property
+    def payload(self):
+        return {
+            "raw_objects": self.raw_objects,
+            "pre_consultation_chat": self.pre_consultation_chat
+        }
+
+    @property
+    def context_text(self):
+        """
+        The patient records as the prompt prefix shared by the builders.
+        """
+        if self._context_text is None:
+            self._context_text = (
+                f"### PATIENT RECORDS ###\n"
+                f"{json.dumps(self.payload, indent=2)}\n\n"
+            )
+        return self._context_text
+
+    def open_shared_context(self, client, model, mode=None):
+        """
+        Creates the context_cache.SharedContext for this run (once).
+        """
+        if self.shared_context is None:
+            self.shared_context = context_cache.SharedContext(
+                client, model, self.context_text,
+                display_name=f"dashboard-{self.patient_id}",
+                mode=mode
+            )
+        return self.shared_context
+
+    def documents(self, doc_type):
+        """
+        Parsed raw_data documents of one type ('encounter', 'lab', 'imaging', 'referral').
+        """
+        return [raw for raw in self.raw_objects if raw.get("type") == doc_type]
+
+    def input_hash(self, key):
+        """
+        Digest of one board input: 'records' (every parsed document),
+        'chat' (the pre-consultation chat), 'labs' (structured labs) or a
+        document type.
+        """
+        if key not in self._input_hashes:
+            if key == "records":
+                value = self.raw_objects
+            elif key == "chat":
+                value = self.pre_consultation_chat
+            elif key == "labs":
+                value = self.structured_labs
+            else:
+                value = self.documents(key)
+            material = json.dumps(value, sort_keys=True, default=str)
+            self._input_hashes[key] = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        return self._input_hashes[key]
+
+    def lab_frame(self):
+        """
+        lab_engine.LabFrame over the structured labs, or None when the lab
+        board items need the model: no labs.json, LAB_ENGINE=0, or lab
+        documents that weren't generated from labs.json (user uploads, i.e.
+        images whose .txt sibling raw_data.json doesn't list).
+        """
+        if not lab_engine.LAB_ENGINE or not self.structured_labs:
+            return None
+        uploads = [
+            raw.get("source_file") for raw in self.documents("lab")
+            if f"{os.path.splitext(str(raw.get('source_file', '')))[0]}.txt" not in self.generated_labs
+        ]
+        if uploads:
+            print(f"Lab uploads without structured data ({', '.join(map(str, uploads))}); using the model for lab items.")
+            return None
+        if self._lab_frame is None:
+            self._lab_frame = lab_engine.LabFrame(self.structured_labs)
+        return self._lab_frame if len(self._lab_frame) else None
+
+    def set_board_item(self, item, value):
+        self.board_items[item] = value
+        if self.on_item is not None:
+            try:
+                self.on_item(item, value)
+            except Exception as e:
+                print(f"Board item callback failed for {item}: {e}")
+
+    def set_encounters(self, encounters_object):
+        """
+        Keeps the parsed encounters board for the tracks that build on it.
+        """
+        self._encounters = encounters_object
+        self._encounters_text = None
+
+    async def get_encounters(self):
+        """
+        Parsed board_items/encounters.json; read from storage at most once
+        when this run didn't produce it.
+        """
+        async with self._encounters_lock:
+            if self._encounters is None:
+                raw = await self.gcs.read_file_as_string(f"{self.base_path}/board_items/encounters.json")
+                self._encounters = json.loads(raw)
+        return self._encounters
+
+    async def get_encounters_text(self):
+        if self._encounters_text is None:
+            self._encounters_text = json.dumps(await self.get_encounters(), indent=2)
+        return self._encounters_text
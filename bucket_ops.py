@@ -1,9 +1,110 @@
 import os
+import base64
+import asyncio
+import functools
+import hashlib
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import storage
 from google.cloud.exceptions import NotFound, GoogleCloudError
+import blob_cache
+import client_registry
 
-class GCSBucketManager:
-    def __init__(self, bucket_name, service_account_json_path=None):
+# Backend selection: "gcs" (default), "local" or "memory"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "clinic_sim")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "local_bucket")
+# Set GCS_CHECK_BUCKET=0 to skip the bucket.exists() probe on startup
+GCS_CHECK_BUCKET = os.getenv("GCS_CHECK_BUCKET", "1") == "1"
+
+
+class BaseBucketManager:
+    """
+    Storage backend interface. Every backend exposes the same blob-style API
+    (paths like 'patient_data/P0001/basic_info.json') so agents do not care
+    whether data lives in GCS, on local disk or in memory.
+    """
+    bucket_name = None
+
+    def upload_file(self, local_file_path, destination_blob_name):
+        raise NotImplementedError
+
+    def create_file_from_string(self, file_content, destination_blob_name, content_type="text/plain"):
+        raise NotImplementedError
+
+    def download_file(self, source_blob_name, local_destination_path):
+        raise NotImplementedError
+
+    def read_file_as_bytes(self, source_blob_name):
+        raise NotImplementedError
+
+    def read_file_as_string(self, source_blob_name):
+        raise NotImplementedError
+
+    def update_file(self, local_file_path, destination_blob_name):
+        """
+        Overwrites an existing object with a new upload.
+        """
+        print(f"Overwriting {destination_blob_name}...")
+        return self.upload_file(local_file_path, destination_blob_name)
+
+    def delete_file(self, blob_name):
+        raise NotImplementedError
+
+    def list_files(self, folder_path=None):
+        raise NotImplementedError
+
+    def move_file(self, source_blob_name, target_folder):
+        raise NotImplementedError
+
+    def list_files_with_metadata(self, folder_path=None):
+        """
+        Like list_files, but for files only and with version metadata:
+        {relative_name: {"generation": ..., "md5": ... or None, "size": ...}}.
+        Backends override this with a single listing call; this fallback
+        costs one metadata lookup per file.
+        """
+        prefix = self._normalize_prefix(folder_path)
+        result = {}
+        for name in self.list_files(folder_path):
+            if name.endswith("/"):
+                continue
+            result[name] = {"generation": self.get_generation(f"{prefix}{name}"), "md5": None, "size": None}
+        return result
+
+    def get_generation(self, blob_name):
+        """
+        Metadata-only lookup of the blob's current version token
+        (GCS generation, file mtime/size, ...). Returns None if missing.
+        """
+        raise NotImplementedError
+
+    def read_file_at_generation(self, source_blob_name, generation):
+        """
+        Reads the blob contents as of `generation`. Backends that cannot pin
+        a version simply return the current contents.
+        """
+        return self.read_file_as_bytes(source_blob_name)
+
+    @staticmethod
+    def _normalize_prefix(folder_path):
+        prefix = folder_path if folder_path else ""
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        return prefix
+
+    @staticmethod
+    def _move_target(source_blob_name, target_folder):
+        filename = source_blob_name.split('/')[-1]
+        if target_folder and not target_folder.endswith('/'):
+            target_folder += '/'
+        return f"{target_folder}{filename}"
+
+
+class GCSBucketManager(BaseBucketManager):
+    def __init__(self, bucket_name, service_account_json_path=None, client=None, check_exists=True):
         """
         Initializes the GCS Client.
         
@@ -11,9 +112,13 @@ class GCSBucketManager:
         :param service_account_json_path: Path to service account JSON key. 
                                           If None, uses GOOGLE_APPLICATION_CREDENTIALS 
                                           or default environment auth.
+        :param client: An existing storage.Client to reuse (e.g. from client_registry).
+        :param check_exists: Probe the bucket with an extra round-trip at construction.
         """
         try:
-            if service_account_json_path:
+            if client is not None:
+                self.client = client
+            elif service_account_json_path:
                 self.client = storage.Client.from_service_account_json(service_account_json_path)
             else:
                 # Looks for credentials in environment variables
@@ -23,7 +128,7 @@ class GCSBucketManager:
             self.bucket = self.client.bucket(bucket_name)
             
             # Verify bucket exists (optional, but good for fast fail)
-            if not self.bucket.exists():
+            if check_exists and not self.bucket.exists():
                 print(f"Warning: Bucket '{bucket_name}' does not exist or you lack permission.")
 
         except Exception as e:
@@ -110,18 +215,6 @@ class GCSBucketManager:
             print(f"Error reading file content: {e}")
             return None
 
-    # ---------------------------------------------------------
-    # UPDATE
-    # ---------------------------------------------------------
-    def update_file(self, local_file_path, destination_blob_name):
-        """
-        Updates a file in GCS. 
-        Note: GCS objects are immutable. 'Updating' actually means 
-        overwriting the existing object with a new upload.
-        """
-        print(f"Overwriting {destination_blob_name}...")
-        return self.upload_file(local_file_path, destination_blob_name)
-
     # ---------------------------------------------------------
     # DELETE
     # ---------------------------------------------------------
@@ -184,6 +277,44 @@ class GCSBucketManager:
                     
         return items
 
+    def list_files_with_metadata(self, folder_path=None):
+        """
+        Direct child files with generation, MD5 and size from one listing call.
+        """
+        prefix = self._normalize_prefix(folder_path)
+        result = {}
+        for blob in self.client.list_blobs(self.bucket_name, prefix=prefix, delimiter='/'):
+            relative_name = blob.name[len(prefix):]
+            if relative_name:
+                result[relative_name] = {"generation": blob.generation, "md5": blob.md5_hash, "size": blob.size}
+        return result
+
+
+    def get_generation(self, blob_name):
+        """
+        Returns the object's generation using a metadata-only request.
+        """
+        try:
+            blob = self.bucket.get_blob(blob_name)
+            return blob.generation if blob is not None else None
+        except Exception as e:
+            print(f"Error reading blob metadata: {e}")
+            return None
+
+    def read_file_at_generation(self, source_blob_name, generation):
+        """
+        Downloads exactly the given generation so cached bytes always match
+        the version token they are stored under.
+        """
+        try:
+            blob = self.bucket.blob(source_blob_name, generation=generation)
+            return blob.download_as_bytes()
+        except NotFound:
+            print(f"File {source_blob_name} not found.")
+            return None
+        except Exception as e:
+            print(f"Error reading file bytes: {e}")
+            return None
 
     def move_file(self, source_blob_name, target_folder):
         """
@@ -224,4 +355,460 @@ class GCSBucketManager:
 
         except Exception as e:
             print(f"Failed to move file: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+class LocalBucketManager(BaseBucketManager):
+    def __init__(self, bucket_name, root_dir=None):
+        """
+        Stores blobs as plain files under <root_dir>/<bucket_name>/.
+        Intended for offline benchmarking and for keeping hot patient
+        folders on local SSD.
+
+        :param bucket_name: Logical bucket name (used as a sub-folder).
+        :param root_dir: Base directory. Defaults to STORAGE_LOCAL_ROOT.
+        """
+        self.bucket_name = bucket_name
+        self.root = os.path.abspath(os.path.join(root_dir or STORAGE_LOCAL_ROOT, bucket_name))
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, blob_name):
+        path = os.path.abspath(os.path.join(self.root, blob_name))
+        # Refuse paths escaping the bucket root (e.g. '../../etc/passwd')
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Blob path '{blob_name}' escapes the bucket root.")
+        return path
+
+    def _write(self, path, data):
+        # Write to a temp file and rename so readers never see partial content
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def upload_file(self, local_file_path, destination_blob_name):
+        try:
+            with open(local_file_path, "rb") as f:
+                self._write(self._path(destination_blob_name), f.read())
+            print(f"File {local_file_path} uploaded to {destination_blob_name}.")
+            return True
+        except Exception as e:
+            print(f"Failed to upload file: {e}")
+            return False
+
+    def create_file_from_string(self, file_content, destination_blob_name, content_type="text/plain"):
+        try:
+            data = file_content.encode("utf-8") if isinstance(file_content, str) else file_content
+            self._write(self._path(destination_blob_name), data)
+            print(f"Content uploaded to {destination_blob_name}.")
+            return True
+        except Exception as e:
+            print(f"Failed to create file from string: {e}")
+            return False
+
+    def download_file(self, source_blob_name, local_destination_path):
+        try:
+            shutil.copyfile(self._path(source_blob_name), local_destination_path)
+            print(f"Blob {source_blob_name} downloaded to {local_destination_path}.")
+            return True
+        except FileNotFoundError:
+            print(f"File {source_blob_name} not found in bucket.")
+            return False
+        except Exception as e:
+            print(f"Failed to download file: {e}")
+            return False
+
+    def read_file_as_bytes(self, source_blob_name):
+        try:
+            with open(self._path(source_blob_name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            print(f"File {source_blob_name} not found.")
+            return None
+        except Exception as e:
+            print(f"Error reading file bytes: {e}")
+            return None
+
+    def read_file_as_string(self, source_blob_name):
+        try:
+            with open(self._path(source_blob_name), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            print(f"File {source_blob_name} not found.")
+            return None
+        except Exception as e:
+            print(f"Error reading file content: {e}")
+            return None
+
+    def delete_file(self, blob_name):
+        try:
+            os.remove(self._path(blob_name))
+            print(f"Blob {blob_name} deleted.")
+            return True
+        except FileNotFoundError:
+            print(f"Blob {blob_name} not found.")
+            return False
+        except Exception as e:
+            print(f"Failed to delete blob: {e}")
+            return False
+
+    def list_files(self, folder_path=None):
+        """
+        Same contract as GCSBucketManager.list_files: direct children only,
+        files first, then sub-folders with a trailing '/'.
+        """
+        prefix = self._normalize_prefix(folder_path)
+        directory = self._path(prefix) if prefix else self.root
+        if not os.path.isdir(directory):
+            return []
+
+        files, folders = [], []
+        for entry in os.scandir(directory):
+            if entry.name.startswith(".tmp-"):
+                continue
+            if entry.is_dir():
+                folders.append(entry.name + "/")
+            else:
+                files.append(entry.name)
+        return sorted(files) + sorted(folders)
+
+    def list_files_with_metadata(self, folder_path=None):
+        prefix = self._normalize_prefix(folder_path)
+        directory = self._path(prefix) if prefix else self.root
+        if not os.path.isdir(directory):
+            return {}
+
+        result = {}
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if entry.name.startswith(".tmp-") or entry.is_dir():
+                continue
+            stat = entry.stat()
+            result[entry.name] = {"generation": f"{stat.st_mtime_ns}-{stat.st_size}", "md5": None, "size": stat.st_size}
+        return result
+
+    def get_generation(self, blob_name):
+        try:
+            stat = os.stat(self._path(blob_name))
+            return f"{stat.st_mtime_ns}-{stat.st_size}"
+        except FileNotFoundError:
+            return None
+
+    def move_file(self, source_blob_name, target_folder):
+        try:
+            source_path = self._path(source_blob_name)
+            if not os.path.exists(source_path):
+                print(f"Error: Source file '{source_blob_name}' does not exist.")
+                return False
+
+            new_blob_name = self._move_target(source_blob_name, target_folder)
+            target_path = self._path(new_blob_name)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.replace(source_path, target_path)
+            print(f"Moved '{source_blob_name}' to '{new_blob_name}'")
+            return True
+        except Exception as e:
+            print(f"Failed to move file: {e}")
+            return False
+
+
+class InMemoryBucketManager(BaseBucketManager):
+    def __init__(self, bucket_name):
+        """
+        Keeps blobs in a process-local dict. Nothing survives a restart;
+        use it for tests and network-free pipeline benchmarks.
+        """
+        self.bucket_name = bucket_name
+        self._blobs = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def upload_file(self, local_file_path, destination_blob_name):
+        try:
+            with open(local_file_path, "rb") as f:
+                data = f.read()
+            self._store(destination_blob_name, data)
+            print(f"File {local_file_path} uploaded to {destination_blob_name}.")
+            return True
+        except Exception as e:
+            print(f"Failed to upload file: {e}")
+            return False
+
+    def create_file_from_string(self, file_content, destination_blob_name, content_type="text/plain"):
+        data = file_content.encode("utf-8") if isinstance(file_content, str) else bytes(file_content)
+        self._store(destination_blob_name, data)
+        print(f"Content uploaded to {destination_blob_name}.")
+        return True
+
+    def download_file(self, source_blob_name, local_destination_path):
+        data = self.read_file_as_bytes(source_blob_name)
+        if data is None:
+            return False
+        with open(local_destination_path, "wb") as f:
+            f.write(data)
+        print(f"Blob {source_blob_name} downloaded to {local_destination_path}.")
+        return True
+
+    def read_file_as_bytes(self, source_blob_name):
+        with self._lock:
+            data = self._blobs.get(source_blob_name)
+        if data is None:
+            print(f"File {source_blob_name} not found.")
+        return data
+
+    def read_file_as_string(self, source_blob_name):
+        data = self.read_file_as_bytes(source_blob_name)
+        return data.decode("utf-8") if data is not None else None
+
+    def delete_file(self, blob_name):
+        with self._lock:
+            if self._blobs.pop(blob_name, None) is None:
+                print(f"Blob {blob_name} not found.")
+                return False
+        print(f"Blob {blob_name} deleted.")
+        return True
+
+    def list_files(self, folder_path=None):
+        prefix = self._normalize_prefix(folder_path)
+        files, folders = set(), set()
+        with self._lock:
+            names = list(self._blobs.keys())
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            relative_name = name[len(prefix):]
+            if not relative_name:
+                continue
+            if "/" in relative_name:
+                folders.add(relative_name.split("/", 1)[0] + "/")
+            else:
+                files.add(relative_name)
+        return sorted(files) + sorted(folders)
+
+    def list_files_with_metadata(self, folder_path=None):
+        prefix = self._normalize_prefix(folder_path)
+        with self._lock:
+            blobs = {
+                name[len(prefix):]: (data, self._generations.get(name, 0))
+                for name, data in self._blobs.items()
+                if name.startswith(prefix) and name[len(prefix):] and "/" not in name[len(prefix):]
+            }
+        return {
+            name: {"generation": generation, "md5": base64.b64encode(hashlib.md5(data).digest()).decode("ascii"), "size": len(data)}
+            for name, (data, generation) in sorted(blobs.items())
+        }
+
+    def get_generation(self, blob_name):
+        with self._lock:
+            if blob_name not in self._blobs:
+                return None
+            return self._generations.get(blob_name, 0)
+
+    def _store(self, blob_name, data):
+        with self._lock:
+            self._blobs[blob_name] = data
+            self._generations[blob_name] = self._generations.get(blob_name, 0) + 1
+
+    def move_file(self, source_blob_name, target_folder):
+        new_blob_name = self._move_target(source_blob_name, target_folder)
+        with self._lock:
+            if source_blob_name not in self._blobs:
+                print(f"Error: Source file '{source_blob_name}' does not exist.")
+                return False
+            self._blobs[new_blob_name] = self._blobs.pop(source_blob_name)
+            self._generations[new_blob_name] = self._generations.get(new_blob_name, 0) + 1
+        print(f"Moved '{source_blob_name}' to '{new_blob_name}'")
+        return True
+
+
+class CachedBucketManager(BaseBucketManager):
+    def __init__(self, backend, cache):
+        """
+        Read-through cache in front of another bucket manager.
+
+        Every read first asks the backend for the blob's generation
+        (metadata only) and serves the cached bytes when it still matches;
+        otherwise that exact generation is downloaded and cached.
+        Our own writes, deletes and moves invalidate the affected paths.
+
+        :param backend: The bucket manager that actually stores the data.
+        :param cache: A blob_cache.BlobLRUCache (usually the process-wide one).
+        """
+        self.backend = backend
+        self.cache = cache
+        self.bucket_name = backend.bucket_name
+
+    def _read_bytes(self, blob_name):
+        generation = self.backend.get_generation(blob_name)
+        if generation is None:
+            self.cache.invalidate(blob_name)
+            return None
+
+        data = self.cache.get(blob_name, generation)
+        if data is None:
+            data = self.backend.read_file_at_generation(blob_name, generation)
+            self.cache.put(blob_name, generation, data)
+        return data
+
+    def read_file_as_bytes(self, source_blob_name):
+        data = self._read_bytes(source_blob_name)
+        if data is None:
+            print(f"File {source_blob_name} not found.")
+        return data
+
+    def read_file_as_string(self, source_blob_name):
+        data = self._read_bytes(source_blob_name)
+        if data is None:
+            print(f"File {source_blob_name} not found.")
+            return None
+        return data.decode("utf-8")
+
+    def upload_file(self, local_file_path, destination_blob_name):
+        self.cache.invalidate(destination_blob_name)
+        return self.backend.upload_file(local_file_path, destination_blob_name)
+
+    def create_file_from_string(self, file_content, destination_blob_name, content_type="text/plain"):
+        self.cache.invalidate(destination_blob_name)
+        return self.backend.create_file_from_string(file_content, destination_blob_name, content_type=content_type)
+
+    def download_file(self, source_blob_name, local_destination_path):
+        return self.backend.download_file(source_blob_name, local_destination_path)
+
+    def delete_file(self, blob_name):
+        self.cache.invalidate(blob_name)
+        return self.backend.delete_file(blob_name)
+
+    def list_files(self, folder_path=None):
+        return self.backend.list_files(folder_path)
+
+    def list_files_with_metadata(self, folder_path=None):
+        return self.backend.list_files_with_metadata(folder_path)
+
+    def move_file(self, source_blob_name, target_folder):
+        self.cache.invalidate(source_blob_name)
+        self.cache.invalidate(self._move_target(source_blob_name, target_folder))
+        return self.backend.move_file(source_blob_name, target_folder)
+
+    def get_generation(self, blob_name):
+        return self.backend.get_generation(blob_name)
+
+    def read_file_at_generation(self, source_blob_name, generation):
+        return self.backend.read_file_at_generation(source_blob_name, generation)
+
+
+# ---------------------------------------------------------
+# BACKEND FACTORY
+# ---------------------------------------------------------
+_MANAGERS = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_bucket_manager(bucket_name=None, backend=None):
+    """
+    Returns the shared bucket manager for the configured backend.
+
+    :param bucket_name: Defaults to STORAGE_BUCKET ('clinic_sim').
+    :param backend: 'gcs', 'local' or 'memory'. Defaults to STORAGE_BACKEND.
+    """
+    bucket_name = bucket_name or STORAGE_BUCKET
+    backend = (backend or STORAGE_BACKEND).lower()
+    key = (backend, bucket_name)
+
+    with _MANAGERS_LOCK:
+        if key not in _MANAGERS:
+            if backend == "gcs":
+                manager = GCSBucketManager(
+                    bucket_name=bucket_name,
+                    client=client_registry.get_storage_client(),
+                    check_exists=GCS_CHECK_BUCKET
+                )
+            elif backend == "local":
+                manager = LocalBucketManager(bucket_name=bucket_name)
+            elif backend == "memory":
+                manager = InMemoryBucketManager(bucket_name=bucket_name)
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'. Use 'gcs', 'local' or 'memory'.")
+
+            # Memory blobs are already in RAM; caching them would only double the footprint
+            cache = blob_cache.get_blob_cache()
+            if cache is not None and backend != "memory":
+                manager = CachedBucketManager(manager, cache)
+
+            _MANAGERS[key] = manager
+        return _MANAGERS[key]
+
+
+# ---------------------------------------------------------
+# ASYNC WRAPPER
+# ---------------------------------------------------------
+# google-cloud-storage is a blocking client. Every call made from an
+# `async def` handler would otherwise stall the whole event loop, so the
+# async manager pushes each call onto a shared, bounded thread pool.
+_IO_EXECUTOR = None
+
+
+def get_io_executor():
+    """
+    Returns the process-wide executor used for blocking storage calls.
+    Size is controlled by the STORAGE_IO_WORKERS environment variable.
+    """
+    global _IO_EXECUTOR
+    if _IO_EXECUTOR is None:
+        max_workers = int(os.getenv("STORAGE_IO_WORKERS", "16"))
+        _IO_EXECUTOR = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io")
+    return _IO_EXECUTOR
+
+
+class AsyncBucketManager:
+    def __init__(self, manager=None, bucket_name=None):
+        """
+        Awaitable counterpart of the bucket managers.
+
+        :param manager: An existing (blocking) bucket manager to wrap.
+        :param bucket_name: Used to look up the configured backend when no manager is given.
+        """
+        self.sync = manager if manager is not None else get_bucket_manager(bucket_name)
+        self.bucket_name = self.sync.bucket_name
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs any blocking callable on the storage executor.
+        Useful for helpers built on top of the sync manager (e.g. ScheduleCSVManager).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_io_executor(), functools.partial(func, *args, **kwargs))
+
+    async def upload_file(self, local_file_path, destination_blob_name):
+        return await self.run(self.sync.upload_file, local_file_path, destination_blob_name)
+
+    async def create_file_from_string(self, file_content, destination_blob_name, content_type="text/plain"):
+        return await self.run(self.sync.create_file_from_string, file_content, destination_blob_name, content_type=content_type)
+
+    async def download_file(self, source_blob_name, local_destination_path):
+        return await self.run(self.sync.download_file, source_blob_name, local_destination_path)
+
+    async def read_file_as_bytes(self, source_blob_name):
+        return await self.run(self.sync.read_file_as_bytes, source_blob_name)
+
+    async def read_file_as_string(self, source_blob_name):
+        return await self.run(self.sync.read_file_as_string, source_blob_name)
+
+    async def update_file(self, local_file_path, destination_blob_name):
+        return await self.run(self.sync.update_file, local_file_path, destination_blob_name)
+
+    async def delete_file(self, blob_name):
+        return await self.run(self.sync.delete_file, blob_name)
+
+    async def list_files(self, folder_path=None):
+        return await self.run(self.sync.list_files, folder_path)
+
+    async def list_files_with_metadata(self, folder_path=None):
+        return await self.run(self.sync.list_files_with_metadata, folder_path)
+
+    async def move_file(self, source_blob_name, target_folder):
+        return await self.run(self.sync.move_file, source_blob_name, target_folder)
@@ -0,0 +1,97 @@
+import json
+import time
+import asyncio
+
+# Stage checkpoints for resumable patient generation.
+#
+# patient_data/{id}/generation_manifest.json lists every completed stage with
+# the fingerprint of the inputs it was produced from; the stage result itself
+# lives in patient_data/{id}/checkpoints/{stage}.json. A rerun with the same
+# inputs restores those stages instead of calling the models again.
+
+MANIFEST_VERSION = 1
+
+
+class StageCheckpoints:
+    def __init__(self, gcs, base_path):
+        """
+        :param gcs: bucket_ops.AsyncBucketManager
+        :param base_path: Blob folder of the run, e.g. patient_data/PT-1234.
+        """
+        self.gcs = gcs
+        self.manifest_path = f"{base_path}/generation_manifest.json"
+        self.checkpoint_prefix = f"{base_path}/checkpoints"
+        self._manifest = None
+        self._lock = asyncio.Lock()
+
+    async def _get_manifest(self):
+        if self._manifest is None:
+            raw = await self.gcs.read_file_as_string(self.manifest_path)
+            manifest = None
+            if raw:
+                try:
+                    manifest = json.loads(raw)
+                except json.JSONDecodeError:
+                    print(f"Ignoring unreadable manifest {self.manifest_path}")
+            if not manifest or manifest.get("version") != MANIFEST_VERSION:
+                manifest = {"version": MANIFEST_VERSION, "status": "in_progress", "stages": {}}
+            self._manifest = manifest
+        return self._manifest
+
+    async def _write_manifest(self):
+        # Caller must hold the lock
+        self._manifest["updated_at"] = time.time()
+        await self.gcs.create_file_from_string(
+            json.dumps(self._manifest, indent=2), self.manifest_path, content_type="application/json"
+        )
+
+    async def load(self, stage, fingerprint):
+        """
+        Returns the saved result of `stage` if it was produced from the same
+        inputs, otherwise None.
+        """
+        async with self._lock:
+            entry = (await self._get_manifest())["stages"].get(stage)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+
+        raw = await self.gcs.read_file_as_string(entry["checkpoint"])
+        if raw is None:
+            return None
+        try:
+            record = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        if record.get("fingerprint") != fingerprint:
+            return None
+        print(f"Restored stage '{stage}' from checkpoint.")
+        return record.get("result")
+
+    async def save(self, stage, fingerprint, result):
+        checkpoint_path = f"{self.checkpoint_prefix}/{stage}.json"
+        # Result first, manifest second: a crash in between only loses this stage
+        await self.gcs.create_file_from_string(
+            json.dumps({"stage": stage, "fingerprint": fingerprint, "result": result}),
+            checkpoint_path,
+            content_type="application/json"
+        )
+        async with self._lock:
+            manifest = await self._get_manifest()
+            manifest["stages"][stage] = {
+                "fingerprint": fingerprint,
+                "checkpoint": checkpoint_path,
+                "completed_at": time.time()
+            }
+            await self._write_manifest()
+
+    async def set_status(self, status, report=None):
+        """
+        :param status: 'in_progress', 'complete' or 'failed'.
+        :param report: Optional scheduler report stored alongside.
+        """
+        async with self._lock:
+            manifest = await self._get_manifest()
+            manifest["status"] = status
+            if report is not None:
+                manifest["last_run"] = {k: v for k, v in report.items() if k != "stages"}
+            await self._write_manifest()
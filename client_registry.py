@@ -0,0 +1,75 @@
+import os
+import threading
+from google import genai
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Long-lived SDK clients shared by every agent and endpoint in the process.
+# Creating them per request costs a credential lookup plus fresh TLS
+# connections, so each one is built lazily on first use and then reused.
+
+_LOCK = threading.Lock()
+_GENAI_CLIENT = None
+_STORAGE_CLIENTS = {}
+_DIALOGFLOW_CLIENTS = {}
+
+
+def get_genai_client():
+    """
+    Returns the shared Vertex AI (google-genai) client.
+    """
+    global _GENAI_CLIENT
+    if _GENAI_CLIENT is None:
+        with _LOCK:
+            if _GENAI_CLIENT is None:
+                _GENAI_CLIENT = genai.Client(
+                    vertexai=True,
+                    project=os.getenv("PROJECT_ID"),
+                    location=os.getenv("PROJECT_LOCATION", "us-central1")
+                )
+    return _GENAI_CLIENT
+
+
+def get_storage_client(service_account_json_path=None):
+    """
+    Returns a shared google-cloud-storage client (one per credential source).
+
+    The underlying requests session is mounted with a larger connection pool
+    (STORAGE_HTTP_POOL_SIZE, default 32) so concurrent blob calls from the
+    storage executor reuse keep-alive connections instead of opening new ones.
+
+    :param service_account_json_path: Optional key file; None uses default auth.
+    """
+    key = service_account_json_path or "default"
+    if key not in _STORAGE_CLIENTS:
+        with _LOCK:
+            if key not in _STORAGE_CLIENTS:
+                if service_account_json_path:
+                    client = storage.Client.from_service_account_json(service_account_json_path)
+                else:
+                    client = storage.Client()
+
+                pool_size = int(os.getenv("STORAGE_HTTP_POOL_SIZE", "32"))
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                client._http.mount("https://", adapter)
+
+                _STORAGE_CLIENTS[key] = client
+    return _STORAGE_CLIENTS[key]
+
+
+def get_dialogflow_sessions_client(api_endpoint):
+    """
+    Returns a shared Dialogflow CX SessionsClient for the given regional endpoint.
+    """
+    if api_endpoint not in _DIALOGFLOW_CLIENTS:
+        with _LOCK:
+            if api_endpoint not in _DIALOGFLOW_CLIENTS:
+                # Imported lazily: only the SMS bridge needs Dialogflow
+                from google.cloud import dialogflowcx_v3beta1 as dialogflow
+                _DIALOGFLOW_CLIENTS[api_endpoint] = dialogflow.SessionsClient(
+                    client_options={"api_endpoint": api_endpoint}
+                )
+    return _DIALOGFLOW_CLIENTS[api_endpoint]
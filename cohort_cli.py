@@ -0,0 +1,252 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import functools
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import rate_limiter
+
+# Bulk synthetic patient generation.
+#
+#   python cohort_cli.py seeds.jsonl --processes 4 --concurrency 3 --report cohort_report.json
+#
+# seeds.jsonl holds one seed per line, shaped like `input_criteria` in test.py
+# (description, encounters_count, imaging_count_in_encounters, ...). A seed
+# with a patient_id resumes that patient from its generation checkpoints.
+#
+# Seeds are spread over worker processes, each running several patients at
+# once. LLM_RPM, LLM_TPM, LLM_MAX_CONCURRENCY and LLM_LIMITS are global
+# budgets here, set or defaulted: every process gets an equal share, so the
+# cohort as a whole stays inside the project quota.
+
+
+def split_limits(environ, processes):
+    """
+    Returns the env overrides that give each of `processes` workers an equal
+    share of the global model limits (0 = unlimited stays unlimited). Unset
+    limits are split from rate_limiter's defaults.
+    """
+    overrides = {}
+    for name, default in rate_limiter.LIMIT_DEFAULTS.items():
+        value = int(environ.get(name) or default)
+        overrides[name] = str(max(1, value // processes) if value > 0 else 0)
+
+    if environ.get("LLM_LIMITS"):
+        per_model = json.loads(environ["LLM_LIMITS"])
+        for limits in per_model.values():
+            for key in ("concurrency", "rpm", "tpm"):
+                if int(limits.get(key, 0)) > 0:
+                    limits[key] = max(1, int(limits[key]) // processes)
+        overrides["LLM_LIMITS"] = json.dumps(per_model)
+    return overrides
+
+
+def _init_worker(env_overrides):
+    os.environ.update(env_overrides)
+
+
+def _stage_kind(stage_name):
+    # encounter_3_img -> encounter_img
+    return re.sub(r"_\d+", "", stage_name)
+
+
+def _stage_durations(report, status):
+    return {
+        name: stage["duration_s"] for name, stage in report["stages"].items()
+        if stage["status"] == status and not stage["restored"]
+    }
+
+
+async def _generate_one(seed, process_board):
+    import my_agents
+
+    seed = dict(seed)
+    outcome = {"patient_id": seed["patient_id"], "status": "succeeded", "error": None, "stages": {}, "failed_stages": {}}
+    start = time.perf_counter()
+    PM = None
+    try:
+        PM = my_agents.PatientManager(seed)
+        report = await PM.generate_ground_truth_patient()
+        outcome["stages"] = _stage_durations(report, "done")
+        outcome["restored_stages"] = report["restored_stages"]
+
+        if process_board:
+            data_agent = my_agents.RawDataProcessing()
+            board_items = {}
+            for name, step in (
+                ("preconsult", data_agent.process_raw_data),
+                ("board", functools.partial(data_agent.process_dashboard_content, board_items=board_items)),
+                ("board_update", functools.partial(data_agent.process_board_object, board_items=board_items)),
+            ):
+                step_start = time.perf_counter()
+                await step(seed["patient_id"])
+                outcome["stages"][name] = round(time.perf_counter() - step_start, 3)
+    except Exception as e:
+        print(f"Patient {seed['patient_id']} failed: {e}")
+        outcome["status"] = "failed"
+        outcome["error"] = str(e)
+        # Keep the timings of a failed generation run; its stages still did the work
+        report = getattr(PM, "generation_report", None)
+        if report is not None and not outcome["stages"]:
+            outcome["stages"] = _stage_durations(report, "done")
+            outcome["failed_stages"] = _stage_durations(report, "failed")
+
+    outcome["wall_time_s"] = round(time.perf_counter() - start, 3)
+    return outcome
+
+
+async def _run_chunk_async(seeds, concurrency, process_board):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(seed):
+        async with semaphore:
+            return await _generate_one(seed, process_board)
+
+    outcomes = await asyncio.gather(*(bounded(seed) for seed in seeds))
+    return {"patients": outcomes, "llm": rate_limiter.stats()}
+
+
+def _run_chunk(seeds, concurrency, process_board):
+    """
+    Entry point of a worker process.
+    """
+    return asyncio.run(_run_chunk_async(seeds, concurrency, process_board))
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+
+def _latency_stats(patients, field):
+    durations = {}
+    for patient in patients:
+        for name, seconds in patient.get(field, {}).items():
+            durations.setdefault(_stage_kind(name), []).append(seconds)
+
+    return {
+        kind: {
+            "count": len(values),
+            "mean_s": round(statistics.mean(values), 3),
+            "p50_s": round(_percentile(values, 0.5), 3),
+            "p95_s": round(_percentile(values, 0.95), 3),
+            "max_s": round(max(values), 3)
+        }
+        for kind, values in sorted(durations.items())
+    }
+
+
+def build_report(chunks, wall_time):
+    patients = [p for chunk in chunks for p in chunk["patients"]]
+    succeeded = [p for p in patients if p["status"] == "succeeded"]
+
+    tokens = {"prompt": 0, "output": 0}
+    calls = {"calls": 0, "retries": 0, "quota_errors": 0, "failures": 0}
+    for chunk in chunks:
+        for model_stats in chunk["llm"].values():
+            tokens["prompt"] += model_stats["prompt_tokens"]
+            tokens["output"] += model_stats["output_tokens"]
+            for key in calls:
+                calls[key] += model_stats[key]
+
+    patient_times = [p["wall_time_s"] for p in succeeded]
+    return {
+        "patients": len(patients),
+        "succeeded": len(succeeded),
+        "failed": len(patients) - len(succeeded),
+        "wall_time_s": round(wall_time, 3),
+        "patients_per_hour": round(len(succeeded) / (wall_time / 3600), 2) if wall_time > 0 else 0.0,
+        "patient_time_p50_s": round(_percentile(patient_times, 0.5), 3) if patient_times else None,
+        "tokens": dict(tokens, total=tokens["prompt"] + tokens["output"]),
+        "model_calls": calls,
+        # Completed stages of every patient, failed runs included
+        "stage_latency": _latency_stats(patients, "stages"),
+        # Time spent in stages that raised
+        "failed_stage_latency": _latency_stats(patients, "failed_stages"),
+        "failures": [{"patient_id": p["patient_id"], "error": p["error"]} for p in patients if p["status"] == "failed"],
+        "patient_ids": [p["patient_id"] for p in succeeded]
+    }
+
+
+def load_seeds(path):
+    seeds = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                seeds.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON seed ({e})")
+    return seeds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a cohort of synthetic patients from a JSONL file of seeds.")
+    parser.add_argument("seeds", help="JSONL file, one patient seed per line")
+    parser.add_argument("--processes", type=int, default=2, help="worker processes (default 2)")
+    parser.add_argument("--concurrency", type=int, default=3, help="patients generated at once per process (default 3)")
+    parser.add_argument("--process-board", action="store_true", help="also run preconsult and board processing for each patient")
+    parser.add_argument("--report", default="cohort_report.json", help="where to write the JSON report")
+    args = parser.parse_args(argv)
+
+    seeds = load_seeds(args.seeds)
+    if not seeds:
+        print("No seeds found.")
+        return 1
+
+    # Ids are fixed up front so a failed patient can be resumed by id
+    for seed in seeds:
+        seed.setdefault("patient_id", f"PT-{str(uuid.uuid4())[:8].upper()}")
+
+    processes = max(1, min(args.processes, len(seeds)))
+    # Round-robin keeps chunk sizes within one of each other
+    chunks = [seeds[i::processes] for i in range(processes)]
+    env_overrides = split_limits(os.environ, processes)
+
+    print(f"Generating {len(seeds)} patients with {processes} processes x {args.concurrency} concurrent patients...")
+    start = time.perf_counter()
+    # spawn: the model/storage clients must not be inherited across fork
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(env_overrides,)
+    ) as pool:
+        futures = [pool.submit(_run_chunk, chunk, args.concurrency, args.process_board) for chunk in chunks]
+        results = []
+        for future, chunk in zip(futures, chunks):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker process died; count its whole chunk as failed
+                print(f"Worker process failed: {e}")
+                results.append({
+                    "patients": [
+                        {"patient_id": seed.get("patient_id"), "status": "failed", "error": str(e), "stages": {}, "wall_time_s": 0.0}
+                        for seed in chunk
+                    ],
+                    "llm": {}
+                })
+
+    report = build_report(results, time.perf_counter() - start)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    print(
+        f"Done: {report['succeeded']}/{report['patients']} patients in {report['wall_time_s']}s "
+        f"({report['patients_per_hour']} patients/hour, {report['tokens']['total']} tokens). Report: {args.report}"
+    )
+    return 0 if report["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
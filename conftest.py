@@ -0,0 +1,94 @@
+import os
+import sys
+import types
+
+# The tests run offline against the memory storage backend. When the cloud
+# SDKs aren't installed (clean checkout, CI without credentials), register
+# minimal stand-ins so the modules import; real packages are always preferred.
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent in sys.modules:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+class _Anything:
+    """
+    Accepts any constructor arguments and exposes them as attributes.
+    """
+    def __init__(self, *args, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        return None
+
+
+class _Part(_Anything):
+    @classmethod
+    def from_bytes(cls, data=None, mime_type=None):
+        return cls(inline_data=_Anything(data=data, mime_type=mime_type))
+
+    @classmethod
+    def from_text(cls, text=None):
+        return cls(text=text)
+
+
+class _Types(types.ModuleType):
+    Part = _Part
+
+    def __getattr__(self, name):
+        return type(name, (_Anything,), {})
+
+
+class _Client(_Anything):
+    pass
+
+
+class _NotFound(Exception):
+    pass
+
+
+class _GoogleCloudError(Exception):
+    pass
+
+
+def _package(name):
+    try:
+        __import__(name)
+    except ImportError:
+        _module(name)
+
+
+def _install_stubs():
+    try:
+        import google.genai  # noqa: F401
+    except ImportError:
+        _package("google")
+        genai_types = _Types("google.genai.types")
+        sys.modules["google.genai.types"] = genai_types
+        _module("google.genai", Client=_Client, types=genai_types)
+
+    try:
+        import google.cloud.storage  # noqa: F401
+    except ImportError:
+        _package("google")
+        _package("google.cloud")
+        _module("google.cloud.storage", Client=_Client)
+        _module("google.cloud.exceptions", NotFound=_NotFound, GoogleCloudError=_GoogleCloudError)
+        _module("google.cloud.dialogflowcx_v3beta1", SessionsClient=_Client)
+
+    try:
+        import dotenv  # noqa: F401
+    except ImportError:
+        _module("dotenv", load_dotenv=lambda *args, **kwargs: False)
+
+
+_install_stubs()
@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import hashlib
+from google.genai import types
+
+# Shared prompt prefix for fan-out calls.
+# The dashboard builders all send the same patient record dump followed by a
+# task-specific instruction. With Vertex context caching the dump is uploaded
+# once as CachedContent and each call only sends its instruction delta.
+#
+# CONTEXT_CACHE_MODE
+#   vertex  (default) use Vertex CachedContent, falling back to local on error
+#   local   stitch the prefix back into every request (no remote state; tests)
+# CONTEXT_CACHE_INSTRUCTION
+#   cache   (default) a request using cached_content can't carry its own system
+#           instruction, so each distinct task instruction gets its own
+#           CachedContent (prefix + system_instruction) and keeps the system role
+#   inline  one CachedContent for every task; the task instruction is sent in
+#           the user turn instead (fewest uploads, weaker instruction)
+CONTEXT_CACHE_MODE = os.getenv("CONTEXT_CACHE_MODE", "vertex")
+CONTEXT_CACHE_INSTRUCTION = os.getenv("CONTEXT_CACHE_INSTRUCTION", "cache")
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "900"))
+# Vertex rejects caches below a model-specific minimum; skip the round-trip
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "2048"))
+
+
+class StreamedResponse:
+    """
+    A streamed response joined back together; callers read `.text` and
+    `.usage_metadata` as on a regular response.
+    """
+    def __init__(self, text, usage_metadata, first_token):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self.first_token = first_token
+
+
+async def stream_content(client, model, contents, config):
+    """
+    generate_content over the streaming API, timing the first chunk.
+    """
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    usage_metadata = None
+    async for chunk in await client.aio.models.generate_content_stream(model=model, contents=contents, config=config):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chunks.append(chunk.text or "")
+        # Usage is reported on the final chunk
+        usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+    return StreamedResponse("".join(chunks), usage_metadata, first_token)
+
+
+class SharedContext:
+    def __init__(self, client, model, context_text, display_name=None, mode=None, instruction=None):
+        """
+        :param client: genai client used to create/delete the remote cache.
+        :param model: Model every call sharing this context will use.
+        :param context_text: The common prefix (e.g. serialised patient records).
+        :param display_name: Label for the Vertex cache entry.
+        :param mode: 'vertex' or 'local'. Defaults to CONTEXT_CACHE_MODE.
+        :param instruction: 'cache' or 'inline'. Defaults to CONTEXT_CACHE_INSTRUCTION.
+        """
+        self.client = client
+        self.model = model
+        self.context_text = context_text
+        self.display_name = display_name
+        self.mode = mode or CONTEXT_CACHE_MODE
+        self.instruction = instruction or CONTEXT_CACHE_INSTRUCTION
+        self.fingerprint = hashlib.sha256(f"{model}\n{context_text}".encode("utf-8")).hexdigest()
+
+        self._caches = {}  # system instruction (None when inline) -> task resolving to a cache name
+        self._lock = asyncio.Lock()
+
+        # Measurements
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.latency_total = 0.0
+        self.first_token_total = 0.0
+        self.first_token_calls = 0
+        self.remote_caches = 0
+
+    async def _remote_cache(self, system_instruction):
+        """
+        Returns the CachedContent name to use for this instruction, or None
+        to send the prefix inline.
+        """
+        key = system_instruction if self.instruction == "cache" else None
+        async with self._lock:
+            if self.mode != "vertex":
+                return None
+
+            # ~4 characters per token is close enough to decide if caching is allowed
+            if len(self.context_text) / 4 < CONTEXT_CACHE_MIN_TOKENS:
+                self.mode = "local"
+                return None
+
+            if key not in self._caches:
+                self._caches[key] = asyncio.ensure_future(self._create_cache(key))
+            task = self._caches[key]
+        return await task
+
+    async def _create_cache(self, system_instruction):
+        try:
+            cache = await self.client.aio.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    contents=[types.Content(role="user", parts=[types.Part(text=self.context_text)])],
+                    system_instruction=system_instruction,
+                    display_name=self.display_name,
+                    ttl=f"{CONTEXT_CACHE_TTL}s"
+                )
+            )
+            print(f"Context cache created: {cache.name}")
+            self.remote_caches += 1
+            return cache.name
+        except Exception as e:
+            print(f"Context caching unavailable, sending full prompts instead: {e}")
+            return None
+
+    async def prepare(self, contents, config):
+        """
+        Turns a task delta (contents + config with its own system instruction)
+        into the request actually sent to the model.
+        """
+        cache_name = await self._remote_cache(config.system_instruction)
+        delta = contents if isinstance(contents, list) else [contents]
+
+        if cache_name is None:
+            # Local stand-in: identical to an uncached request
+            return [self.context_text] + delta, config
+
+        # A request using cached_content may not carry its own system
+        # instruction: it is either on the cache already or goes in the user turn.
+        if self.instruction != "cache" and config.system_instruction:
+            delta = [f"### TASK SYSTEM INSTRUCTION ###\n{config.system_instruction}\n\n"] + delta
+        config = config.model_copy(update={"system_instruction": None, "cached_content": cache_name})
+        return delta, config
+
+    def record(self, response, elapsed, first_token=None):
+        """
+        :param elapsed: Seconds until the full response was received.
+        :param first_token: Seconds until the first streamed chunk, if streamed.
+        """
+        self.calls += 1
+        self.latency_total += elapsed
+        if first_token is not None:
+            self.first_token_total += first_token
+            self.first_token_calls += 1
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_token_count or 0
+            self.cached_tokens += usage.cached_content_token_count or 0
+
+    def summary(self):
+        return {
+            "mode": self.mode,
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uncached_prompt_tokens": self.prompt_tokens - self.cached_tokens,
+            "cached_token_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            "remote_caches": self.remote_caches,
+            "avg_time_to_first_token_s": round(self.first_token_total / self.first_token_calls, 3) if self.first_token_calls else None,
+            "avg_latency_s": round(self.latency_total / self.calls, 3) if self.calls else 0.0
+        }
+
+    async def close(self):
+        caches, self._caches = self._caches, {}
+        for task in caches.values():
+            cache_name = await task
+            if cache_name is None:
+                continue
+            try:
+                await self.client.aio.caches.delete(name=cache_name)
+            except Exception as e:
+                # The TTL cleans it up anyway
+                print(f"Failed to delete context cache {cache_name}: {e}")
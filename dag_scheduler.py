@@ -0,0 +1,226 @@
+import json
+import time
+import asyncio
+import hashlib
+
+# Minimal async DAG runner.
+# Stages are zero-argument coroutine functions with named dependencies. Every
+# stage whose dependencies have finished is started immediately, subject to a
+# concurrency cap, so total latency approaches the longest dependency chain
+# rather than the sum of all stages. Stages may add further stages while the
+# graph is running (e.g. one per encounter once the encounter list exists).
+#
+# With a checkpoint store, every stage gets a fingerprint derived from the run
+# salt and the fingerprints/results of its dependencies. A stage whose
+# fingerprint matches a saved checkpoint is restored instead of executed, so a
+# rerun after a failure resumes where the previous run stopped.
+
+
+class Stage:
+    def __init__(self, name, fn, deps, expand=None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.expand = expand
+        self.fingerprint = None
+        self.restored = False
+        self.status = "pending"  # pending | queued | running | done | failed | skipped | cancelled
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class DAGScheduler:
+    def __init__(self, max_concurrency=4, fail_fast=True, on_update=None, checkpoints=None, salt=""):
+        """
+        :param max_concurrency: Maximum number of stages running at once.
+        :param fail_fast: Cancel everything and re-raise on the first failure.
+                          Otherwise dependents of a failed stage are skipped
+                          and independent branches keep going.
+        :param on_update: Optional callback(stage_name, status) for progress reporting.
+        :param checkpoints: Optional store with async load(stage, fingerprint)
+                            and async save(stage, fingerprint, result)
+                            (see checkpoints.StageCheckpoints).
+        :param salt: Run-level input (e.g. the generation seed) mixed into
+                     every stage fingerprint.
+        """
+        self.max_concurrency = max_concurrency
+        self.fail_fast = fail_fast
+        self.on_update = on_update
+        self.checkpoints = checkpoints
+        self.salt = salt
+        self.stages = {}
+        self.results = {}
+        self._semaphore = None
+        self._started_at = None
+        self._finished_at = None
+
+    def add(self, name, fn, deps=(), expand=None):
+        """
+        Registers a stage. Safe to call from inside a running stage.
+
+        :param expand: Optional callback(result) run once the stage has a
+                       result, whether computed or restored from a checkpoint.
+                       Stages that depend on this result are added there.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered.")
+        self.stages[name] = Stage(name, fn, deps, expand)
+        return name
+
+    def _fingerprint(self, stage):
+        material = {
+            "salt": self.salt,
+            "stage": stage.name,
+            "deps": {
+                d: [self.stages[d].fingerprint, json.dumps(self.results.get(d), sort_keys=True, default=str)]
+                for d in sorted(stage.deps)
+            }
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _notify(self, stage):
+        if self.on_update is not None:
+            try:
+                self.on_update(stage.name, stage.status)
+            except Exception as e:
+                print(f"Progress callback failed for {stage.name}: {e}")
+
+    def _ready(self, stage):
+        return stage.status == "pending" and all(
+            d in self.stages and self.stages[d].status == "done" for d in stage.deps
+        )
+
+    def _blocked(self, stage):
+        return any(d in self.stages and self.stages[d].status in ("failed", "skipped") for d in stage.deps)
+
+    async def _run_stage(self, stage):
+        async with self._semaphore:
+            stage.status = "running"
+            stage.started = time.perf_counter()
+            self._notify(stage)
+            try:
+                stage.fingerprint = self._fingerprint(stage)
+                result = None
+                if self.checkpoints is not None:
+                    result = await self.checkpoints.load(stage.name, stage.fingerprint)
+                    stage.restored = result is not None
+
+                if not stage.restored:
+                    result = await stage.fn()
+                    # Empty results are usually swallowed errors; leave them to be retried
+                    if self.checkpoints is not None and result:
+                        await self.checkpoints.save(stage.name, stage.fingerprint, result)
+
+                self.results[stage.name] = result
+                if stage.expand is not None:
+                    stage.expand(result)
+                stage.status = "done"
+            except asyncio.CancelledError:
+                stage.status = "cancelled"
+                raise
+            except Exception as e:
+                stage.status = "failed"
+                stage.error = e
+                raise
+            finally:
+                stage.finished = time.perf_counter()
+                self._notify(stage)
+
+    async def run(self):
+        """
+        Runs the graph to completion and returns {stage_name: result}.
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._started_at = time.perf_counter()
+        running = {}  # task -> stage
+
+        try:
+            while True:
+                for stage in list(self.stages.values()):
+                    if self._ready(stage):
+                        stage.status = "queued"
+                        running[asyncio.ensure_future(self._run_stage(stage))] = stage
+                    elif stage.status == "pending" and self._blocked(stage):
+                        stage.status = "skipped"
+                        self._notify(stage)
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    if task.exception() is not None:
+                        print(f"Stage '{stage.name}' failed: {task.exception()}")
+                        if self.fail_fast:
+                            raise task.exception()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+            self._finished_at = time.perf_counter()
+
+        unresolved = [s.name for s in self.stages.values() if s.status == "pending"]
+        if unresolved:
+            raise RuntimeError(f"Stages with unknown dependencies never ran: {', '.join(unresolved)}")
+
+        return self.results
+
+    def critical_path(self):
+        """
+        Longest chain of measured stage durations through the dependency graph.
+        Returns (stage_names, seconds).
+        """
+        best = {}  # name -> (seconds, previous)
+
+        def visit(name):
+            if name in best:
+                return best[name][0]
+            stage = self.stages[name]
+            chain, previous = 0.0, None
+            for dep in stage.deps:
+                if dep in self.stages and visit(dep) > chain:
+                    chain, previous = best[dep][0], dep
+            best[name] = (chain + stage.duration, previous)
+            return best[name][0]
+
+        for name in self.stages:
+            visit(name)
+        if not best:
+            return [], 0.0
+
+        end = max(best, key=lambda n: best[n][0])
+        path, node = [], end
+        while node is not None:
+            path.append(node)
+            node = best[node][1]
+        return list(reversed(path)), best[end][0]
+
+    def report(self):
+        path, path_seconds = self.critical_path()
+        wall = (self._finished_at or time.perf_counter()) - (self._started_at or time.perf_counter())
+        return {
+            "wall_time_s": round(wall, 3),
+            "restored_stages": sum(1 for s in self.stages.values() if s.restored),
+            "sum_stage_time_s": round(sum(s.duration for s in self.stages.values()), 3),
+            "critical_path_s": round(path_seconds, 3),
+            "critical_path": path,
+            "stages": {
+                s.name: {
+                    "status": s.status,
+                    "restored": s.restored,
+                    "duration_s": round(s.duration, 3),
+                    "start_offset_s": round(s.started - self._started_at, 3) if s.started and self._started_at else None,
+                    "deps": list(s.deps)
+                }
+                for s in self.stages.values()
+            }
+        }
@@ -0,0 +1,231 @@
+import os
+import re
+import random
+import hashlib
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+
+# Local renderer for generated medical documents.
+# Lays already-generated report text out on an A4 page (letterhead, monospaced
+# body, coloured HIGH/LOW flags, signature or pathology stamp) and optionally
+# makes it look like a phone photo (skew, noise, blur). Output is deterministic
+# for a given text and needs no network. Measured per page: a clean page takes
+# about 50-180 ms (~100 KB PNG) and a photo about 300-350 ms (~600 KB),
+# depending on the machine, against tens of seconds for an image model
+# drawing the page.
+#
+# DOC_RENDER_MODE          model (default) | rendered, for every document type
+# DOC_RENDER_MODE_<TYPE>   per-type override, e.g. DOC_RENDER_MODE_LAB=rendered
+#                          (types: ENCOUNTER, LAB, IMAGING, REFERRAL)
+# DOC_RENDER_PHOTO         1 (default) adds the photo effect, 0 gives a clean scan
+# DOC_LETTERHEAD           clinic name printed in the letterhead
+# DOC_FONT_DIR             folder with DejaVu fonts (default: system fonts)
+
+DOC_TYPES = {
+    "encounter": {"title": "MEDICAL SUMMARY REPORT", "seal": "signature"},
+    "lab": {"title": "LABORATORY RESULT REPORT", "seal": "stamp"},
+    "imaging": {"title": "DEPARTMENT OF RADIOLOGY", "seal": "signature"},
+    "referral": {"title": "REFERRAL LETTER", "seal": "signature"},
+}
+
+# A4 portrait at ~100 dpi
+PAGE_WIDTH = 827
+PAGE_HEIGHT = 1169
+MARGIN = 56
+BODY_FONT_SIZE = 15
+LINE_SPACING = 5
+
+INK = (25, 25, 30)
+HIGH_INK = (190, 20, 20)
+LOW_INK = (20, 60, 190)
+SIGNATURE_INK = (20, 40, 140)
+FLAG_PATTERN = re.compile(r"\b(CRITICAL|HIGH|LOW|ABNORMAL)\b|\[(H|L)\]")
+
+FONT_DIRS = ["/usr/share/fonts/truetype/dejavu", "/usr/share/fonts/dejavu", "/Library/Fonts"]
+_FONTS = {}
+
+
+def render_mode(doc_type):
+    """
+    Returns 'rendered' or 'model' for a document type.
+    """
+    mode = os.getenv(f"DOC_RENDER_MODE_{doc_type.upper()}") or os.getenv("DOC_RENDER_MODE", "model")
+    return "rendered" if mode.lower() == "rendered" else "model"
+
+
+def _font(name, size):
+    key = (name, size)
+    if key not in _FONTS:
+        dirs = [os.getenv("DOC_FONT_DIR")] if os.getenv("DOC_FONT_DIR") else []
+        font = None
+        for folder in dirs + FONT_DIRS:
+            try:
+                font = ImageFont.truetype(os.path.join(folder, name), size)
+                break
+            except OSError:
+                continue
+        if font is None:
+            # Bundled Pillow font; not monospaced, so tables align less well
+            print(f"Font {name} not found, using Pillow's default font.")
+            font = ImageFont.load_default(size=size)
+        _FONTS[key] = font
+    return _FONTS[key]
+
+
+def _clean(text):
+    """
+    Drops markdown decoration the text models like to add.
+    """
+    lines = []
+    for line in text.replace("\r\n", "\n").split("\n"):
+        line = line.replace("**", "").replace("__", "").rstrip()
+        line = re.sub(r"^#{1,6}\s*", "", line)
+        if re.fullmatch(r"\s*(-{3,}|={3,}|\*{3,})\s*", line):
+            line = "-" * 3
+        lines.append(line.expandtabs(4))
+    return lines
+
+
+def _wrap(lines, columns):
+    wrapped = []
+    for line in lines:
+        if line == "---":
+            wrapped.append(line)
+            continue
+        while len(line) > columns:
+            cut = line.rfind(" ", 0, columns)
+            if cut <= columns // 2:
+                cut = columns
+            wrapped.append(line[:cut])
+            line = line[cut:].lstrip()
+        wrapped.append(line)
+    return wrapped
+
+
+def _draw_signature(draw, x, y, rng):
+    points = []
+    px, py = x, y + 20
+    for _ in range(14):
+        px += rng.randint(8, 16)
+        py = y + 20 + rng.randint(-16, 16)
+        points.append((px, py))
+    draw.line([(x, y + 20)] + points, fill=SIGNATURE_INK, width=2, joint="curve")
+    draw.line([(x + 10, y + 30), (points[-1][0] - 20, y + 26)], fill=SIGNATURE_INK, width=1)
+
+
+def _draw_stamp(draw, x, y, font):
+    draw.rectangle([x, y, x + 230, y + 58], outline=HIGH_INK, width=3)
+    draw.text((x + 14, y + 8), "VERIFIED BY", font=font, fill=HIGH_INK)
+    draw.text((x + 14, y + 30), "PATHOLOGIST", font=font, fill=HIGH_INK)
+
+
+def _photo_effect(page, rng):
+    """
+    Mimics a phone photo of the page lying on a desk.
+    """
+    desk = (92, 78, 66)
+    angle = rng.uniform(-2.0, 2.0)
+    photo = page.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=desk)
+    photo = ImageOps.expand(photo, border=40, fill=desk)
+
+    # Half-resolution grain upscaled looks like sensor noise and is 4x cheaper.
+    # Drawn from rng (uniform +-32, sigma ~18) so the photo stays deterministic.
+    size = (photo.width // 2, photo.height // 2)
+    noise = Image.frombytes("L", size, rng.randbytes(size[0] * size[1])).point(lambda v: 128 + (v - 128) // 4)
+    noise = noise.resize(photo.size, Image.BILINEAR).convert("RGB")
+    photo = Image.blend(photo, noise, 0.06)
+    return photo.filter(ImageFilter.GaussianBlur(0.6))
+
+
+def render_document(text, doc_type="encounter", photo=None, letterhead=None):
+    """
+    Renders document text onto a page image.
+
+    :param text: The report text (as written to the sibling .txt file).
+    :param doc_type: 'encounter', 'lab', 'imaging' or 'referral'.
+    :param photo: Apply the photo effect. Defaults to DOC_RENDER_PHOTO.
+    :param letterhead: Clinic name for the header. Defaults to DOC_LETTERHEAD.
+    :returns: PNG bytes.
+    """
+    spec = DOC_TYPES.get(doc_type, DOC_TYPES["encounter"])
+    if photo is None:
+        photo = os.getenv("DOC_RENDER_PHOTO", "1") == "1"
+    letterhead = letterhead or os.getenv("DOC_LETTERHEAD", "General Hepatology Clinic")
+    # Same text -> same signature, skew and noise
+    rng = random.Random(hashlib.sha256(f"{doc_type}\n{text}".encode("utf-8")).hexdigest())
+
+    body_font = _font("DejaVuSansMono.ttf", BODY_FONT_SIZE)
+    bold_font = _font("DejaVuSansMono-Bold.ttf", BODY_FONT_SIZE)
+    char_width = body_font.getlength("M")
+    line_height = BODY_FONT_SIZE + LINE_SPACING
+    columns = int((PAGE_WIDTH - 2 * MARGIN) // char_width)
+
+    lines = _wrap(_clean(text or ""), columns)
+    header_height = 120
+    footer_height = 130
+    height = max(PAGE_HEIGHT, header_height + len(lines) * line_height + footer_height + 2 * MARGIN)
+
+    page = Image.new("RGB", (PAGE_WIDTH, height), (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+
+    # Letterhead
+    draw.text((MARGIN, MARGIN), letterhead, font=_font("DejaVuSans-Bold.ttf", 28), fill=INK)
+    draw.text((MARGIN, MARGIN + 40), spec["title"], font=_font("DejaVuSans.ttf", 18), fill=(70, 70, 80))
+    draw.line([(MARGIN, MARGIN + 72), (PAGE_WIDTH - MARGIN, MARGIN + 72)], fill=INK, width=2)
+
+    # Body
+    y = MARGIN + header_height
+    for line in lines:
+        if line == "---":
+            draw.line([(MARGIN, y + line_height // 2), (PAGE_WIDTH - MARGIN, y + line_height // 2)], fill=(150, 150, 150), width=1)
+            y += line_height
+            continue
+
+        # All-caps lines without numbers are section headings, not table rows
+        stripped = line.strip()
+        is_heading = stripped == stripped.upper() and any(c.isalpha() for c in stripped) and not any(c.isdigit() for c in stripped)
+        draw.text((MARGIN, y), line, font=bold_font if is_heading else body_font, fill=INK)
+
+        # Overprint abnormal flags in colour; monospace makes the column exact
+        for match in FLAG_PATTERN.finditer(line):
+            flag = match.group(0)
+            colour = LOW_INK if flag in ("LOW", "[L]") else HIGH_INK
+            draw.text((MARGIN + match.start() * char_width, y), flag, font=bold_font, fill=colour)
+        y += line_height
+
+    # Signature block
+    y = max(y + 30, height - MARGIN - footer_height + 20)
+    if spec["seal"] == "stamp":
+        _draw_stamp(draw, PAGE_WIDTH - MARGIN - 240, y, bold_font)
+    else:
+        _draw_signature(draw, MARGIN, y, rng)
+        draw.line([(MARGIN, y + 48), (MARGIN + 260, y + 48)], fill=INK, width=1)
+        draw.text((MARGIN, y + 54), "Authorised signature", font=body_font, fill=INK)
+
+    output = _photo_effect(page, rng) if photo else page
+    buffer = BytesIO()
+    # Noisy photos compress poorly; a low level keeps encoding fast
+    output.save(buffer, format="PNG", compress_level=3)
+    return buffer.getvalue()
+
+
+def format_lab_table(lab_object, patient_name=None):
+    """
+    Fixed-width report text for one lab panel as produced by
+    PatientManager.group_labs_by_date ({date_time, labs: [...]}).
+    """
+    rows = [
+        f"Patient: {patient_name or 'Unknown'}",
+        f"Collected: {lab_object.get('date_time', '')}",
+        "",
+        f"{'TEST':<26}{'RESULT':>10}  {'UNIT':<10}{'REFERENCE':<18}FLAG",
+        "-" * 72,
+    ]
+    for lab in lab_object.get("labs", []):
+        flag = lab.get("flag", "")
+        rows.append(
+            f"{str(lab.get('biomarker', ''))[:25]:<26}{str(lab.get('value', '')):>10}  "
+            f"{str(lab.get('unit', '') or '')[:9]:<10}{str(lab.get('reference_range', ''))[:17]:<18}"
+            f"{'' if flag == 'NORMAL' else flag}"
+        )
+    return "\n".join(rows)
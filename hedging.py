@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+
+# Hedged requests across a primary and a fallback model.
+# The primary starts alone; if it has not produced a valid result by the
+# hedge deadline (a percentile of its recent latencies), the fallback is
+# launched too and whichever returns a valid result first wins. The loser is
+# cancelled. A primary that fails outright triggers the fallback immediately.
+# A cancelled attempt's elapsed time is kept as a censored sample (its real
+# latency is at least that long), so slow tails keep the deadline up instead
+# of only the fast finishers pulling it down.
+#
+# IMAGE_HEDGE             1 (default) to hedge, 0 for plain sequential fallback
+# IMAGE_HEDGE_PERCENTILE  latency percentile used as deadline (default 0.9)
+# IMAGE_HEDGE_DEADLINE    deadline in seconds until enough samples exist (default 45)
+# IMAGE_HEDGE_MIN_SAMPLES samples needed before the percentile is trusted (default 5)
+# IMAGE_HEDGE_MIN_DEADLINE lower bound on the deadline in seconds (default 5)
+
+
+class LatencyTracker:
+    def __init__(self, window=100):
+        self._samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HedgePolicy:
+    def __init__(self, enabled=True, percentile=0.9, default_deadline=45.0, min_samples=5, min_deadline=5.0):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.default_deadline = default_deadline
+        self.min_samples = min_samples
+        self.min_deadline = min_deadline
+
+        self._lock = threading.Lock()
+        self._latency = {}   # model -> LatencyTracker
+        self._counters = {}  # model -> dict
+        self.hedges_launched = 0
+
+    def _model(self, model):
+        if model not in self._latency:
+            self._latency[model] = LatencyTracker()
+            self._counters[model] = {"attempts": 0, "successes": 0, "failures": 0, "cancelled": 0, "wins": 0}
+        return self._latency[model], self._counters[model]
+
+    def deadline(self, model):
+        with self._lock:
+            return self._deadline(model)
+
+    def _deadline(self, model):
+        tracker, _ = self._model(model)
+        if len(tracker) < self.min_samples:
+            return self.default_deadline
+        return max(self.min_deadline, tracker.percentile(self.percentile))
+
+    def record(self, model, outcome, seconds=None):
+        """
+        :param outcome: 'success', 'failure', 'cancelled' or 'win'
+                        ('win' marks the attempt whose result was used).
+        :param seconds: Latency of a success, or time spent before a
+                        cancellation (a lower bound on its latency).
+        """
+        with self._lock:
+            tracker, counters = self._model(model)
+            if outcome == "win":
+                counters["wins"] += 1
+                return
+
+            counters["attempts"] += 1
+            if outcome == "success":
+                counters["successes"] += 1
+                tracker.add(seconds)
+            elif outcome == "failure":
+                counters["failures"] += 1
+            else:
+                counters["cancelled"] += 1
+                if seconds is not None:
+                    tracker.add(seconds)
+
+    def stats(self):
+        with self._lock:
+            result = {"enabled": self.enabled, "percentile": self.percentile, "models": {}}
+            for model, counters in self._counters.items():
+                p50 = self._latency[model].percentile(0.5)
+                result["models"][model] = dict(
+                    counters,
+                    latency_p50_s=round(p50, 3) if p50 is not None else None,
+                    latency_deadline_s=round(self._deadline(model), 3)
+                )
+            result["hedges_launched"] = self.hedges_launched
+            return result
+
+    async def run(self, attempts):
+        """
+        Runs hedged attempts.
+
+        :param attempts: Ordered list of (model_name, make_attempt) where
+                         make_attempt() returns an awaitable resolving to a
+                         result, or None when the model produced nothing usable.
+        :returns: (model_name, result) of the winner, or (None, None).
+        """
+        if not self.enabled or len(attempts) < 2:
+            for model, make_attempt in attempts:
+                result = await self._timed(model, make_attempt)
+                if result is not None:
+                    self.record(model, "win")
+                    return model, result
+            return None, None
+
+        pending = {}  # task -> model
+        started = {}  # task -> launch time
+        queue = list(attempts)
+
+        def launch():
+            model, make_attempt = queue.pop(0)
+            task = asyncio.ensure_future(self._timed(model, make_attempt))
+            pending[task] = model
+            started[task] = time.perf_counter()
+            return model
+
+        primary = launch()
+        try:
+            while pending:
+                timeout = self.deadline(primary) if queue else None
+                done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Deadline passed with the primary still running: hedge
+                    with self._lock:
+                        self.hedges_launched += 1
+                    hedge = launch()
+                    print(f"{primary} exceeded {timeout:.1f}s; hedging with {hedge}")
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    result = task.result()
+                    if result is not None:
+                        self.record(model, "win")
+                        return model, result
+
+                # Everything that finished failed; start the next model right away
+                if queue and not pending:
+                    launch()
+            return None, None
+        finally:
+            for task, model in pending.items():
+                if not task.done():
+                    task.cancel()
+                    self.record(model, "cancelled", time.perf_counter() - started[task])
+
+    async def _timed(self, model, make_attempt):
+        start = time.perf_counter()
+        try:
+            result = await make_attempt()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error encountered with {model}: {e}")
+            result = None
+
+        if result is None:
+            self.record(model, "failure")
+        else:
+            self.record(model, "success", time.perf_counter() - start)
+        return result
+
+
+_IMAGE_POLICY = None
+
+
+def get_image_hedge_policy():
+    global _IMAGE_POLICY
+    if _IMAGE_POLICY is None:
+        _IMAGE_POLICY = HedgePolicy(
+            enabled=os.getenv("IMAGE_HEDGE", "1") == "1",
+            percentile=float(os.getenv("IMAGE_HEDGE_PERCENTILE", "0.9")),
+            default_deadline=float(os.getenv("IMAGE_HEDGE_DEADLINE", "45")),
+            min_samples=int(os.getenv("IMAGE_HEDGE_MIN_SAMPLES", "5")),
+            min_deadline=float(os.getenv("IMAGE_HEDGE_MIN_DEADLINE", "5"))
+        )
+    return _IMAGE_POLICY
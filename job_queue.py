@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Background jobs with persistent state.
+# Jobs are rows in a SQLite table (JOB_DB_PATH, default jobs.db) and are run
+# by a pool of asyncio workers (JOB_WORKERS, default 2) inside the server
+# process. Jobs that were queued or running when the process stopped are put
+# back on the queue at startup; handlers are expected to be resumable
+# (patient generation is, through its stage checkpoints).
+#
+# Stage progress is kept in memory while a job runs and written to the store
+# whenever a stage finishes, so GET /jobs/{id} is cheap to poll. All job writes
+# go through one single-threaded writer, so a stage snapshot can never land
+# after (and overwrite) the job's final status update.
+
+
+class JobStore:
+    def __init__(self, db_path):
+        """
+        :param db_path: SQLite file; ':memory:' keeps jobs for the process lifetime only.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stages TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["stages"] = json.loads(job["stages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, kind, payload):
+        job_id = f"JOB-{uuid.uuid4().hex[:12].upper()}"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def update(self, job_id, **fields):
+        """
+        Updates columns of a job; stages/result are JSON-encoded here.
+        """
+        for key in ("stages", "result"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_running(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def list(self, status=None, limit=50):
+        query, args = "SELECT * FROM jobs", ()
+        if status:
+            query, args = query + " WHERE status = ?", (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+
+class JobProgress:
+    """
+    Stage-level progress of one running job, handed to the job handler.
+    """
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.stages = {}
+
+    def __call__(self, stage, status):
+        entry = self.stages.setdefault(stage, {})
+        entry["status"] = status
+        entry[f"{status}_at"] = time.time()
+        # Only terminal transitions are persisted; running ones stay in memory
+        if status not in ("queued", "running"):
+            self.queue._persist_stages(self.job_id, self.stages)
+
+
+class JobQueue:
+    def __init__(self, store, workers=2, max_attempts=3):
+        """
+        :param store: JobStore
+        :param workers: Number of jobs processed concurrently.
+        :param max_attempts: Jobs interrupted more often than this (e.g. a job
+                             that keeps crashing the process) are failed at startup.
+        """
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._handlers = {}
+        self._queue = None
+        self._tasks = []
+        self._live = {}  # job_id -> JobProgress
+        # Serialises store writes in submission order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store-writer")
+
+    def register(self, kind, handler):
+        """
+        :param handler: async handler(payload, progress) returning a JSON-able result.
+        """
+        self._handlers[kind] = handler
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self.store.unfinished):
+            job = await asyncio.to_thread(self.store.get, job_id)
+            if job["attempts"] >= self.max_attempts:
+                await self._write(self.store.update, job_id, status="failed", error="Interrupted too many times.", finished_at=time.time())
+                continue
+            print(f"Requeueing unfinished job {job_id} ({job['kind']})")
+            await self._write(self.store.update, job_id, status="queued")
+            self._queue.put_nowait(job_id)
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Let queued stage snapshots reach the store
+        await self._write(lambda: None)
+
+    async def submit(self, kind, payload):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'.")
+        job_id = await asyncio.to_thread(self.store.create, kind, payload)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is not None and job_id in self._live:
+            # Include in-flight stages that are not persisted yet
+            job["stages"] = dict(self._live[job_id].stages)
+        return job
+
+    def _write(self, fn, *args, **kwargs):
+        """
+        Queues a store write on the writer thread; returns an awaitable future.
+        """
+        return asyncio.get_running_loop().run_in_executor(self._writer, functools.partial(fn, *args, **kwargs))
+
+    def _persist_stages(self, job_id, stages):
+        snapshot = {stage: dict(entry) for stage, entry in stages.items()}
+        future = self._write(self.store.update, job_id, stages=snapshot)
+
+        def report_failure(f):
+            if not f.cancelled() and f.exception() is not None:
+                print(f"Failed to save stages of {job_id}: {f.exception()}")
+
+        future.add_done_callback(report_failure)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._live)
+        }
+
+    async def _worker(self, index):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Job worker {index} error on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+
+        progress = JobProgress(self, job_id)
+        progress.stages = dict(job["stages"])
+        self._live[job_id] = progress
+        await self._write(self.store.mark_running, job_id)
+        try:
+            result = await self._handlers[job["kind"]](job["payload"], progress)
+            # Queued behind every stage snapshot, so it is the last write
+            await self._write(
+                self.store.update, job_id,
+                status="succeeded", result=result, stages=progress.stages, error=None, finished_at=time.time()
+            )
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            await self._write(
+                self.store.update, job_id,
+                status="failed", error=str(e), stages=progress.stages, finished_at=time.time()
+            )
+        finally:
+            self._live.pop(job_id, None)
+
+
+_JOB_QUEUE = None
+
+
+def get_job_queue():
+    """
+    Returns the process-wide queue configured from JOB_DB_PATH and JOB_WORKERS.
+    Call start() on it once the event loop is running.
+    """
+    global _JOB_QUEUE
+    if _JOB_QUEUE is None:
+        _JOB_QUEUE = JobQueue(
+            JobStore(os.getenv("JOB_DB_PATH", "jobs.db")),
+            workers=int(os.getenv("JOB_WORKERS", "2"))
+        )
+    return _JOB_QUEUE
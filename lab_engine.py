@@ -0,0 +1,235 @@
+import os
+import re
+import numpy as np
+
+# Deterministic lab analytics for structured labs.
+# Generated patients have labs.json ([{biomarker, unit, referenceRange{min,max},
+# values[{t, value}]}]), so the lab board items don't need a model to re-read
+# the numbers from OCR text. LabFrame normalises biomarker names and units,
+# lays every measurement out as NumPy columns and derives latest/previous
+# values, HIGH/LOW/critical flags and per-biomarker series in one pass,
+# emitting the dashboard_lab_latest, dashboard_lab_chart and
+# dashboard_lab_track schemas directly.
+#
+# LAB_ENGINE   1 (default) use structured labs when available, 0 always asks the model
+
+LAB_ENGINE = os.getenv("LAB_ENGINE", "1") == "1"
+
+# Beyond these multiples of the reference limits a result is 'critical'
+CRITICAL_HIGH_FACTOR = 3.0
+CRITICAL_LOW_FACTOR = 0.5
+
+# Normalised name (lowercase, alphanumerics only) -> standard name
+BIOMARKER_ALIASES = {
+    "alt": "ALT", "sgpt": "ALT", "alaninetransaminase": "ALT", "alanineaminotransferase": "ALT",
+    "ast": "AST", "sgot": "AST", "aspartatetransaminase": "AST", "aspartateaminotransferase": "AST",
+    "alp": "ALP", "alkalinephosphatase": "ALP",
+    "ggt": "GGT", "gammagt": "GGT", "gammaglutamyltransferase": "GGT", "gammaglutamyltranspeptidase": "GGT",
+    "bilirubin": "Total Bilirubin", "totalbilirubin": "Total Bilirubin", "bilirubintotal": "Total Bilirubin", "tbil": "Total Bilirubin",
+    "directbilirubin": "Direct Bilirubin", "bilirubindirect": "Direct Bilirubin", "conjugatedbilirubin": "Direct Bilirubin", "dbil": "Direct Bilirubin",
+    "inr": "INR", "ptinr": "INR", "internationalnormalizedratio": "INR", "internationalnormalisedratio": "INR",
+    "albumin": "Albumin", "alb": "Albumin",
+    "creatinine": "Creatinine", "cr": "Creatinine",
+    "hemoglobin": "Hemoglobin", "haemoglobin": "Hemoglobin", "hgb": "Hemoglobin", "hb": "Hemoglobin",
+    "platelets": "Platelets", "plateletcount": "Platelets", "plt": "Platelets",
+    "wbc": "WBC", "whitebloodcells": "WBC", "whitebloodcellcount": "WBC",
+    "glucose": "Glucose",
+}
+
+# Liver panel first, everything else in order of appearance
+PRIORITY = ["ALT", "AST", "ALP", "GGT", "Total Bilirubin", "Direct Bilirubin", "INR", "Albumin"]
+
+UNIT_ALIASES = {
+    "u/l": "U/L", "iu/l": "U/L", "units/l": "U/L",
+    "mg/dl": "mg/dL", "g/dl": "g/dL", "g/l": "g/L",
+    "umol/l": "µmol/L", "µmol/l": "µmol/L", "μmol/l": "µmol/L",
+    "mmol/l": "mmol/L",
+}
+
+# (standard name, from unit, to unit) -> multiplier; inverses are derived
+UNIT_CONVERSIONS = {
+    ("Total Bilirubin", "µmol/L", "mg/dL"): 1 / 17.1,
+    ("Direct Bilirubin", "µmol/L", "mg/dL"): 1 / 17.1,
+    ("Creatinine", "µmol/L", "mg/dL"): 1 / 88.4,
+    ("Albumin", "g/L", "g/dL"): 0.1,
+    ("Hemoglobin", "g/L", "g/dL"): 0.1,
+    ("Glucose", "mmol/L", "mg/dL"): 18.0,
+}
+UNIT_CONVERSIONS.update({(name, to, frm): 1 / factor for (name, frm, to), factor in list(UNIT_CONVERSIONS.items())})
+
+
+def normalise_biomarker(name):
+    name = str(name or "").strip()
+    return BIOMARKER_ALIASES.get(re.sub(r"[^a-z0-9]", "", name.lower()), name)
+
+
+def normalise_unit(unit):
+    unit = str(unit or "").strip()
+    return UNIT_ALIASES.get(unit.lower(), unit)
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        # '<5', '1,250', '>= 3.2'
+        return float(re.sub(r"[<>=≤≥,\s]", "", str(value)))
+    except ValueError:
+        return None
+
+
+def _to_datetime(t):
+    text = str(t or "").strip()
+    # Drop fractional seconds / timezone; results are shown in clinic time
+    text = text[:19] if "T" in text else text[:10]
+    try:
+        return np.datetime64(text, "s")
+    except ValueError:
+        return None
+
+
+def _number(x):
+    """
+    JSON-friendly number: 52.0 -> 52, NaN -> None.
+    """
+    if x is None or np.isnan(x):
+        return None
+    x = float(x)
+    return int(x) if x.is_integer() else round(x, 4)
+
+
+class LabFrame:
+    def __init__(self, labs):
+        """
+        :param labs: Structured labs as in labs.json.
+        """
+        self.names = []    # series index -> display name
+        self.units = []    # series index -> unit
+        series = {}        # (name, unit) -> series index
+        canonical = {}     # name -> unit of its first series
+        rows = ([], [], [], [], [])  # series, t, value, ref min, ref max
+
+        for entry in labs or []:
+            name = normalise_biomarker(entry.get("biomarker"))
+            if not name:
+                continue
+            unit = normalise_unit(entry.get("unit"))
+            target = canonical.setdefault(name, unit)
+            factor = 1.0 if unit == target else UNIT_CONVERSIONS.get((name, unit, target))
+            if factor is None:
+                # No known conversion: keep it as a separate series
+                key, label = (name, unit), f"{name} ({unit})"
+            else:
+                key, label, unit = (name, target), name, target
+            if key not in series:
+                series[key] = len(self.names)
+                self.names.append(label)
+                self.units.append(unit)
+
+            ref = entry.get("referenceRange") or {}
+            ref_min, ref_max = _to_float(ref.get("min")), _to_float(ref.get("max"))
+            for point in entry.get("values") or []:
+                value, t = _to_float(point.get("value")), _to_datetime(point.get("t"))
+                if value is None or t is None:
+                    continue
+                rows[0].append(series[key])
+                rows[1].append(t)
+                rows[2].append(value * factor)
+                rows[3].append(np.nan if ref_min is None else ref_min * factor)
+                rows[4].append(np.nan if ref_max is None else ref_max * factor)
+
+        # Columns sorted by series, then time
+        index = np.array(rows[0], dtype=np.int64)
+        times = np.array(rows[1], dtype="datetime64[s]")
+        order = np.lexsort((times, index))
+        self.series = index[order]
+        self.times = times[order]
+        self.values = np.array(rows[2], dtype=np.float64)[order]
+        self.ref_min = np.array(rows[3], dtype=np.float64)[order]
+        self.ref_max = np.array(rows[4], dtype=np.float64)[order]
+        self.status = self._flags()
+
+        # Row ranges per series present in the data
+        starts = np.flatnonzero(np.r_[True, self.series[1:] != self.series[:-1]]) if len(self.series) else np.array([], dtype=np.int64)
+        self._ranges = {int(self.series[s]): (int(s), int(e)) for s, e in zip(starts, np.r_[starts[1:], len(self.series)])}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _flags(self):
+        # NaN limits compare False, so a missing bound never flags
+        with np.errstate(invalid="ignore"):
+            high = self.values > self.ref_max
+            low = self.values < self.ref_min
+            critical = (self.values >= self.ref_max * CRITICAL_HIGH_FACTOR) | (
+                (self.ref_min > 0) & (self.values <= self.ref_min * CRITICAL_LOW_FACTOR)
+            )
+        return np.select([critical, high, low], ["critical", "high", "low"], "normal")
+
+    def _ordered_series(self):
+        rank = {name: i for i, name in enumerate(PRIORITY)}
+        return sorted(self._ranges, key=lambda i: (rank.get(self.names[i].split(" (")[0], len(PRIORITY)), i))
+
+    def _range_text(self, row):
+        low, high = _number(self.ref_min[row]), _number(self.ref_max[row])
+        if low is not None and high is not None:
+            return f"{low}-{high}"
+        if high is not None:
+            return f"<{high}"
+        if low is not None:
+            return f">{low}"
+        return ""
+
+    def latest(self):
+        """
+        dashboard_lab_latest: newest result per biomarker with its flag and
+        the result before it.
+        """
+        results = []
+        for i in self._ordered_series():
+            start, end = self._ranges[i]
+            last = end - 1
+            results.append({
+                "name": self.names[i],
+                "value": _number(self.values[last]),
+                "unit": self.units[i],
+                "normalRange": self._range_text(last),
+                "status": str(self.status[last]),
+                "previousValue": _number(self.values[last - 1]) if end - start > 1 else None,
+                "date": str(self.times[last].astype("datetime64[D]"))
+            })
+        return results
+
+    def chart(self):
+        """
+        dashboard_lab_chart: chronological data points per biomarker.
+        """
+        dates = np.datetime_as_string(self.times, unit="D")
+        return [
+            {
+                "biomarker": self.names[i],
+                "data": [
+                    {"date": str(dates[row]), "value": _number(self.values[row]), "unit": self.units[i]}
+                    for row in range(*self._ranges[i])
+                ]
+            }
+            for i in self._ordered_series()
+        ]
+
+    def track(self):
+        """
+        dashboard_lab_track: series with unit and the latest reference range.
+        """
+        stamps = np.datetime_as_string(self.times, unit="s")
+        results = []
+        for i in self._ordered_series():
+            start, end = self._ranges[i]
+            results.append({
+                "biomarker": self.names[i],
+                "unit": self.units[i],
+                "referenceRange": {"min": _number(self.ref_min[end - 1]), "max": _number(self.ref_max[end - 1])},
+                "values": [{"t": str(stamps[row]), "value": _number(self.values[row])} for row in range(start, end)]
+            })
+        return results
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import contextlib
+import contextvars
+
+import bucket_ops
+
+# Content-addressed cache for text/JSON model responses.
+# A response is stored under the SHA-256 of everything that determines it
+# (model, system instruction, contents, schema and generation config), so a
+# repeated call with identical inputs is served without hitting Vertex.
+
+CACHE_VERSION = 1
+
+# Set for the duration of a request/job to skip the cache for every call in it
+_BYPASS = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for a genai response; callers only read `.text`.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+        self.from_cache = True
+
+
+class DiskCacheStore:
+    def __init__(self, directory, max_bytes):
+        """
+        One JSON file per key under <directory>/<key[:2]>/<key>.json.
+        Oldest files (by mtime) are evicted once max_bytes is exceeded.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set(self, key, record):
+        path = self._path(key)
+        data = json.dumps(record).encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            # An expired entry rewritten under the same key replaces its old size
+            try:
+                self._size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        try:
+            size = os.path.getsize(self._path(key))
+            os.remove(self._path(key))
+            with self._lock:
+                self._size -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        # Caller must hold the lock. Trim to 90% so we don't rescan on every write.
+        entries = sorted(self._scan(), key=lambda e: e[1])
+        self._size = sum(size for _, _, size in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, _, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+
+class BucketCacheStore:
+    def __init__(self, manager, max_bytes, prefix="llm_cache"):
+        """
+        Stores entries as blobs so every instance shares one cache.
+        Oldest blobs (by generation) are deleted once this instance sees the
+        prefix grow past max_bytes.
+
+        :param manager: A (blocking) bucket manager from bucket_ops. Entries
+                        bypass its blob LRU: each one is read once per lookup
+                        and would only push board data out of memory.
+        """
+        if isinstance(manager, bucket_ops.CachedBucketManager):
+            manager = manager.backend
+        self.manager = manager
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._size = None  # counted from a listing on the first write
+
+    def get(self, key):
+        raw = self.manager.read_file_as_string(f"{self.prefix}/{key}.json")
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+
+    def set(self, key, record):
+        data = json.dumps(record)
+        self.manager.create_file_from_string(data, f"{self.prefix}/{key}.json", content_type="application/json")
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(meta["size"] or 0 for meta in self._listing().values())
+            else:
+                self._size += len(data.encode("utf-8"))
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        self.manager.delete_file(f"{self.prefix}/{key}.json")
+
+    def _listing(self):
+        return self.manager.list_files_with_metadata(self.prefix)
+
+    def _evict(self):
+        # Caller must hold the lock. Rescan (other instances write too), trim to 90%.
+        entries = sorted(self._listing().items(), key=lambda item: item[1]["generation"])
+        self._size = sum(meta["size"] or 0 for _, meta in entries)
+        target = int(self.max_bytes * 0.9)
+        for name, meta in entries:
+            if self._size <= target:
+                break
+            if self.manager.delete_file(f"{self.prefix}/{name}"):
+                self._size -= meta["size"] or 0
+
+
+def _canonical(obj):
+    """
+    Converts SDK objects (pydantic models), bytes and containers into plain
+    JSON-able data so equal requests always hash the same.
+    """
+    if hasattr(obj, "model_dump"):
+        return _canonical(obj.model_dump(mode="json", exclude_none=True))
+    if isinstance(obj, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(obj).hexdigest()}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+class LLMResponseCache:
+    def __init__(self, store, ttl_seconds, max_temperature):
+        """
+        :param store: DiskCacheStore or BucketCacheStore.
+        :param ttl_seconds: Entries older than this are treated as misses.
+        :param max_temperature: Opted-in calls above this temperature are still
+                                not cached (sampled output should stay varied).
+        """
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def should_cache(self, config, use_cache=False):
+        """
+        :param use_cache: Whether the call site opted in; nothing is cached otherwise.
+        """
+        if _BYPASS.get() or not use_cache:
+            return False
+        temperature = getattr(config, "temperature", None)
+        return temperature is not None and temperature <= self.max_temperature
+
+    def make_key(self, model, contents, config, extra=None):
+        material = {
+            "version": CACHE_VERSION,
+            "model": model,
+            "contents": _canonical(contents),
+            "config": _canonical(config),
+            "extra": _canonical(extra)
+        }
+        encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    async def get(self, key):
+        record = await asyncio.to_thread(self.store.get, key)
+        if record is None or time.time() - record.get("created_at", 0) > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResponse(record["text"])
+
+    async def set(self, key, model, config, text):
+        if not text:
+            return
+        # Never pin a malformed JSON answer; the next run should get a fresh try
+        if getattr(config, "response_mime_type", None) == "application/json":
+            try:
+                json.loads(text)
+            except json.JSONDecodeError:
+                return
+
+        record = {"created_at": time.time(), "model": model, "text": text}
+        await asyncio.to_thread(self.store.set, key, record)
+        self.writes += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+@contextlib.contextmanager
+def bypass_cache():
+    """
+    Disables the response cache for every model call made inside the block,
+    including tasks spawned from it.
+    """
+    token = _BYPASS.set(True)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
+
+
+_LLM_CACHE = None
+_LLM_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Returns the process-wide response cache, or None when LLM_CACHE_BACKEND=off.
+
+    LLM_CACHE_BACKEND      disk (default) | bucket | off
+    LLM_CACHE_DIR          disk store folder (default .llm_cache)
+    LLM_CACHE_MAX_MB       store size bound, disk or bucket (default 256)
+    LLM_CACHE_TTL          seconds (default 7 days)
+    LLM_CACHE_MAX_TEMPERATURE  cache opted-in calls at or below this (default 0.3)
+    """
+    global _LLM_CACHE
+    backend = os.getenv("LLM_CACHE_BACKEND", "disk").lower()
+    if backend == "off":
+        return None
+
+    with _LLM_CACHE_LOCK:
+        if _LLM_CACHE is None:
+            max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+            if backend == "disk":
+                store = DiskCacheStore(directory=os.getenv("LLM_CACHE_DIR", ".llm_cache"), max_bytes=max_bytes)
+            elif backend == "bucket":
+                store = BucketCacheStore(bucket_ops.get_bucket_manager(), max_bytes=max_bytes)
+            else:
+                raise ValueError(f"Unknown LLM_CACHE_BACKEND '{backend}'. Use 'disk', 'bucket' or 'off'.")
+
+            _LLM_CACHE = LLMResponseCache(
+                store=store,
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                max_temperature=float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+            )
+        return _LLM_CACHE
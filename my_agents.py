@@ -2,14 +2,29 @@ import os
 import json
 import base64
 import uuid
+import copy
+import time
+import random
+import hashlib
 import asyncio
 import logging
-from google import genai
 from google.genai import types
 from fastapi import WebSocket
 from PIL import Image
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 import bucket_ops
+import client_registry
+import prompt_registry
+import llm_cache
+import rate_limiter
+import hedging
+import dag_scheduler
+import checkpoints
+import doc_renderer
+import board_context
+import context_cache
+import lab_engine
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -22,14 +37,151 @@ MODEL_PRE_CONSULT = "gemini-3-flash-preview"
 IMAGE_MODEL = "gemini-3-pro-image-preview"
 IMAGE_MODEL2 = "gemini-2.5-flash-image"
 
+# Fail at import (i.e. server boot) if any asset used below is missing or malformed
+prompt_registry.registry.require(
+    prompts=[
+        "basic_info_extractor",
+        "board_referral_parser",
+        "dashboard_analysis",
+        "dashboard_encounters_track",
+        "dashboard_lab_chart",
+        "dashboard_lab_latest",
+        "dashboard_lab_track",
+        "dashboard_medication_track",
+        "dashboard_patient_context",
+        "dashboard_pre_diagnosis",
+        "dashboard_risk_event_track",
+        "encounter_generator",
+        "encounter_narrative",
+        "encounter_parser",
+        "image_parser",
+        "imaging_report_generator",
+        "lab_generator",
+        "lab_parser",
+        "live_admin_agent",
+        "patient_generator",
+        "pre_consult_chat_generator",
+        "referral_generator",
+        "system_prompt_generator",
+    ],
+    schemas=[
+        "basic_info",
+        "board_referral_parser",
+        "dashboard_analysis",
+        "dashboard_encounters_track",
+        "dashboard_lab_chart",
+        "dashboard_lab_latest",
+        "dashboard_lab_track",
+        "dashboard_medication_track",
+        "dashboard_patient_context",
+        "dashboard_pre_diagnosis",
+        "dashboard_risk_event_track",
+        "encounter",
+        "image_parser",
+        "labs",
+        "pre_consult_admin",
+        "pre_consult_chat_generator",
+    ],
+    templates=[
+        "blank_pre_consult_form",
+    ]
+)
+
+# Decoding and re-encoding generated images is CPU-bound; keep it off the event loop
+_IMAGE_EXECUTOR = None
+
+
+def run_in_image_pool(func, *args):
+    global _IMAGE_EXECUTOR
+    if _IMAGE_EXECUTOR is None:
+        _IMAGE_EXECUTOR = ThreadPoolExecutor(
+            max_workers=int(os.getenv("IMAGE_WORKERS", "4")),
+            thread_name_prefix="image-io"
+        )
+    return asyncio.get_running_loop().run_in_executor(_IMAGE_EXECUTOR, func, *args)
+
+
+def to_png_bytes(image_bytes):
+    """
+    Returns the image as PNG bytes (the raw_data/*.png blobs), re-encoding
+    only when the model answered with another format.
+    """
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n":
+        return image_bytes
+    buffer = BytesIO()
+    Image.open(BytesIO(image_bytes)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Generated artifacts go straight to the bucket. Set ARTIFACT_DEBUG_DIR to
+# also keep a local copy per patient (what output/{patient_id} used to be).
+ARTIFACT_DEBUG_DIR = os.getenv("ARTIFACT_DEBUG_DIR")
+
+
+def write_debug_artifact(patient_id, name, data):
+    path = os.path.join(ARTIFACT_DEBUG_DIR, str(patient_id), os.path.basename(name))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
 class BaseLogicAgent:
     def __init__(self):
-        self.client = genai.Client(
-            vertexai=True, 
-            project=os.getenv("PROJECT_ID"), 
-            location=os.getenv("PROJECT_LOCATION", "us-central1")
+        # Shared, long-lived client; see client_registry
+        self.client = client_registry.get_genai_client()
+
+    async def generate_content(self, model, contents, config, use_cache=False, shared_context=None):
+        """
+        Single entry point for text/JSON model calls.
+        Serves repeated identical requests from llm_cache.
+
+        :param use_cache: Opt this call into llm_cache. Only deterministic
+                          extraction (the board builders) should; generation,
+                          OCR and chat always go to the model.
+        :param shared_context: context_cache.SharedContext holding a prefix common
+                               to several calls; `contents` is then only the delta.
+        """
+        cache = llm_cache.get_llm_cache()
+        cache_key = None
+        if cache is not None and cache.should_cache(config, use_cache):
+            # Key on the shared prefix's content, not on the per-run Vertex cache name
+            extra = shared_context.fingerprint if shared_context is not None else None
+            cache_key = cache.make_key(model, contents, config, extra=extra)
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        request_contents, request_config = contents, config
+        if shared_context is not None:
+            request_contents, request_config = await shared_context.prepare(contents, config)
+
+        if shared_context is not None:
+            # Streamed so the shared-context summary can report time to first token
+            make_request = lambda: context_cache.stream_content(self.client, model, request_contents, request_config)
+        else:
+            make_request = lambda: self.client.aio.models.generate_content(
+                model=model,
+                contents=request_contents,
+                config=request_config
             )
 
+        # Concurrency, RPM/TPM limits and quota backoff are shared per model
+        limiter = rate_limiter.get_limiter(model)
+        start = time.perf_counter()
+        response = await limiter.call(
+            make_request,
+            estimated_tokens=rate_limiter.estimate_tokens(request_contents, request_config)
+        )
+        if shared_context is not None:
+            shared_context.record(response, time.perf_counter() - start, response.first_token)
+
+        if cache_key is not None:
+            await cache.set(cache_key, model, config, response.text)
+        return response
+
 
 
 class PatientManager(BaseLogicAgent):
@@ -37,31 +189,36 @@ class PatientManager(BaseLogicAgent):
         super().__init__()
         # Additional initialization if needed
         self.args = args
-        if  self.args.get("patient_id"):
-            os.makedirs(f"output/{self.args['patient_id']}", exist_ok=True)
-            self.output_dir = f"output/{self.args['patient_id']}"
-
         self.bucket_path = f"patient_data/{self.args.get('patient_id')}"
 
-        self.gcs = bucket_ops.GCSBucketManager(bucket_name="clinic_sim")
+        self.gcs = bucket_ops.AsyncBucketManager()
 
         self.patient_profile = ""
         self.patient_system_prompt = ""
         self.encounters = []
         self.labs = []
 
+    async def _debug_artifact(self, name, data):
+        """
+        Keeps a local copy of an artifact when ARTIFACT_DEBUG_DIR is set.
+        """
+        if ARTIFACT_DEBUG_DIR and data:
+            await asyncio.to_thread(write_debug_artifact, self.args.get("patient_id"), name, data)
 
 
-    async def generate_patient_profile(self, input_criteria = None):
+    async def generate_patient_profile(self, input_criteria = None, with_basic_info=True):
+        """
+        :param with_basic_info: Also extract basic_info.json right away. The
+                                generation graph runs that as its own stage.
+        """
         if not input_criteria: 
             input_criteria = self.args
         
-        with open("system_prompts/patient_generator.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("patient_generator")
 
         prompt_content = f"Please generate a patient profile based on these parameters:\n{json.dumps(input_criteria, indent=2)}"
 
-        response = await self.client.aio.models.generate_content(
+        response = await self.generate_content(
             model=MODEL, 
             contents=prompt_content,
             config=types.GenerateContentConfig(
@@ -73,11 +230,11 @@ class PatientManager(BaseLogicAgent):
         
         # Return the generated text directly
         self.patient_profile = response.text
-        with open(f"{self.output_dir}/patient_profile.txt", "w", encoding="utf-8") as f:
-            f.write(self.patient_profile)
+        await self._debug_artifact("patient_profile.txt", self.patient_profile)
 
 
-        await self.generate_basic_info(self.patient_profile)
+        if with_basic_info:
+            await self.generate_basic_info(self.patient_profile)
             
         return response.text
     
@@ -85,15 +242,13 @@ class PatientManager(BaseLogicAgent):
         if not patient_profile_text: 
             patient_profile_text = self.patient_profile
         
-        with open("system_prompts/basic_info_extractor.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
-        with open("response_schema/basic_info.json", "r", encoding="utf-8") as f:
-            response_schema = json.load(f)
+        system_instruction = prompt_registry.get_prompt("basic_info_extractor")
+        response_schema = prompt_registry.get_schema("basic_info")
 
         try:
             prompt_content = f"PATIENT PROFILE:\n{patient_profile_text}\n{json.dumps(self.args)}\nTASK: Extract the basic demographic and administrative info for this patient."
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -105,7 +260,7 @@ class PatientManager(BaseLogicAgent):
             )
             
             res = json.loads(response.text)
-            self.gcs.create_file_from_string(json.dumps(res), f"{self.bucket_path}/basic_info.json", content_type="application/json")
+            await self.gcs.create_file_from_string(json.dumps(res), f"{self.bucket_path}/basic_info.json", content_type="application/json")
             return res
             
         except Exception as e:
@@ -117,8 +272,7 @@ class PatientManager(BaseLogicAgent):
             patient_profile_text = self.patient_profile
 
 
-        with open("system_prompts/system_prompt_generator.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("system_prompt_generator")
 
         prompt_content = (
             f"SOURCE PATIENT PROFILE:\n"
@@ -127,7 +281,7 @@ class PatientManager(BaseLogicAgent):
             f"Write the SYSTEM PROMPT for this patient."
         )
 
-        response = await self.client.aio.models.generate_content(
+        response = await self.generate_content(
             model=MODEL, 
             contents=prompt_content,
             config=types.GenerateContentConfig(
@@ -137,14 +291,12 @@ class PatientManager(BaseLogicAgent):
             )
         )
         self.patient_system_prompt = response.text
-        with open(f"{self.output_dir}/system_prompt.txt", "w", encoding="utf-8") as f:
-            f.write(self.patient_system_prompt)
+        await self._debug_artifact("system_prompt.txt", self.patient_system_prompt)
         return response.text
 
     async def generate_encounters_narrative(self, patient_profile_text, criteria):
 
-        with open("system_prompts/encounter_narrative.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("encounter_narrative")
 
         if not patient_profile_text: 
             return "Error: No patient profile provided."
@@ -162,7 +314,7 @@ class PatientManager(BaseLogicAgent):
                 f"For each encounter, provide full SOAP notes (Subjective, Objective, Assessment, Plan)."
             )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -178,12 +330,15 @@ class PatientManager(BaseLogicAgent):
             print(f"Error in generate_encounter_story: {e}") 
             return f"Error: {str(e)}"
 
-    async def generate_referral_letter(self):
-        with open("system_prompts/referral_generator.md", "r", encoding="utf-8") as f: 
-                system_instruction = f.read()
+    async def generate_referral_letter(self, with_image=True):
+        """
+        Writes raw_data/referral_letter.txt and, unless with_image is False,
+        its photo raw_data/referral_letter.png.
+        """
+        system_instruction = prompt_registry.get_prompt("referral_generator")
 
-        patient_profile_text = self.gcs.read_file_as_string(f"patient_data/{self.args.get('patient_id')}/patient_profile.txt")
-        encounter_narrative_text = self.gcs.read_file_as_string(f"patient_data/{self.args.get('patient_id')}/encounter_narrative.txt")
+        patient_profile_text = await self.gcs.read_file_as_string(f"patient_data/{self.args.get('patient_id')}/patient_profile.txt")
+        encounter_narrative_text = await self.gcs.read_file_as_string(f"patient_data/{self.args.get('patient_id')}/encounter_narrative.txt")
         try:
             # We explicitly instruct the model to look at the LAST encounter
             prompt_content = (
@@ -198,7 +353,7 @@ class PatientManager(BaseLogicAgent):
                 f"Format it strictly as a physical document text."
             )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -210,16 +365,81 @@ class PatientManager(BaseLogicAgent):
 
             referal_letter_text = response.text
 
-            img_op_path = await self.generate_referral_img(referal_letter_text, output_filename=f"{self.output_dir}/referral_letter.png")
+            image_bytes = None
+            if with_image:
+                image_bytes = await self.generate_referral_img(referal_letter_text, output_filename="referral_letter.png")
             
-            self.gcs.create_file_from_string(referal_letter_text, f"{self.bucket_path}/raw_data/referral_letter.txt", content_type="text/plain")
-            self.gcs.upload_file(img_op_path, f"{self.bucket_path}/raw_data/referral_letter.png")
+            await self.gcs.create_file_from_string(referal_letter_text, f"{self.bucket_path}/raw_data/referral_letter.txt", content_type="text/plain")
+            if image_bytes:
+                await self.gcs.create_file_from_string(image_bytes, f"{self.bucket_path}/raw_data/referral_letter.png", content_type="image/png")
             return response.text
             
         except Exception as e:
             print(f"Error in generate_letter_text: {e}") 
             return "Error generating letter."
 
+    async def _generate_document_image(self, prompt, output_filename, label="document", aspect_ratio="9:16"):
+        """
+        Asks the image models to draw a document photo and returns the first
+        valid image as PNG bytes. IMAGE_MODEL runs first; IMAGE_MODEL2 is
+        started as a hedge if the primary is slower than its latency deadline
+        or fails (see hedging). Any PNG re-encoding runs in the image worker
+        pool, so the event loop stays free while images are produced.
+
+        :param output_filename: Name of the local copy kept when ARTIFACT_DEBUG_DIR is set.
+        """
+        async def attempt(model_name):
+            print(f"Generating image for {label} using {model_name}...")
+
+            response = await rate_limiter.get_limiter(model_name).call(
+                lambda: self.client.aio.models.generate_content(
+                    model=model_name,
+                    contents=[prompt],
+                    config=types.GenerateContentConfig(
+                        image_config=types.ImageConfig(
+                            aspect_ratio=aspect_ratio,
+                        ),
+                    )
+                ),
+                estimated_tokens=rate_limiter.estimate_tokens(prompt)
+            )
+
+            # Check response parts for image data
+            for part in response.parts:
+                if part.inline_data is not None:
+                    return part.inline_data.data
+                elif part.text is not None:
+                    # Warning: Model returned text (likely a refusal or safety filter)
+                    print(f"Warning: {model_name} returned text instead of image: {part.text}")
+
+            print(f"{model_name} failed to produce an image.")
+            return None
+
+        model_name, image_bytes = await hedging.get_image_hedge_policy().run([
+            (IMAGE_MODEL, lambda: attempt(IMAGE_MODEL)),
+            (IMAGE_MODEL2, lambda: attempt(IMAGE_MODEL2)),
+        ])
+
+        if image_bytes is None:
+            print("Error: All image generation models failed.")
+            return None
+
+        png_bytes = await run_in_image_pool(to_png_bytes, image_bytes)
+        await self._debug_artifact(output_filename, png_bytes)
+        print(f"Success: Image generated with {model_name} for {label}")
+        return png_bytes
+
+    async def _render_document_image(self, document_text, doc_type, output_filename):
+        """
+        Lays the document text out locally (doc_renderer) instead of asking an
+        image model to draw it. Used when DOC_RENDER_MODE selects 'rendered'.
+        Returns PNG bytes.
+        """
+        png_bytes = await run_in_image_pool(doc_renderer.render_document, document_text, doc_type)
+        await self._debug_artifact(output_filename, png_bytes)
+        print(f"Success: {doc_type} document rendered")
+        return png_bytes
+
     async def generate_referral_img(self, letter_text, output_filename="referral_letter.png"):
         """
         Generates a photo of the printed letter.
@@ -228,6 +448,9 @@ class PatientManager(BaseLogicAgent):
             print("Error: No letter text provided.")
             return None
 
+        if doc_renderer.render_mode("referral") == "rendered":
+            return await self._render_document_image(letter_text, "referral", output_filename)
+
         # Construct a prompt that describes the physical object
         prompt = (
             f"A realistic, high-resolution, top-down close-up photo of a printed Medical Referral Letter. "
@@ -239,56 +462,25 @@ class PatientManager(BaseLogicAgent):
             f"Include a handwritten blue ink signature at the bottom."
         )
 
-        models_to_try = [IMAGE_MODEL, IMAGE_MODEL2]
-
-        for model_name in models_to_try:
-            try:
-                print(f"Generating image for referral letter using {model_name}...")
-                
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=[prompt],
-                    config=types.GenerateContentConfig(
-                        image_config=types.ImageConfig(
-                            aspect_ratio="9:16", # Letter aspect ratio
-                        ),
-                    )
-                )
-
-                for part in response.parts:
-                    if part.inline_data is not None:
-                        image = part.as_image()
-                        image.save(output_filename)
-                        print(f"Success: Referral Image saved to {output_filename}")
-                        return output_filename
-                    elif part.text is not None:
-                        print(f"Warning: {model_name} returned text: {part.text}")
-
-            except Exception as e:
-                print(f"Error with {model_name}: {e}")
-                continue
-
-        return None
+        return await self._generate_document_image(prompt, output_filename, label="referral letter")
 
     async def generate_encounters(self, patient_profile_text):
 
         if not patient_profile_text: 
             patient_profile_text = self.patient_profile
         
-        with open("system_prompts/encounter_generator.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
-        with open("response_schema/encounter.json", "r", encoding="utf-8") as f:
-            response_schema = json.load(f)
+        system_instruction = prompt_registry.get_prompt("encounter_generator")
+        response_schema = prompt_registry.get_schema("encounter")
 
         encounter_narrative = await self.generate_encounters_narrative(patient_profile_text, self.args)
 
-        self.gcs.create_file_from_string(encounter_narrative, f"{self.bucket_path}/encounter_narrative.txt", content_type="text/plain")
+        await self.gcs.create_file_from_string(encounter_narrative, f"{self.bucket_path}/encounter_narrative.txt", content_type="text/plain")
 
         try:
             # We explicitly ask for a list of encounters based on the profile
             prompt = f"Patient Profile:\n{patient_profile_text}\n\nEncounter Narrative:\n{encounter_narrative}\nTask: Generate the past medical encounters timeline for this patient as a JSON array."
             
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -301,8 +493,7 @@ class PatientManager(BaseLogicAgent):
             
             res = json.loads(response.text)
             self.encounters = res
-            with open(f"{self.output_dir}/encounters.json", "w", encoding="utf-8") as f:
-                json.dump(self.encounters, f, indent=4)
+            await self._debug_artifact("encounters.json", json.dumps(self.encounters, indent=4))
             return res
         except Exception as e:
             print(f"Error in generate_encounters: {e}") 
@@ -313,10 +504,8 @@ class PatientManager(BaseLogicAgent):
             patient_profile_text = self.patient_profile
             encounters = self.encounters
 
-        with open("system_prompts/lab_generator.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
-        with open("response_schema/labs.json", "r", encoding="utf-8") as f:
-            response_schema = json.load(f)
+        system_instruction = prompt_registry.get_prompt("lab_generator")
+        response_schema = prompt_registry.get_schema("labs")
 
         try:
             # We prompt the model to focus on the 'Clinical Reasoning' section of the profile
@@ -327,7 +516,7 @@ class PatientManager(BaseLogicAgent):
                 f"Ensure the abnormal values align with the diagnosis described above."
             )
             
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -341,8 +530,7 @@ class PatientManager(BaseLogicAgent):
             res = json.loads(response.text)
 
             self.labs = res
-            with open(f"{self.output_dir}/labs.json", "w", encoding="utf-8") as f:
-                json.dump(self.labs, f, indent=4)
+            await self._debug_artifact("labs.json", json.dumps(self.labs, indent=4))
             return res
         except Exception as e:
             print(f"Error in generate_labs: {e}") 
@@ -395,8 +583,7 @@ class PatientManager(BaseLogicAgent):
         return sorted_results
 
     async def imaging_doc_parser(self, encounter_object):
-        with open("system_prompts/imaging_report_generator.md", "r", encoding="utf-8") as f: 
-                system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("imaging_report_generator")
 
         if not encounter_object: 
             return None
@@ -431,7 +618,7 @@ class PatientManager(BaseLogicAgent):
                 f"Format it as a clean, professional medical document."
             )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -449,8 +636,7 @@ class PatientManager(BaseLogicAgent):
 
 
     async def lab_doc_parser(self, lab_encounter_json,patient_name):
-        with open("system_prompts/lab_parser.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("lab_parser")
 
         if not lab_encounter_json: 
             return "Error: Empty Data"
@@ -467,7 +653,7 @@ class PatientManager(BaseLogicAgent):
                 f"TASK: Format this into a clean, fixed-width Laboratory Result Report."
             )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -485,8 +671,7 @@ class PatientManager(BaseLogicAgent):
 
 
     async def encounter_doc_parser(self, encounter_object):
-        with open("system_prompts/encounter_parser.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("encounter_parser")
 
         if not encounter_object: 
             return "Error: Empty Data"
@@ -495,7 +680,7 @@ class PatientManager(BaseLogicAgent):
             # We pass the raw JSON to the model
             prompt_content = f"Raw Encounter Data:\n{json.dumps(encounter_object, indent=2)}\n\nTask: Format this into a printable Medical Summary Report text."
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -516,7 +701,9 @@ class PatientManager(BaseLogicAgent):
         if not document_text:
             print("Error: No document text provided.")
             return None
-        
+
+        if doc_renderer.render_mode("encounter") == "rendered":
+            return await self._render_document_image(document_text, "encounter", output_filename)
 
 
         # Construct a prompt that asks the model to render the specific text
@@ -531,53 +718,28 @@ class PatientManager(BaseLogicAgent):
             f"Ensure the Hospital Header and Patient Name are prominent and legible. Generate the fictional signature of the doctor at the bottom."
         )
 
-        models_to_try = [IMAGE_MODEL, IMAGE_MODEL2]
+        return await self._generate_document_image(prompt, output_filename, label="encounter report")
 
-        for model_name in models_to_try:
-            try:
-                print(f"Generating image for radiology report using {model_name}...")
-                
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=[prompt],
-                    config=types.GenerateContentConfig(
-                        image_config=types.ImageConfig(
-                            aspect_ratio="9:16",
-                        ),
-                    )
-                )
-
-                # Check response parts for image data
-                for part in response.parts:
-                    if part.inline_data is not None:
-                        # SUCCESS: Save and return immediately
-                        image = part.as_image()
-                        image.save(output_filename)
-                        print(f"Success: Image generated with {model_name} and saved to {output_filename}")
-                        return output_filename
-                    elif part.text is not None:
-                        # Warning: Model returned text (likely a refusal or safety filter)
-                        print(f"Warning: {model_name} returned text instead of image: {part.text}")
-
-                print(f"{model_name} failed to produce an image. Retrying with next model...")
-
-            except Exception as e:
-                print(f"Error encountered with {model_name}: {e}. Retrying with next model...")
-                continue # Explicitly continue to the next model in the list
 
-        # If loop finishes and no image was returned
-        print("Error: All image generation models failed.")
-        return None
-
-
-    async def generate_lab_img(self, lab_object, patient_name, output_filename="lab_report.png"):
+    async def generate_lab_img(self, lab_object, patient_name, output_filename="lab_report.png", document_text=None):
+        """
+        :param document_text: Already formatted lab report text for lab_object;
+                              when omitted it is generated with lab_doc_parser.
+        """
 
         if not lab_object:
             print("Error: No lab object provided.")
             return None
         
+        if doc_renderer.render_mode("lab") == "rendered":
+            # The structured panel can be laid out without a model call
+            if not document_text:
+                document_text = doc_renderer.format_lab_table(lab_object, patient_name)
+            return await self._render_document_image(document_text, "lab", output_filename)
+
         # Generate the formatted text table first
-        document_text = await self.lab_doc_parser(lab_object, patient_name)
+        if not document_text:
+            document_text = await self.lab_doc_parser(lab_object, patient_name)
 
         # Construct a prompt specifically for tabular lab data
         prompt = (
@@ -591,43 +753,7 @@ class PatientManager(BaseLogicAgent):
             f"Include a 'Verified by Pathologist' signature or stamp at the bottom."
         )
 
-        models_to_try = [IMAGE_MODEL, IMAGE_MODEL2]
-
-        for model_name in models_to_try:
-            try:
-                print(f"Generating image for lab report using {model_name}...")
-                
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=[prompt],
-                    config=types.GenerateContentConfig(
-                        image_config=types.ImageConfig(
-                            aspect_ratio="9:16",
-                        ),
-                    )
-                )
-
-                # Check response parts for image data
-                for part in response.parts:
-                    if part.inline_data is not None:
-                        # SUCCESS: Save and return immediately
-                        image = part.as_image()
-                        image.save(output_filename)
-                        print(f"Success: Image generated with {model_name} and saved to {output_filename}")
-                        return output_filename
-                    elif part.text is not None:
-                        # Warning: Model returned text (likely a refusal or safety filter)
-                        print(f"Warning: {model_name} returned text instead of image: {part.text}")
-
-                print(f"{model_name} failed to produce an image. Retrying with next model...")
-
-            except Exception as e:
-                print(f"Error encountered with {model_name}: {e}. Retrying with next model...")
-                continue # Explicitly continue to the next model in the list
-
-        # If loop finishes and no image was returned
-        print("Error: All image generation models failed.")
-        return None
+        return await self._generate_document_image(prompt, output_filename, label="lab report")
 
     async def generate_imaging_report_img(self, imaging_doc_text, output_filename="radiology_report.png"):
 
@@ -635,8 +761,10 @@ class PatientManager(BaseLogicAgent):
             print("Error: No imaging document text provided.")
             return None
 
-        with open(f"{self.output_dir}/imaging_doc_text.txt", "w", encoding="utf-8") as f:
-            f.write(imaging_doc_text)
+        await self._debug_artifact("imaging_doc_text.txt", imaging_doc_text)
+
+        if doc_renderer.render_mode("imaging") == "rendered":
+            return await self._render_document_image(imaging_doc_text, "imaging", output_filename)
 
         # CLEANING STEP: 
         # The previous agent adds a hidden "[[IMAGE_PROMPT...]]" at the bottom.
@@ -660,53 +788,15 @@ class PatientManager(BaseLogicAgent):
             f"Include a signature at the bottom."
         )
 
-        models_to_try = [IMAGE_MODEL, IMAGE_MODEL2]
-
-        for model_name in models_to_try:
-            try:
-                print(f"Generating image for radiology report using {model_name}...")
-                
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=[prompt],
-                    config=types.GenerateContentConfig(
-                        image_config=types.ImageConfig(
-                            aspect_ratio="9:16",
-                        ),
-                    )
-                )
-
-                # Check response parts for image data
-                for part in response.parts:
-                    if part.inline_data is not None:
-                        # SUCCESS: Save and return immediately
-                        image = part.as_image()
-                        image.save(output_filename)
-                        print(f"Success: Image generated with {model_name} and saved to {output_filename}")
-                        return output_filename
-                    elif part.text is not None:
-                        # Warning: Model returned text (likely a refusal or safety filter)
-                        print(f"Warning: {model_name} returned text instead of image: {part.text}")
-
-                print(f"{model_name} failed to produce an image. Retrying with next model...")
-
-            except Exception as e:
-                print(f"Error encountered with {model_name}: {e}. Retrying with next model...")
-                continue # Explicitly continue to the next model in the list
-
-        # If loop finishes and no image was returned
-        print("Error: All image generation models failed.")
-        return None
+        return await self._generate_document_image(prompt, output_filename, label="radiology report")
 
 
     async def generate_pre_consultation_chat(self):
-        with open("system_prompts/pre_consult_chat_generator.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
-        with open("response_schema/pre_consult_chat_generator.json", "r", encoding="utf-8") as f:
-            response_schema = json.load(f)
+        system_instruction = prompt_registry.get_prompt("pre_consult_chat_generator")
+        response_schema = prompt_registry.get_schema("pre_consult_chat_generator")
 
-        patient_profile = self.gcs.read_file_as_string(f"{self.bucket_path}/patient_profile.txt")
-        file_inventory = json.loads(self.gcs.read_file_as_string(f"{self.bucket_path}/raw_data.json"))
+        patient_profile = await self.gcs.read_file_as_string(f"{self.bucket_path}/patient_profile.txt")
+        file_inventory = json.loads(await self.gcs.read_file_as_string(f"{self.bucket_path}/raw_data.json"))
         try:
             # 1. Summarize the Context for the LLM
             # We explicitly list the filenames so the LLM knows what to "upload"
@@ -726,7 +816,7 @@ class PatientManager(BaseLogicAgent):
                 f"The Patient must answer according to their Persona (e.g., if anxious, sound anxious) and upload the files when asked."
             )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -738,275 +828,219 @@ class PatientManager(BaseLogicAgent):
             )
             
             res = json.loads(response.text)
-            self.gcs.create_file_from_string(json.dumps(res, indent=4), f"{self.bucket_path}/pre_consultation_chat.json", content_type="application/json")
+            await self.gcs.create_file_from_string(json.dumps(res, indent=4), f"{self.bucket_path}/pre_consultation_chat.json", content_type="application/json")
             return res
         except Exception as e:
             print(f"Error in generate_transcript: {e}") 
             return {"conversation": []}
         
 
-    async def generate_ground_truth(self):
-        print("Generating Ground Truth Data...")
-        print("Generating Patient Profile...")
-        patient_profile = await self.generate_patient_profile()
-        self.gcs.create_file_from_string(patient_profile, f"{self.bucket_path}/patient_profile.txt", content_type="text/plain")
-
-        print("Generating System Prompt...")
-        patient_system_prompt = await self.generate_system_prompt(patient_profile)
-        self.gcs.create_file_from_string(patient_system_prompt, f"{self.bucket_path}/system_prompt.txt", content_type="text/plain")
-
-        print("Generating Encounters...")
-        encounters = await self.generate_encounters(patient_profile)
-        self.gcs.create_file_from_string(json.dumps(encounters, indent=4), f"{self.bucket_path}/encounters.json", content_type="application/json")
-
-        print("Generating Labs...")
-        labs = await self.generate_labs(patient_profile, encounters)
-        self.gcs.create_file_from_string(json.dumps(labs, indent=4), f"{self.bucket_path}/labs.json", content_type="application/json")
-
-        grouped_labs = self.group_labs_by_date(labs)
-
-        encounter_docs = []
-        for i, encounter in enumerate(encounters):
-            encounter_doc = await self.encounter_doc_parser(encounter)
-            encounter_docs.append({
-                "file" : f"encounter_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt",
-                "date_time": encounter['encounter']['meta']['date_time'],
-                "encounter_report_text": encounter_doc
-            })
-            # Save each individual encounter report text file
-            self.gcs.create_file_from_string(
-                encounter_doc, 
-                f"{self.bucket_path}/raw_data/encounter_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt", 
-                content_type="text/plain"
-            )
+    async def generate_ground_truth_patient(self, on_update=None):
+        """
+        Generates the complete ground-truth record for one patient.
 
+        The work is a dependency graph run by dag_scheduler, so independent
+        stages overlap instead of running one after another:
 
-        lab_docs = []
-        for i, lab_entry in enumerate(grouped_labs):
-            lab_doc = await self.lab_doc_parser(lab_entry, encounters[0].get("patient",{}).get("name"))
-            lab_docs.append({
-                "file" : f"lab_report_{i}_{lab_entry['date_time'].split('T')[0]}.txt",
-                "image_file" : f"lab_report_{i}_{lab_entry['date_time'].split('T')[0]}.txt",
-                "date_time": lab_entry["date_time"],
-                "lab_report_text": lab_doc
-            })
-            # Save each individual lab report text file
-            self.gcs.create_file_from_string(
-                lab_doc, 
-                f"{self.bucket_path}/raw_data/lab_report_{i}_{lab_entry['date_time'].split('T')[0]}.txt", 
-                content_type="text/plain"
-            )
+            profile -> basic_info, system_prompt, encounters
+            encounters -> labs, referral_letter, encounter_doc_i, imaging_doc_i
+            labs -> lab_doc_i
+            *_doc_i -> *_img_i, referral_letter -> referral_letter_img
+            every *_doc_i -> raw_data_index
+            pre_consultation_chat (independent)
 
-        imaging_docs = []
-        for i, encounter in enumerate(encounters):
-            if encounter.get("encounter",{}).get("plan",{}).get("investigations",{}).get("imaging"):
-                imaging_doc = await self.imaging_doc_parser(encounter)
-                imaging_docs.append({
-                    "file" : f"imaging_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt",
-                    "date_time": encounter['encounter']['meta']['date_time'],
-                    "imaging_report_text": imaging_doc
-                })
-                # Save each individual imaging report text file
-                self.gcs.create_file_from_string(
-                    imaging_doc, 
-                    f"{self.bucket_path}/raw_data/imaging_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt", 
-                    content_type="text/plain"
-                )
-
-        raw_data = {
-            "encounter_reports": encounter_docs,
-            "lab_reports": lab_docs,
-            "imaging_reports": imaging_docs
-        }
-        self.gcs.create_file_from_string(json.dumps(raw_data, indent=4), f"{self.bucket_path}/raw_data.json", content_type="application/json")
-
-        ### GENERATE IMAGES
-        print("Generating Encounter Images...")
-        for enc_doc in encounter_docs:
-            img_file = await self.generate_encounter_img(enc_doc["encounter_report_text"], output_filename=f"{self.output_dir}/{enc_doc['file'].replace('.txt','.png')}")
-            if img_file:
-                # Upload to GCS
-                with open(img_file, "rb") as f:
-                    self.gcs.create_file_from_string(
-                        f.read(), 
-                        f"{self.bucket_path}/raw_data/{enc_doc['file'].replace('.txt','.png')}", 
-                        content_type="image/png"
-                    )
-        print("Generating Lab Images...")
-        for lab_doc in lab_docs:
-            img_file = await self.generate_lab_img(
-                lab_entry, 
-                encounters[0].get("patient",{}).get("name"), 
-                output_filename=f"{self.output_dir}/{lab_doc['file'].replace('.txt','.png')}"
-            )
-            if img_file:
-                # Upload to GCS
-                with open(img_file, "rb") as f:
-                    self.gcs.create_file_from_string(
-                        f.read(), 
-                        f"{self.bucket_path}/raw_data/{lab_doc['file'].replace('.txt','.png')}", 
-                        content_type="image/png"
-                    )
-        print("Generating Imaging Report Images...")
-        for img_doc in imaging_docs:
-            img_file = await self.generate_imaging_report_img(
-                img_doc["imaging_report_text"], 
-                output_filename=f"{self.output_dir}/{img_doc['file'].replace('.txt','.png')}"
-            )
-            if img_file:
-                # Upload to GCS
-                with open(img_file, "rb") as f:
-                    self.gcs.create_file_from_string(
-                        f.read(), 
-                        f"{self.bucket_path}/raw_data/{img_doc['file'].replace('.txt','.png')}", 
-                        content_type="image/png"
-                    )
+        Per-document stages are added once the encounter and lab lists exist.
+        PATIENT_GEN_CONCURRENCY caps how many stages run at once (the model
+        limiter still applies underneath).
 
-        print()
-        res = {
-            "conversation" : [
-                    {
-                    'sender': 'admin',
-                    'message': 'Hello, this is Linda the Hepatology Clinic admin desk. How can I help you today?'
-                    }
-            ]
-        }
-        self.gcs.create_file_from_string(json.dumps(res, indent=4), f"patient_data/{self.args.get('patient_id')}/pre_consultation_chat.json", content_type="application/json")
+        Completed stages are checkpointed under patient_data/{id}/ (see
+        checkpoints), so calling this again for the same patient_id and seed
+        resumes after the last completed stage. GENERATION_CHECKPOINTS=0
+        turns this off.
 
-    async def generate_ground_truth_patient(self):
+        :param on_update: Optional callback(stage_name, status) for progress reporting.
+        :returns: Scheduler report with wall time and critical path.
+        """
         print("Generating Ground Truth Data...")
-        print("Generating Patient Profile...")
-        patient_profile = await self.generate_patient_profile()
-        self.gcs.create_file_from_string(patient_profile, f"{self.bucket_path}/patient_profile.txt", content_type="text/plain")
-
-        print("Generating System Prompt...")
-        patient_system_prompt = await self.generate_system_prompt(patient_profile)
-        self.gcs.create_file_from_string(patient_system_prompt, f"{self.bucket_path}/system_prompt.txt", content_type="text/plain")
-
-        print("Generating Encounters...")
-        encounters = await self.generate_encounters(patient_profile)
-        self.gcs.create_file_from_string(json.dumps(encounters, indent=4), f"{self.bucket_path}/encounters.json", content_type="application/json")
-
-        print("Generating Labs...")
-        labs = await self.generate_labs(patient_profile, encounters)
-        self.gcs.create_file_from_string(json.dumps(labs, indent=4), f"{self.bucket_path}/labs.json", content_type="application/json")
-
-        self.generate_referral_letter()
-        grouped_labs = self.group_labs_by_date(labs)
-
-        encounter_docs = []
-        for i, encounter in enumerate(encounters):
-            encounter_doc = await self.encounter_doc_parser(encounter)
-            encounter_docs.append({
-                "file" : f"encounter_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt",
-                "date_time": encounter['encounter']['meta']['date_time'],
-                "encounter_report_text": encounter_doc
-            })
-            # Save each individual encounter report text file
-            self.gcs.create_file_from_string(
-                encounter_doc, 
-                f"{self.bucket_path}/raw_data/encounter_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt", 
-                content_type="text/plain"
-            )
-
+        store = None
+        if os.getenv("GENERATION_CHECKPOINTS", "1") == "1":
+            store = checkpoints.StageCheckpoints(self.gcs, self.bucket_path)
+        scheduler = dag_scheduler.DAGScheduler(
+            max_concurrency=int(os.getenv("PATIENT_GEN_CONCURRENCY", "6")),
+            on_update=on_update,
+            checkpoints=store,
+            salt=json.dumps(self.args, sort_keys=True, default=str)
+        )
+        results = scheduler.results
+
+        # raw_data.json sections, in generation order: (stage, entry, text_field)
+        raw_index = {"encounter_reports": [], "lab_reports": [], "imaging_reports": []}
+
+        def add_document(key, stem, make_text, make_image, deps, section, entry, text_field):
+            """
+            Registers '<key>_doc' (text -> raw_data/<stem>.txt) and
+            '<key>_img' (photo of that text -> raw_data/<stem>.png).
+            """
+            async def doc():
+                text = _require_generated_text(f"{key}_doc", await make_text())
+                await self.gcs.create_file_from_string(text, f"{self.bucket_path}/raw_data/{stem}.txt", content_type="text/plain")
+                return text
+
+            async def img():
+                image_bytes = await make_image(results[f"{key}_doc"], f"{stem}.png")
+                if not image_bytes:
+                    # Fail the stage so the run reports the gap and resume retries it
+                    raise RuntimeError(f"Stage '{key}_img' failed: no image generated")
+                blob_name = f"{self.bucket_path}/raw_data/{stem}.png"
+                await self.gcs.create_file_from_string(image_bytes, blob_name, content_type="image/png")
+                return blob_name
+
+            scheduler.add(f"{key}_doc", doc, deps)
+            scheduler.add(f"{key}_img", img, [f"{key}_doc"])
+            raw_index[section].append((f"{key}_doc", entry, text_field))
+
+        async def profile():
+            print("Generating Patient Profile...")
+            patient_profile = await self.generate_patient_profile(with_basic_info=False)
+            await self.gcs.create_file_from_string(patient_profile, f"{self.bucket_path}/patient_profile.txt", content_type="text/plain")
+            return patient_profile
+
+        async def basic_info():
+            return await self.generate_basic_info(results["profile"])
+
+        async def system_prompt():
+            print("Generating System Prompt...")
+            patient_system_prompt = await self.generate_system_prompt(results["profile"])
+            await self.gcs.create_file_from_string(patient_system_prompt, f"{self.bucket_path}/system_prompt.txt", content_type="text/plain")
+            return patient_system_prompt
+
+        async def encounters():
+            print("Generating Encounters...")
+            encounters = await self.generate_encounters(results["profile"])
+            await self.gcs.create_file_from_string(json.dumps(encounters, indent=4), f"{self.bucket_path}/encounters.json", content_type="application/json")
+            return encounters
+
+        def add_encounter_documents(encounters):
+            for i, encounter in enumerate(encounters):
+                date_time = encounter['encounter']['meta']['date_time']
+                stem = f"encounter_report_{i}_{date_time.split('T')[0]}"
+                add_document(
+                    f"encounter_{i}", stem,
+                    make_text=lambda e=encounter: self.encounter_doc_parser(e),
+                    make_image=lambda text, path: self.generate_encounter_img(text, output_filename=path),
+                    deps=["encounters"],
+                    section="encounter_reports",
+                    entry={"file": f"{stem}.txt", "date_time": date_time},
+                    text_field="encounter_report_text"
+                )
 
-        lab_docs = []
-        for i, lab_entry in enumerate(grouped_labs):
-            lab_doc = await self.lab_doc_parser(lab_entry, encounters[0].get("patient",{}).get("name"))
-            lab_docs.append({
-                "file" : f"lab_report_{i}_{lab_entry['date_time'].split('T')[0]}.txt",
-                "image_file" : f"lab_report_{i}_{lab_entry['date_time'].split('T')[0]}.txt",
-                "date_time": lab_entry["date_time"],
-                "lab_report_text": lab_doc
-            })
-            # Save each individual lab report text file
-            self.gcs.create_file_from_string(
-                lab_doc, 
-                f"{self.bucket_path}/raw_data/lab_report_{i}_{lab_entry['date_time'].split('T')[0]}.txt", 
-                content_type="text/plain"
-            )
+            for i, encounter in enumerate(encounters):
+                if encounter.get("encounter",{}).get("plan",{}).get("investigations",{}).get("imaging"):
+                    date_time = encounter['encounter']['meta']['date_time']
+                    stem = f"imaging_report_{i}_{date_time.split('T')[0]}"
+                    add_document(
+                        f"imaging_{i}", stem,
+                        make_text=lambda e=encounter: self.imaging_doc_parser(e),
+                        make_image=lambda text, path: self.generate_imaging_report_img(text, output_filename=path),
+                        deps=["encounters"],
+                        section="imaging_reports",
+                        entry={"file": f"{stem}.txt", "date_time": date_time},
+                        text_field="imaging_report_text"
+                    )
 
-        imaging_docs = []
-        for i, encounter in enumerate(encounters):
-            if encounter.get("encounter",{}).get("plan",{}).get("investigations",{}).get("imaging"):
-                imaging_doc = await self.imaging_doc_parser(encounter)
-                imaging_docs.append({
-                    "file" : f"imaging_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt",
-                    "date_time": encounter['encounter']['meta']['date_time'],
-                    "imaging_report_text": imaging_doc
-                })
-                # Save each individual imaging report text file
-                self.gcs.create_file_from_string(
-                    imaging_doc, 
-                    f"{self.bucket_path}/raw_data/imaging_report_{i}_{encounter['encounter']['meta']['date_time'].split('T')[0]}.txt", 
-                    content_type="text/plain"
+        async def labs():
+            print("Generating Labs...")
+            encounters = results["encounters"]
+            labs = await self.generate_labs(results["profile"], encounters)
+            await self.gcs.create_file_from_string(json.dumps(labs, indent=4), f"{self.bucket_path}/labs.json", content_type="application/json")
+            return labs
+
+        def add_lab_documents(labs):
+            encounters = results["encounters"]
+            patient_name = (encounters[0] if encounters else {}).get("patient",{}).get("name")
+            for i, lab_entry in enumerate(self.group_labs_by_date(labs)):
+                stem = f"lab_report_{i}_{lab_entry['date_time'].split('T')[0]}"
+                add_document(
+                    f"lab_{i}", stem,
+                    make_text=lambda entry=lab_entry: self.lab_doc_parser(entry, patient_name),
+                    # Each image is drawn from its own lab panel's text
+                    make_image=lambda text, path, entry=lab_entry: self.generate_lab_img(entry, patient_name, output_filename=path, document_text=text),
+                    deps=["labs"],
+                    section="lab_reports",
+                    entry={"file": f"{stem}.txt", "image_file": f"{stem}.txt", "date_time": lab_entry["date_time"]},
+                    text_field="lab_report_text"
                 )
 
-        raw_data = {
-            "encounter_reports": encounter_docs,
-            "lab_reports": lab_docs,
-            "imaging_reports": imaging_docs
-        }
-        self.gcs.create_file_from_string(json.dumps(raw_data, indent=4), f"{self.bucket_path}/raw_data.json", content_type="application/json")
-
-        ### GENERATE IMAGES
-        print("Generating Encounter Images...")
-        for enc_doc in encounter_docs:
-            img_file = await self.generate_encounter_img(enc_doc["encounter_report_text"], output_filename=f"{self.output_dir}/{enc_doc['file'].replace('.txt','.png')}")
-            if img_file:
-                # Upload to GCS
-                with open(img_file, "rb") as f:
-                    self.gcs.create_file_from_string(
-                        f.read(), 
-                        f"{self.bucket_path}/raw_data/{enc_doc['file'].replace('.txt','.png')}", 
-                        content_type="image/png"
-                    )
-        print("Generating Lab Images...")
-        for lab_doc in lab_docs:
-            img_file = await self.generate_lab_img(
-                lab_entry, 
-                encounters[0].get("patient",{}).get("name"), 
-                output_filename=f"{self.output_dir}/{lab_doc['file'].replace('.txt','.png')}"
-            )
-            if img_file:
-                # Upload to GCS
-                with open(img_file, "rb") as f:
-                    self.gcs.create_file_from_string(
-                        f.read(), 
-                        f"{self.bucket_path}/raw_data/{lab_doc['file'].replace('.txt','.png')}", 
-                        content_type="image/png"
-                    )
-        print("Generating Imaging Report Images...")
-        for img_doc in imaging_docs:
-            img_file = await self.generate_imaging_report_img(
-                img_doc["imaging_report_text"], 
-                output_filename=f"{self.output_dir}/{img_doc['file'].replace('.txt','.png')}"
-            )
-            if img_file:
-                # Upload to GCS
-                with open(img_file, "rb") as f:
-                    self.gcs.create_file_from_string(
-                        f.read(), 
-                        f"{self.bucket_path}/raw_data/{img_doc['file'].replace('.txt','.png')}", 
-                        content_type="image/png"
-                    )
+            # Every document stage exists now (encounters ran before labs)
+            doc_stages = [stage for section in raw_index.values() for stage, _, _ in section]
+            scheduler.add("raw_data_index", raw_data_index, doc_stages)
 
-        print()
-        res = {
-            "conversation" : [
-                    {
-                    'sender': 'admin',
-                    'message': 'Hello, this is Linda the Hepatology Clinic admin desk. How can I help you today?'
-                    }
-            ]
-        }
-        self.gcs.create_file_from_string(json.dumps(res, indent=4), f"patient_data/{self.args.get('patient_id')}/pre_consultation_chat.json", content_type="application/json")
+        async def raw_data_index():
+            raw_data = {
+                section: [dict(entry, **{text_field: results[stage]}) for stage, entry, text_field in items]
+                for section, items in raw_index.items()
+            }
+            await self.gcs.create_file_from_string(json.dumps(raw_data, indent=4), f"{self.bucket_path}/raw_data.json", content_type="application/json")
+            return raw_data
+
+        async def pre_consultation_chat():
+            res = {
+                "conversation" : [
+                        {
+                        'sender': 'admin',
+                        'message': 'Hello, this is Linda the Hepatology Clinic admin desk. How can I help you today?'
+                        }
+                ]
+            }
+            await self.gcs.create_file_from_string(json.dumps(res, indent=4), f"patient_data/{self.args.get('patient_id')}/pre_consultation_chat.json", content_type="application/json")
+            return res
+
+        scheduler.add("profile", profile)
+        scheduler.add("basic_info", basic_info, ["profile"])
+        scheduler.add("system_prompt", system_prompt, ["profile"])
+        scheduler.add("encounters", encounters, ["profile"], expand=add_encounter_documents)
+        scheduler.add("labs", labs, ["encounters"], expand=add_lab_documents)
+        async def referral_letter():
+            # Reads the profile and encounter narrative back from the bucket
+            return _require_generated_text("referral_letter", await self.generate_referral_letter(with_image=False))
+
+        async def referral_letter_img():
+            image_bytes = await self.generate_referral_img(results["referral_letter"], output_filename="referral_letter.png")
+            if not image_bytes:
+                raise RuntimeError("Stage 'referral_letter_img' failed: no image generated")
+            blob_name = f"{self.bucket_path}/raw_data/referral_letter.png"
+            await self.gcs.create_file_from_string(image_bytes, blob_name, content_type="image/png")
+            return blob_name
+
+        scheduler.add("referral_letter", referral_letter, ["encounters"])
+        scheduler.add("referral_letter_img", referral_letter_img, ["referral_letter"])
+        scheduler.add("pre_consultation_chat", pre_consultation_chat)
+
+        try:
+            await scheduler.run()
+        except Exception:
+            # Kept for callers that report timings of failed runs (cohort_cli)
+            self.generation_report = scheduler.report()
+            if store is not None:
+                await store.set_status("failed", self.generation_report)
+            raise
+
+        report = scheduler.report()
+        self.generation_report = report
+        if store is not None:
+            await store.set_status("complete", report)
+        print(
+            f"Ground truth for {self.args.get('patient_id')} generated in {report['wall_time_s']}s "
+            f"({len(report['stages'])} stages, {report['restored_stages']} restored, {report['sum_stage_time_s']}s sequential). "
+            f"Critical path {report['critical_path_s']}s: {' -> '.join(report['critical_path'])}"
+        )
+        return report
 
 
 class PreConsulteAgent(BaseLogicAgent):
     def __init__(self):
         super().__init__()  
-        self.gcs = bucket_ops.GCSBucketManager(bucket_name="clinic_sim")
+        self.gcs = bucket_ops.AsyncBucketManager()
 
     def _get_available_slots(self):
         """
@@ -1029,23 +1063,20 @@ class PreConsulteAgent(BaseLogicAgent):
         user_attachments = user_request.get("patient_attachment", [])
         user_form_data = user_request.get("patient_form", {})
 
-        with open("system_prompts/live_admin_agent.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("live_admin_agent")
         
         # Load the Strict JSON Schema
-        with open("response_schema/pre_consult_admin.json", "r", encoding="utf-8") as f:
-            response_schema = json.load(f)
+        response_schema = prompt_registry.get_schema("pre_consult_admin")
 
         # Blank form template for SEND_FORM action
-        with open("utils/blank_pre_consult_form.json", "r", encoding="utf-8") as f:
-            blank_form = json.load(f)
+        blank_form = prompt_registry.get_template("blank_pre_consult_form")
 
         # 2. Load History
         history_path = f"patient_data/{patient_id}/pre_consultation_chat.json"
         
         # Handle case where file doesn't exist (First run)
         try:
-            chat_data = json.loads(self.gcs.read_file_as_string(history_path))
+            chat_data = json.loads(await self.gcs.read_file_as_string(history_path))
         except:
             # Initialize if missing
             chat_data = {"conversation": []}
@@ -1070,7 +1101,7 @@ class PreConsulteAgent(BaseLogicAgent):
 
         try:
             # 5. Call LLM with JSON Schema
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL_PRE_CONSULT, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1078,7 +1109,9 @@ class PreConsulteAgent(BaseLogicAgent):
                     response_schema=response_schema,
                     system_instruction=system_instruction, 
                     temperature=0.3
-                )
+                ),
+                # Live conversation: never replay an earlier turn's reply
+                use_cache=False
             )
             
             # 6. Parse the LLM Response
@@ -1105,7 +1138,7 @@ class PreConsulteAgent(BaseLogicAgent):
 
             # 8. Save back to GCS
             chat_data["conversation"] = history
-            self.gcs.create_file_from_string(
+            await self.gcs.create_file_from_string(
                 json.dumps(chat_data, indent=4), 
                 history_path, 
                 content_type="application/json"
@@ -1123,23 +1156,204 @@ class PreConsulteAgent(BaseLogicAgent):
             }
 
 
+# What the document generators return instead of raising
+GENERATION_ERROR_TEXTS = {
+    "Error: Empty Data",
+    "Error parsing document.",
+    "Error parsing lab document.",
+    "Error generating imaging report.",
+    "Error generating letter.",
+}
+
+
+def _require_generated_text(stage, text):
+    """
+    Raises when a generator returned its error text, so the stage fails
+    (and is retried on resume) instead of checkpointing the error.
+    """
+    if text in GENERATION_ERROR_TEXTS:
+        raise RuntimeError(f"Stage '{stage}' failed: {text}")
+    return text
+
+
+# raw_data.json sections written by generate_ground_truth_patient -> OCR type
+GROUND_TRUTH_SECTIONS = {"encounter_reports": "encounter", "lab_reports": "lab", "imaging_reports": "imaging"}
+# Generated files raw_data.json doesn't index, typed by file name
+GROUND_TRUTH_PREFIXES = {"referral_letter": "referral"}
+
+# Dashboard builders: (board_items/<item>.json, RawDataProcessing method,
+# items it reads, inputs it is built from). Inputs are document types,
+# 'records' (every parsed document), 'chat' or 'labs' (structured labs.json);
+# see PatientRunContext.input_hash.
+BOARD_BUILDERS = [
+    ("referral", "process_referral_board", [], ["referral"]),
+    ("raw_images", "process_image_board", [], ["encounter", "lab", "imaging"]),
+    ("encounters", "process_encounter_board", [], ["encounter"]),
+    ("patient_context", "process_dashboard_patient_context", [], ["records", "chat"]),
+    ("dashboard_analysis", "process_dashboard_analysis_object", [], ["records", "chat"]),
+    ("dashboard_lab_latest", "dashboard_latest_labs", [], ["lab", "labs"]),
+    ("dashboard_lab_chart", "dashboard_lab_chart_data", [], ["lab", "labs"]),
+    ("dashboard_pre_diagnosis", "dashboard_pre_diagnosis", [], ["records", "chat"]),
+    ("dashboard_lab_track", "get_lab_track", [], ["lab", "labs"]),
+    ("dashboard_encounters_track", "get_encounters_track", ["encounters"], ["records", "chat"]),
+    ("dashboard_medication_track", "get_medication_track", ["encounters"], ["records", "chat"]),
+    ("dashboard_risk_event_track", "get_risk_event_track", ["encounters"], ["records", "chat"]),
+]
+# board item -> (system prompt, response schema) its builder loads; both are
+# part of the item's fingerprint so editing either rebuilds it
+BOARD_BUILDER_ASSETS = {
+    "referral": ("board_referral_parser", "board_referral_parser"),
+    "encounters": ("encounter_generator", "encounter"),
+    "patient_context": ("dashboard_patient_context", "dashboard_patient_context"),
+    "dashboard_analysis": ("dashboard_analysis", "dashboard_analysis"),
+    "dashboard_lab_latest": ("dashboard_lab_latest", "dashboard_lab_latest"),
+    "dashboard_lab_chart": ("dashboard_lab_chart", "dashboard_lab_chart"),
+    "dashboard_pre_diagnosis": ("dashboard_pre_diagnosis", "dashboard_pre_diagnosis"),
+    "dashboard_lab_track": ("dashboard_lab_track", "dashboard_lab_track"),
+    "dashboard_encounters_track": ("dashboard_encounters_track", "dashboard_encounters_track"),
+    "dashboard_medication_track": ("dashboard_medication_track", "dashboard_medication_track"),
+    "dashboard_risk_event_track": ("dashboard_risk_event_track", "dashboard_risk_event_track"),
+}
+# Bump to rebuild every board item after a change to the builders' code
+BOARD_FINGERPRINT_VERSION = 3
+
+def assemble_board_objects(board_items):
+    """
+    Turns board items ({'referral': {...}, 'encounters': [...], ...}) into the
+    component list of board_objects.json, in board_items/ file name order.
+    The inputs are not modified.
+    """
+    board_objects = []
+
+    for file in sorted(f"{item}.json" for item in board_items):
+        raw_objects = copy.deepcopy(board_items[file[:-len(".json")]])
+
+        if "referral.json" in file:
+            rec = {
+                "id": "referral-doctor-info",
+                "date" : raw_objects.get("date",""),
+                "visitType" : raw_objects.get("visitType",""),
+                "provider" : raw_objects.get("provider",""),
+                "specialty" : raw_objects.get("specialty",""),
+                "rawText" : raw_objects.get("rawText",""),
+                "dataSource" : raw_objects.get("dataSource",""),
+                "highlights" : raw_objects.get("highlights",[]),
+                "componentType"  : "RawClinicalNote",
+                "zone" : "referral-zone"
+            }
+            board_objects.append(rec)
+            rec2 = {
+                "id": "referral-letter-image",
+                "date" : raw_objects.get("date",""),
+                "studyType" : raw_objects.get("studyType",""),
+                "provider" : raw_objects.get("provider",""),
+                "specialty" : raw_objects.get("specialty",""),
+                "imageUrl" : raw_objects.get("imageUrl",""),
+                "dataSource" : raw_objects.get("dataSource",""),
+                "componentType"  : "RadiologyImage",
+                "zone" : "referral-zone"
+            }
+            board_objects.append(rec2)
+        elif "raw_images.json" in file:
+            for r in raw_objects:
+                r['componentType'] = "RadiologyImage"
+                r['zone'] = "raw-ehr-data-zone"
+            board_objects += raw_objects
+        elif "encounters.json" in file:
+            for i, e in enumerate(raw_objects):
+                e['id'] = f"single-encounter-{i+1}"
+                e['componentType'] = "SingleEncounterDocument"
+                e['zone'] = "data-zone"
+                board_objects.append(e)
+        elif "patient_context.json" in file:
+            raw_objects['id'] = "dashboard-item-patient-context"
+            raw_objects['componentType'] = "PatientContext"
+            raw_objects['zone'] = "adv-event-zone"
+            board_objects.append(raw_objects)
+
+            # Same content, separate object: appending the one dict twice
+            # turned the PatientContext entry into a second Sidebar
+            sidebar = dict(raw_objects, id="sidebar-1", componentType="Sidebar")
+            board_objects.append(sidebar)
+        elif "dashboard_analysis.json" in file:
+            raw_objects['id'] = "adverse-event-analytics"
+            raw_objects['componentType'] = "AdverseEventAnalytics"
+            raw_objects['zone'] = "adv-event-zone"
+            
+            board_objects.append(raw_objects)
+        elif "dashboard_lab_latest.json" in file:
+            board_objects.append({
+                "id": "dashboard-item-lab-table",
+                "componentType": "LabTable",
+                "zone" : "adv-event-zone",
+                "labResults" : raw_objects
+            })
+        elif "dashboard_lab_chart.json" in file:
+            board_objects.append({
+                "id": "dashboard-item-lab-chart",
+                "componentType": "LabChart",
+                "zone" : "adv-event-zone",
+                "chartData" : raw_objects
+            })
+        elif "dashboard_pre_diagnosis.json" in file:
+            board_objects.append({
+                "id": "differential-diagnosis",
+                "componentType": "DifferentialDiagnosis",
+                "zone" : "adv-event-zone",
+                "differential" : raw_objects
+            })
+        elif "dashboard_encounters_track.json" in file:
+            board_objects.append({
+                "id": "encounter-track-1",
+                "componentType": "EncounterTrack",
+                "zone" : "adv-event-zone",
+                "encounters" : raw_objects
+            })
+        elif "dashboard_medication_track.json" in file:
+            board_objects.append({
+                "id": "medication-track-1",
+                "componentType": "MedicationTrack",
+                "zone" : "adv-event-zone",
+                "data" : raw_objects
+            })
+        elif "dashboard_lab_track.json" in file:
+            board_objects.append({
+                "id": "lab-track-1",
+                "componentType": "LabTrack",
+                "zone" : "adv-event-zone",
+                "data" : raw_objects
+            })
+        elif "dashboard_risk_event_track.json" in file:
+            board_objects.append({
+                "id": "risk-track-1",
+                "componentType": "RiskTrack",
+                "zone" : "adv-event-zone",
+                "risks" : raw_objects.get("risks")
+            })
+            board_objects.append({
+                "id": "key-events-track-1",
+                "componentType": "KeyEventsTrack",
+                "zone" : "adv-event-zone",
+                "events" : raw_objects.get("events")
+            })
+
+    return board_objects
+
 
 class RawDataProcessing(BaseLogicAgent):
     def __init__(self):
         super().__init__()  
-        self.gcs = bucket_ops.GCSBucketManager(bucket_name="clinic_sim")
+        self.gcs = bucket_ops.AsyncBucketManager()
 
     
     async def get_text_doc(self, image_path: str):
-        with open("system_prompts/image_parser.md", "r", encoding="utf-8") as f: 
-            system_instruction = f.read()
+        system_instruction = prompt_registry.get_prompt("image_parser")
 
-        with open("response_schema/image_parser.json", "r", encoding="utf-8") as f:
-            response_schema = json.load(f)
+        response_schema = prompt_registry.get_schema("image_parser")
 
         prompt_text = "Analyze this image. 1. Classify the document type based on headers and content. 2. Extract all visible text verbatim."
             
-        image_bytes = self.gcs.read_file_as_bytes(image_path)
+        image_bytes = await self.gcs.read_file_as_bytes(image_path)
         mime_type = "image/png"
 
         # Prepare content parts (Text + Image)
@@ -1148,7 +1362,7 @@ class RawDataProcessing(BaseLogicAgent):
             types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
         ]
 
-        response = await self.client.aio.models.generate_content(
+        response = await self.generate_content(
             model=MODEL, # Ensure this model supports Vision (e.g. gemini-1.5-flash)
             contents=contents,
             config=types.GenerateContentConfig(
@@ -1161,214 +1375,389 @@ class RawDataProcessing(BaseLogicAgent):
         
         return json.loads(response.text)
     
-    async def process_raw_data(self, patient_id: str):
+    async def _ocr_file(self, file_path, semaphore):
+        """
+        OCRs one document under the shared concurrency bound, retrying
+        failures (malformed JSON, transient errors) with jittered backoff.
+        Returns None when every attempt failed so one bad file doesn't sink
+        the others.
+        """
+        retries = int(os.getenv("OCR_RETRIES", "2"))
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    return await self.get_text_doc(file_path)
+            except Exception as e:
+                if attempt == retries:
+                    print(f"OCR failed for {file_path} after {attempt + 1} attempts: {e}")
+                    return None
+                delay = random.uniform(0, 2 ** attempt)
+                print(f"OCR error for {file_path} ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _ground_truth_documents(self, base_path, listing):
+        """
+        Maps generated images to the text they were rendered from:
+        {png_name: {"type": ..., "txt": txt_name, "content": text or None}}.
+
+        An image counts as generated when its sibling .txt exists in raw_data/.
+        Type and text come from raw_data.json; files it doesn't index (the
+        referral letter) are typed from their name and read from the .txt.
+        """
+        raw_str = await self.gcs.read_file_as_string(f"{base_path}/raw_data.json")
+        indexed = {}
+        try:
+            raw_data = json.loads(raw_str) if raw_str else {}
+        except json.JSONDecodeError:
+            print(f"Unreadable {base_path}/raw_data.json; ground truth limited to file names.")
+            raw_data = {}
+        for section, doc_type in GROUND_TRUTH_SECTIONS.items():
+            for entry in raw_data.get(section, []):
+                indexed[entry.get("file")] = (doc_type, entry.get(f"{doc_type}_report_text"))
+
+        documents = {}
+        for name in listing:
+            if ".png" not in name:
+                continue
+            txt_name = name.replace(".png", ".txt")
+            if txt_name not in listing:
+                continue
+            if txt_name in indexed:
+                doc_type, content = indexed[txt_name]
+            else:
+                prefix = next((p for p in GROUND_TRUTH_PREFIXES if name.startswith(p)), None)
+                if prefix is None:
+                    continue
+                doc_type, content = GROUND_TRUTH_PREFIXES[prefix], None
+            documents[name] = {"type": doc_type, "txt": txt_name, "content": content}
+        return documents
+
+    async def process_raw_data(self, patient_id: str, force: bool = False, use_ground_truth: bool = None):
+        """
+        OCRs the images in raw_data/ (OCR_CONCURRENCY at a time) and writes
+        parsed_raw_data.json in listing order.
+
+        Incremental: ocr_manifest.json records the fingerprint (MD5, or the
+        storage generation when no MD5 is available) of every image already
+        parsed, so only new or changed images go to the model and the rest
+        are reused from the existing parsed_raw_data.json. Files that keep
+        failing are left out and reported.
+
+        Ground-truth mode is for synthetic patients: images that
+        generate_ground_truth_patient rendered from a known text take that
+        text and type directly, and only the remaining (user-uploaded) images
+        are OCR'd. It assumes generated images are not replaced by uploads of
+        the same name.
+
+        :param force: Re-OCR every image regardless of the manifest.
+        :param use_ground_truth: Use generated text where available.
+                                 Defaults to OCR_GROUND_TRUTH=1.
+        """
+        if use_ground_truth is None:
+            use_ground_truth = os.getenv("OCR_GROUND_TRUTH", "0") == "1"
+
         # pre_consult_chat_path = f"patient_data/{patient_id}/pre_consultation_chat.json"
         # content_str = self.gcs.read_file_as_string(pre_consult_chat_path)
         # history_data = json.loads(content_str)
 
-        file_list = self.gcs.list_files(f"patient_data/{patient_id}/raw_data/")
+        base_path = f"patient_data/{patient_id}"
+        listing, manifest_str, parsed_str = await asyncio.gather(
+            self.gcs.list_files_with_metadata(f"{base_path}/raw_data/"),
+            self.gcs.read_file_as_string(f"{base_path}/ocr_manifest.json"),
+            self.gcs.read_file_as_string(f"{base_path}/parsed_raw_data.json"),
+        )
+        images = {name: meta for name, meta in listing.items() if ".png" in name}
+        fingerprints = {name: str(meta.get("md5") or meta.get("generation")) for name, meta in images.items()}
+
+        ground_truth = await self._ground_truth_documents(base_path, listing) if use_ground_truth else {}
+        for name in ground_truth:
+            # Switching modes re-parses the file instead of reusing the other path's result
+            fingerprints[name] = f"gt:{fingerprints[name]}"
+
+        manifest = {}
+        existing = {}
+        if not force:
+            try:
+                manifest = json.loads(manifest_str).get("files", {}) if manifest_str else {}
+                existing = {r.get("source_file"): r for r in json.loads(parsed_str)} if parsed_str else {}
+            except (json.JSONDecodeError, AttributeError):
+                print(f"Unreadable OCR manifest or parsed data for {patient_id}; re-processing everything.")
+                manifest, existing = {}, {}
+
+        pending = [
+            name for name in images
+            if manifest.get(name) != fingerprints[name] or name not in existing
+        ]
+        if not pending and set(existing) == set(images):
+            print(f"Raw data for {patient_id} unchanged; nothing to OCR.")
+            return {"processed": 0, "reused": len(images), "ground_truth": 0, "failed": []}
+
+        async def from_ground_truth(att):
+            document = ground_truth[att]
+            content = document["content"]
+            if content is None:
+                content = await self.gcs.read_file_as_string(f"{base_path}/raw_data/{document['txt']}")
+            if content is None:
+                return None
+            return {"type": document["type"], "content": content}
+
+        semaphore = asyncio.Semaphore(int(os.getenv("OCR_CONCURRENCY", "4")))
+        known = [att for att in pending if att in ground_truth]
+        parsed = await asyncio.gather(*(
+            from_ground_truth(att) if att in ground_truth else self._ocr_file(f"{base_path}/raw_data/{att}", semaphore)
+            for att in pending
+        ))
+        fresh = dict(zip(pending, parsed))
 
         results = []
-        
-        for att in file_list:
-            file_path = f"patient_data/{patient_id}/raw_data/{att}"
-            if ".png" in att:
-                result = await self.get_text_doc(file_path)
+        failed = []
+        new_manifest = {}
+        for att in images:
+            if att in fresh:
+                result = fresh[att]
+                if result is None:
+                    failed.append(att)
+                    continue
                 result.update({"source_file": att})
-                results.append(result)
                 print(f"Processed {att}: {result}")
+            else:
+                result = existing[att]
+            results.append(result)
+            new_manifest[att] = fingerprints[att]
 
-        self.gcs.create_file_from_string(
-            json.dumps(results, indent=4),
-            f"patient_data/{patient_id}/parsed_raw_data.json",
-            content_type="application/json"
+        await asyncio.gather(
+            self.gcs.create_file_from_string(
+                json.dumps(results, indent=4),
+                f"{base_path}/parsed_raw_data.json",
+                content_type="application/json"
+            ),
+            self.gcs.create_file_from_string(
+                json.dumps({"version": 1, "files": new_manifest}, indent=4),
+                f"{base_path}/ocr_manifest.json",
+                content_type="application/json"
+            ),
         )
+        return {
+            "processed": len(pending) - len(failed),
+            "reused": len(images) - len(pending),
+            "ground_truth": sum(1 for att in known if fresh[att] is not None),
+            "failed": failed
+        }
 
     async def get_raw_context(self, patient_id: str):
-        raw_data = self.gcs.read_file_as_string(f"patient_data/{patient_id}/parsed_raw_data.json")
-        raw_objects = json.loads(raw_data)
-
-        pre_consultation_chat_path = self.gcs.read_file_as_string(f"patient_data/{patient_id}/pre_consultation_chat.json")
-        pre_consultation_chat = json.loads(pre_consultation_chat_path)
+        return (await board_context.PatientRunContext.load(self.gcs, patient_id)).payload
 
-        return {
-            "raw_objects": raw_objects,
-            "pre_consultation_chat": pre_consultation_chat
-        }
+    async def open_run_context(self, patient_id: str, mode=None):
+        """
+        Loads the patient's records once for a board build and opens the
+        shared prompt prefix the context-based builders use (see
+        board_context and context_cache).
+        """
+        run_context = await board_context.PatientRunContext.load(self.gcs, patient_id)
+        run_context.open_shared_context(self.client, MODEL, mode=mode)
+        return run_context
 
-    async def process_dashboard_content(self, patient_id):
-        # 1. Define tasks
-        tasks = [
-            self.process_referral_board(patient_id),
-            self.process_image_board(patient_id),
-            self.process_encounter_board(patient_id),
-            self.process_dashboard_patient_context(patient_id),
-            self.process_dashboard_analysis_object(patient_id)
-        ]
+    def board_fingerprints(self, run_context):
+        """
+        {board_item: fingerprint of the inputs it is built from}. An item's
+        fingerprint includes those of the items it reads, its builder's
+        prompt and schema, and for lab items whether lab_engine is on.
+        """
+        def asset_hash(value):
+            return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+        fingerprints = {}
+        for item, _, deps, inputs in BOARD_BUILDERS:
+            prompt, schema = BOARD_BUILDER_ASSETS.get(item, (None, None))
+            material = {
+                "version": BOARD_FINGERPRINT_VERSION,
+                "model": MODEL,
+                "item": item,
+                "prompt": asset_hash(prompt_registry.get_prompt(prompt)) if prompt else None,
+                "schema": asset_hash(prompt_registry.get_schema(schema)) if schema else None,
+                "lab_engine": lab_engine.LAB_ENGINE if "labs" in inputs else None,
+                "inputs": {key: run_context.input_hash(key) for key in inputs},
+                "deps": {dep: fingerprints[dep] for dep in deps}
+            }
+            fingerprints[item] = hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+        return fingerprints
 
-        # 2. Run in parallel
-        results = await asyncio.gather(*tasks)
+    async def plan_board_build(self, patient_id, run_context, force=False):
+        """
+        Compares the current input fingerprints with board_fingerprints.json
+        and returns (items to rebuild, fingerprints, stored fingerprints).
+        Items that are missing from board_items/ or read a rebuilt item are
+        rebuilt too.
+        """
+        base_path = f"patient_data/{patient_id}"
+        stored_str, existing = await asyncio.gather(
+            self.gcs.read_file_as_string(f"{base_path}/board_fingerprints.json"),
+            self.gcs.list_files(f"{base_path}/board_items/")
+        )
+        stored = {}
+        if stored_str and not force:
+            try:
+                stored = json.loads(stored_str).get("items", {})
+            except (json.JSONDecodeError, AttributeError):
+                print(f"Unreadable board fingerprints for {patient_id}; rebuilding the whole board.")
+
+        fingerprints = self.board_fingerprints(run_context)
+        rebuild = []
+        for item, _, deps, _ in BOARD_BUILDERS:
+            if (
+                stored.get(item) != fingerprints[item]
+                or f"{item}.json" not in existing
+                or any(dep in rebuild for dep in deps)
+            ):
+                rebuild.append(item)
+        return rebuild, fingerprints, stored
+
+    async def _emit_stored_board_items(self, patient_id, items, on_item, board_items=None):
+        """
+        Reads the given (up-to-date) board items concurrently and passes each
+        to on_item.
+        """
+        raw_items = await asyncio.gather(*(
+            self.gcs.read_file_as_string(f"patient_data/{patient_id}/board_items/{item}.json") for item in items
+        ))
+        for item, raw_data in zip(items, raw_items):
+            if raw_data is None:
+                continue
+            value = json.loads(raw_data)
+            if board_items is not None:
+                board_items[item] = value
+            on_item(item, value)
 
-        # 3. Loop and print
-        print("First batch of dashboard processing results:")
-        for result in results:
-            print(result)
+    async def process_dashboard_content(self, patient_id, force=False, dry_run=False, board_items=None, on_item=None, on_update=None):
+        """
+        Runs every board builder as soon as its inputs exist (see
+        BOARD_BUILDERS) instead of in two fixed batches, so the board is done
+        after its longest dependency chain. Returns {board_item: result}.
+
+        Incremental: board_fingerprints.json records the inputs each item was
+        last built from, and only items whose inputs changed are rebuilt
+        (a new chat message leaves the lab items alone).
+
+        :param force: Rebuild every item.
+        :param dry_run: Only report which items would be rebuilt, as
+                        {"rebuild": [...], "reuse": [...]}.
+        :param board_items: Optional dict that receives the rebuilt items,
+                            for process_board_object to assemble in memory.
+        :param on_item: Optional callback(item, value) for streaming: called
+                        for every up-to-date item first, then for each
+                        rebuilt item as soon as it is saved.
+        :param on_update: Optional callback(item, status) for builder progress.
+        """
+        # Every builder shares one load of the patient records and one cached prompt prefix
+        run_context = await self.open_run_context(patient_id)
+        shared_context = run_context.shared_context
+
+        rebuild, fingerprints, stored = await self.plan_board_build(patient_id, run_context, force=force)
+        plan = {"rebuild": rebuild, "reuse": [item for item, _, _, _ in BOARD_BUILDERS if item not in rebuild]}
+        if dry_run:
+            return plan
+        if on_item is not None:
+            await self._emit_stored_board_items(patient_id, plan["reuse"], on_item, board_items)
+            run_context.on_item = on_item
+        if not rebuild:
+            print(f"Board for {patient_id} is up to date; nothing to rebuild.")
+            return {}
+        print(f"Rebuilding board items for {patient_id}: {', '.join(rebuild)}")
 
+        # Builders catch their own errors, so fail_fast only matters for bugs
+        scheduler = dag_scheduler.DAGScheduler(
+            max_concurrency=int(os.getenv("BOARD_CONCURRENCY", "12")),
+            fail_fast=False,
+            on_update=on_update
+        )
+        for item, method, deps, _ in BOARD_BUILDERS:
+            if item not in rebuild:
+                continue
+            builder = getattr(self, method)
+            scheduler.add(
+                item,
+                lambda builder=builder: builder(patient_id, run_context),
+                [dep for dep in deps if dep in rebuild]
+            )
 
-        tasks = [
-            self.dashboard_latest_labs(patient_id),
-            self.dashboard_lab_chart_data(patient_id),
-            self.dashboard_pre_diagnosis(patient_id),
-            self.get_encounters_track(patient_id),
-            self.get_medication_track(patient_id),
-            self.get_lab_track(patient_id),
-            self.get_risk_event_track(patient_id),
-        ]
+        try:
+            results = await scheduler.run()
+        finally:
+            await shared_context.close()
+            if board_items is not None:
+                board_items.update(run_context.board_items)
+
+        print("Dashboard processing results:")
+        for item, result in results.items():
+            print(f"{item}: {result}")
+
+        # Failed items keep no fingerprint so the next build retries them
+        items = {item: fp for item, fp in stored.items() if item not in rebuild}
+        items.update({
+            item: fingerprints[item] for item in rebuild
+            if (results.get(item) or {}).get("status") == "success"
+        })
+        await self.gcs.create_file_from_string(
+            json.dumps({"version": BOARD_FINGERPRINT_VERSION, "items": items}, indent=4),
+            f"patient_data/{patient_id}/board_fingerprints.json",
+            content_type="application/json"
+        )
 
-        # 2. Run in parallel
-        results = await asyncio.gather(*tasks)
+        report = scheduler.report()
+        print(f"Board built in {report['wall_time_s']}s (critical path {' -> '.join(report['critical_path'])}: {report['critical_path_s']}s)")
+        print(f"Shared context usage: {shared_context.summary()}")
 
-        # 3. Loop and print
-        print("First batch of dashboard processing results:")
-        for result in results:
-            print(result)
-            
         return results
 
-    async def process_board_object(self, patient_id):
-        file_list = self.gcs.list_files(f"patient_data/{patient_id}/board_items/")
-
-        board_objects = []
-
-        for file in file_list:
-            file_path = f"patient_data/{patient_id}/board_items/{file}"
-            raw_data = self.gcs.read_file_as_string(file_path)
-            raw_objects = json.loads(raw_data)
-
-
-            if "referral.json" in file:
-                rec = {
-                    "id": "referral-doctor-info",
-                    "date" : raw_objects.get("date",""),
-                    "visitType" : raw_objects.get("visitType",""),
-                    "provider" : raw_objects.get("provider",""),
-                    "specialty" : raw_objects.get("specialty",""),
-                    "rawText" : raw_objects.get("rawText",""),
-                    "dataSource" : raw_objects.get("dataSource",""),
-                    "highlights" : raw_objects.get("highlights",[]),
-                    "componentType"  : "RawClinicalNote",
-                    "zone" : "referral-zone"
-                }
-                board_objects.append(rec)
-                rec2 = {
-                    "id": "referral-letter-image",
-                    "date" : raw_objects.get("date",""),
-                    "studyType" : raw_objects.get("studyType",""),
-                    "provider" : raw_objects.get("provider",""),
-                    "specialty" : raw_objects.get("specialty",""),
-                    "imageUrl" : raw_objects.get("imageUrl",""),
-                    "dataSource" : raw_objects.get("dataSource",""),
-                    "componentType"  : "RadiologyImage",
-                    "zone" : "referral-zone"
-                }
-                board_objects.append(rec2)
-            elif "raw_images.json" in file:
-                for r in raw_objects:
-                    r['componentType'] = "RadiologyImage"
-                    r['zone'] = "raw-ehr-data-zone"
-                board_objects += raw_objects
-            elif "encounters.json" in file:
-                for i, e in enumerate(raw_objects):
-                    e['id'] = f"single-encounter-{i+1}"
-                    e['componentType'] = "SingleEncounterDocument"
-                    e['zone'] = "data-zone"
-                    board_objects.append(e)
-            elif "patient_context.json" in file:
-                raw_objects['id'] = "dashboard-item-patient-context"
-                raw_objects['componentType'] = "PatientContext"
-                raw_objects['zone'] = "adv-event-zone"
-                board_objects.append(raw_objects)
-
-                raw_objects['id'] = "sidebar-1"     
-                raw_objects['componentType'] = "Sidebar"
-
-                board_objects.append(raw_objects)
-            elif "dashboard_analysis.json" in file:
-                raw_objects['id'] = "adverse-event-analytics"
-                raw_objects['componentType'] = "AdverseEventAnalytics"
-                raw_objects['zone'] = "adv-event-zone"
-                
-                board_objects.append(raw_objects)
-            elif "dashboard_lab_latest.json" in file:
-                board_objects.append({
-                    "id": "dashboard-item-lab-table",
-                    "componentType": "LabTable",
-                    "zone" : "adv-event-zone",
-                    "labResults" : raw_objects
-                })
-            elif "dashboard_lab_chart.json" in file:
-                board_objects.append({
-                    "id": "dashboard-item-lab-chart",
-                    "componentType": "LabChart",
-                    "zone" : "adv-event-zone",
-                    "chartData" : raw_objects
-                })
-            elif "dashboard_pre_diagnosis.json" in file:
-                board_objects.append({
-                    "id": "differential-diagnosis",
-                    "componentType": "DifferentialDiagnosis",
-                    "zone" : "adv-event-zone",
-                    "differential" : raw_objects
-                })
-            elif "dashboard_encounters_track.json" in file:
-                board_objects.append({
-                    "id": "encounter-track-1",
-                    "componentType": "EncounterTrack",
-                    "zone" : "adv-event-zone",
-                    "encounters" : raw_objects
-                })
-            elif "dashboard_medication_track.json" in file:
-                board_objects.append({
-                    "id": "medication-track-1",
-                    "componentType": "MedicationTrack",
-                    "zone" : "adv-event-zone",
-                    "data" : raw_objects
-                })
-            elif "dashboard_lab_track.json" in file:
-                board_objects.append({
-                    "id": "lab-track-1",
-                    "componentType": "LabTrack",
-                    "zone" : "adv-event-zone",
-                    "data" : raw_objects
-                })
-            elif "dashboard_risk_event_track.json" in file:
-                board_objects.append({
-                    "id": "risk-track-1",
-                    "componentType": "RiskTrack",
-                    "zone" : "adv-event-zone",
-                    "risks" : raw_objects.get("risks")
-                })
-                board_objects.append({
-                    "id": "key-events-track-1",
-                    "componentType": "KeyEventsTrack",
-                    "zone" : "adv-event-zone",
-                    "events" : raw_objects.get("events")
-                })
-            
-        self.gcs.create_file_from_string(
-            json.dumps(board_objects, indent=4),
-            f"patient_data/{patient_id}/board_objects.json",
+    async def _save_board_item(self, patient_id, item, value, run_context=None):
+        """
+        Writes board_items/<item>.json and keeps the object on the run
+        context for in-memory board assembly.
+        """
+        await self.gcs.create_file_from_string(
+            json.dumps(value, indent=4),
+            f"patient_data/{patient_id}/board_items/{item}.json",
             content_type="application/json"
         )
+        if run_context is not None:
+            run_context.set_board_item(item, value)
 
-            
+    async def process_board_object(self, patient_id, board_items=None):
+        """
+        Assembles board_objects.json from the board items.
 
+        :param board_items: {board_item: object} already in memory (see
+                            process_dashboard_content). Items not given are
+                            read from board_items/, concurrently.
+        """
+        board_items = dict(board_items or {})
+        file_list = await self.gcs.list_files(f"patient_data/{patient_id}/board_items/")
+        missing = [
+            file for file in file_list
+            if file.endswith(".json") and file[:-len(".json")] not in board_items
+        ]
+        raw_items = await asyncio.gather(*(
+            self.gcs.read_file_as_string(f"patient_data/{patient_id}/board_items/{file}") for file in missing
+        ))
+        for file, raw_data in zip(missing, raw_items):
+            if raw_data is None:
+                continue
+            board_items[file[:-len(".json")]] = json.loads(raw_data)
+
+        board_objects = assemble_board_objects(board_items)
+
+        await self.gcs.create_file_from_string(
+            json.dumps(board_objects, indent=4),
+            f"patient_data/{patient_id}/board_objects.json",
+            content_type="application/json"
+        )
+        return board_objects
 
-    async def process_referral_board(self, patient_id):
+    async def process_referral_board(self, patient_id, run_context=None):
 
         try:
-            raw_data = self.gcs.read_file_as_string(f"patient_data/{patient_id}/parsed_raw_data.json")
-            raw_objects = json.loads(raw_data)
+            run_context = run_context or await board_context.PatientRunContext.load(self.gcs, patient_id)
+            raw_objects = run_context.raw_objects
 
             referal_raw_object = None
             for raw in raw_objects:
@@ -1383,12 +1772,10 @@ class RawDataProcessing(BaseLogicAgent):
             
             referral_text = referal_raw_object.get("content","")
 
-            with open("system_prompts/board_referral_parser.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("board_referral_parser")
 
             # 2. Load Response Schema
-            with open("response_schema/board_referral_parser.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("board_referral_parser")
 
             # 3. Prepare Prompt
             prompt_text = (
@@ -1404,7 +1791,7 @@ class RawDataProcessing(BaseLogicAgent):
             ]
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=contents,
                 config=types.GenerateContentConfig(
@@ -1412,7 +1799,8 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.1 # Low temp for factual extraction
-                )
+                ),
+                use_cache=True
             )
 
             
@@ -1421,11 +1809,7 @@ class RawDataProcessing(BaseLogicAgent):
             result_obj['rawText'] = referral_text
 
 
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/referral.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "referral", result_obj, run_context)
 
 
 
@@ -1439,10 +1823,10 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def process_image_board(self, patient_id):
+    async def process_image_board(self, patient_id, run_context=None):
         try:
-            raw_data = self.gcs.read_file_as_string(f"patient_data/{patient_id}/parsed_raw_data.json")
-            raw_objects = json.loads(raw_data)
+            run_context = run_context or await board_context.PatientRunContext.load(self.gcs, patient_id)
+            raw_objects = run_context.raw_objects
 
             image_enc_id_count = 1
             image_lab_id_count = 1
@@ -1475,11 +1859,7 @@ class RawDataProcessing(BaseLogicAgent):
                     results.append(data_)
                     image_imaging_id_count += 1
 
-            self.gcs.create_file_from_string(
-                json.dumps(results, indent=4),
-                f"patient_data/{patient_id}/board_items/raw_images.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "raw_images", results, run_context)
 
             return {
                 "status": "success"
@@ -1491,10 +1871,10 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
     
-    async def process_encounter_board(self, patient_id):
+    async def process_encounter_board(self, patient_id, run_context=None):
         try:
-            raw_data = self.gcs.read_file_as_string(f"patient_data/{patient_id}/parsed_raw_data.json")
-            raw_objects = json.loads(raw_data)
+            run_context = run_context or await board_context.PatientRunContext.load(self.gcs, patient_id)
+            raw_objects = run_context.raw_objects
 
 
             encounter_text = ""
@@ -1504,10 +1884,8 @@ class RawDataProcessing(BaseLogicAgent):
 
                 
 
-            with open("system_prompts/encounter_generator.md", "r", encoding="utf-8") as f: 
-                system_instruction = f.read()
-            with open("response_schema/encounter.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            system_instruction = prompt_registry.get_prompt("encounter_generator")
+            response_schema = prompt_registry.get_schema("encounter")
 
             # 3. Prepare Prompt
             prompt_text = (
@@ -1522,7 +1900,7 @@ class RawDataProcessing(BaseLogicAgent):
             ]
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=contents,
                 config=types.GenerateContentConfig(
@@ -1530,20 +1908,16 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.1 # Low temp for factual extraction
-                )
+                ),
+                use_cache=True
             )
 
             
 
             result_obj = json.loads(response.text)
+            run_context.set_encounters(result_obj)
 
-            
-
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/encounters.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "encounters", result_obj, run_context)
 
             return {
                 "status": "success"
@@ -1555,22 +1929,18 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
     
-    async def process_dashboard_patient_context(self, patient_id: str):
+    async def process_dashboard_patient_context(self, patient_id: str, run_context=None):
         try:
-            with open("system_prompts/dashboard_patient_context.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_patient_context")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_patient_context.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_patient_context")
 
 
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
 
 
             prompt_content = (
-                f"### DATA SOURCES ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Analyze the data above to populate the Clinical Dashboard.\n"
                 f"1. **Synthesize:** Combine the official history (Encounters) with new self-reported info (Chat).\n"
@@ -1579,7 +1949,7 @@ class RawDataProcessing(BaseLogicAgent):
                 f"4. **Problem List:** Include both chronic conditions and the acute symptoms they are complaining about now."
             )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1587,14 +1957,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.2 # Low temperature for factual extraction
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/patient_context.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "patient_context", result_obj, run_context)
 
 
             return {
@@ -1607,24 +1975,20 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def process_dashboard_analysis_object(self, patient_id: str):
+    async def process_dashboard_analysis_object(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_analysis.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_analysis")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_analysis.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_analysis")
 
             # 3. Retrieve Context (Raw Data + Pre-Consult Data)
             # Assuming this method returns a dict with keys like 'labs', 'medications', 'chat_transcript', etc.
-            context_payload = await self.get_raw_context(patient_id) 
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
 
             # 4. Construct Prompt
             prompt_content = (
-                f"### PATIENT DATA CONTEXT ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Act as an expert Clinical Toxicologist and Hepatologist.\n"
                 f"Analyze the provided patient data (History, Labs, Symptoms, Medications) to generate a safety analysis.\n\n"
@@ -1635,7 +1999,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL,
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1643,14 +2007,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.1 # Very low temperature for precise scoring and grading
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_analysis.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_analysis", result_obj, run_context)
 
             return {
                 "status": "success"
@@ -1663,24 +2025,29 @@ class RawDataProcessing(BaseLogicAgent):
             }
 
 
-    async def dashboard_latest_labs(self, patient_id: str):
+    async def dashboard_latest_labs(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_lab_latest.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_lab_latest")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_lab_latest.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_lab_latest")
 
             # 3. Retrieve Raw Patient Context
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
+
+            # Structured labs are tabulated locally; the model only reads uploads
+            lab_frame = run_context.lab_frame()
+            if lab_frame is not None:
+                await self._save_board_item(patient_id, "dashboard_lab_latest", lab_frame.latest(), run_context)
+                return {
+                    "status": "success",
+                    "source": "lab_engine"
+                }
 
             # 4. Construct Prompt
             # We pass the raw data and ask it to filter for the most recent values only.
             prompt_content = (
-                f"### PATIENT RECORDS ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Review the patient records above. Extract the LATEST available result for every distinct lab test found.\n"
                 f"1. **Filter:** Ignore older entries if a newer one exists for the same test.\n"
@@ -1690,7 +2057,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1698,14 +2065,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.0 # Zero temperature for strict factual extraction
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_lab_latest.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_lab_latest", result_obj, run_context)
 
             return {
                 "status": "success"
@@ -1717,23 +2082,28 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def dashboard_lab_chart_data(self, patient_id: str):
+    async def dashboard_lab_chart_data(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_lab_chart.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_lab_chart")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_lab_chart.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_lab_chart")
 
             # 3. Retrieve Raw Patient Context
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
+
+            # Structured labs are tabulated locally; the model only reads uploads
+            lab_frame = run_context.lab_frame()
+            if lab_frame is not None:
+                await self._save_board_item(patient_id, "dashboard_lab_chart", lab_frame.chart(), run_context)
+                return {
+                    "status": "success",
+                    "source": "lab_engine"
+                }
 
             # 4. Construct Prompt
             prompt_content = (
-                f"### PATIENT DATA CONTEXT ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Analyze the patient data to build historical trend lines for laboratory values.\n"
                 f"1. **Extraction:** Identify every lab test that has at least one result.\n"
@@ -1745,7 +2115,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1753,14 +2123,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.0 # Zero temp for strict extraction
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_lab_chart.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_lab_chart", result_obj, run_context)
 
             return {
                 "status": "success"
@@ -1772,23 +2140,19 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
     
-    async def dashboard_pre_diagnosis(self, patient_id: str):
+    async def dashboard_pre_diagnosis(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_pre_diagnosis.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_pre_diagnosis")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_pre_diagnosis.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_pre_diagnosis")
 
             # 3. Retrieve Raw Patient Context
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
 
             # 4. Construct Prompt
             prompt_content = (
-                f"### PATIENT DATA CONTEXT ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Act as an expert Diagnostician. Analyze the patient's symptoms, history, and laboratory results.\n"
                 f"1. **Differential Diagnosis:** Generate a list of potential diagnoses that explain the clinical presentation.\n"
@@ -1800,7 +2164,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1808,14 +2172,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.1 # Low temp for evidence-based reasoning
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_pre_diagnosis.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_pre_diagnosis", result_obj, run_context)
             
             return {
                 "status": "success"
@@ -1827,29 +2189,24 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def get_encounters_track(self, patient_id: str):
+    async def get_encounters_track(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_encounters_track.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_encounters_track")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_encounters_track.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_encounters_track")
 
             # 3. Retrieve Raw Patient Context
             # This payload contains the raw notes, previous encounters, and history
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
 
-            encounters_parsed_text = self.gcs.read_file_as_string(f"patient_data/{patient_id}/board_items/encounters.json")
-            encounters_object = json.loads(encounters_parsed_text)
+            encounters_text = await run_context.get_encounters_text()
 
             # 4. Construct Prompt
             prompt_content = (
-                f"### PATIENT RECORDS ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### Encounters parsed ###\n"
-                f"{json.dumps(encounters_object, indent=2)}\n\n"
+                f"{encounters_text}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Act as a Medical Historian. Construct a chronological timeline of patient encounters based on the records provided.\n"
                 f"1. **Extraction:** identify all distinct interactions (Clinic Visits, Telehealth, ER Admissions, Discharge).\n"
@@ -1860,7 +2217,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1868,14 +2225,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.1 # Low temp for factual accuracy
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_encounters_track.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_encounters_track", result_obj, run_context)
 
             return {
                 "status": "success"
@@ -1887,31 +2242,26 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def get_medication_track(self, patient_id: str):
+    async def get_medication_track(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_medication_track.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_medication_track")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_medication_track.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_medication_track")
 
             # 3. Retrieve Contexts
             # Get raw data (notes, labs, etc.)
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
             
             # Get the structured encounters list created by the previous agent
-            encounters_parsed_text = self.gcs.read_file_as_string(f"patient_data/{patient_id}/board_items/encounters.json")
-            encounters_object = json.loads(encounters_parsed_text)
+            encounters_text = await run_context.get_encounters_text()
 
             # 4. Construct Prompt
             # We provide the structured encounters to help the AI map medications to specific dates/visits
             prompt_content = (
-                f"### RAW PATIENT RECORDS ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### STRUCTURED ENCOUNTERS TIMELINE ###\n"
-                f"{json.dumps(encounters_object, indent=2)}\n\n"
+                f"{encounters_text}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Act as an expert Clinical Pharmacist. Construct a medication timeline based on the records provided.\n"
                 f"1. **Encounters Reference:** First, extract the simplified list of encounters (Number and Date) to serve as the timeline X-axis.\n"
@@ -1924,7 +2274,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1932,14 +2282,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.0 # Zero temp for precise date calculation
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_medication_track.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_medication_track", result_obj, run_context)
             return {
                 "status": "success"
             }
@@ -1950,23 +2298,28 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def get_lab_track(self, patient_id: str):
+    async def get_lab_track(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_lab_track.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_lab_track")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_lab_track.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_lab_track")
 
             # 3. Retrieve Raw Patient Context
-            context_payload = await self.get_raw_context(patient_id)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
+
+            # Structured labs are tabulated locally; the model only reads uploads
+            lab_frame = run_context.lab_frame()
+            if lab_frame is not None:
+                await self._save_board_item(patient_id, "dashboard_lab_track", lab_frame.track(), run_context)
+                return {
+                    "status": "success",
+                    "source": "lab_engine"
+                }
 
             # 4. Construct Prompt
             prompt_content = (
-                f"### PATIENT RECORDS ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Act as a Clinical Data Specialist. Extract a longitudinal track of laboratory values.\n"
                 f"1. **Grouping:** Group all results by the specific biomarker name (e.g., combine 'SGPT' and 'ALT').\n"
@@ -1979,7 +2332,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -1987,14 +2340,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.0 # Zero temp for precise number/date extraction
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_lab_track.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_lab_track", result_obj, run_context)
             return {
                 "status": "success"
             }
@@ -2005,26 +2356,21 @@ class RawDataProcessing(BaseLogicAgent):
                 "message": str(e)
             }
 
-    async def get_risk_event_track(self, patient_id: str):
+    async def get_risk_event_track(self, patient_id: str, run_context=None):
         try:
             # 1. Load System Instruction
-            with open("system_prompts/dashboard_risk_event_track.md", "r", encoding="utf-8") as f:
-                system_instruction = f.read()
+            system_instruction = prompt_registry.get_prompt("dashboard_risk_event_track")
 
             # 2. Load Response Schema
-            with open("response_schema/dashboard_risk_event_track.json", "r", encoding="utf-8") as f:
-                response_schema = json.load(f)
+            response_schema = prompt_registry.get_schema("dashboard_risk_event_track")
 
             # 3. Retrieve Raw Patient Context
-            context_payload = await self.get_raw_context(patient_id)
-            encounters_parsed_text = self.gcs.read_file_as_string(f"patient_data/{patient_id}/board_items/encounters.json")
-            encounters_object = json.loads(encounters_parsed_text)
+            run_context = run_context or await self.open_run_context(patient_id, mode="local")
+            encounters_text = await run_context.get_encounters_text()
             # 4. Construct Prompt
             prompt_content = (
-                f"### PATIENT RECORDS ###\n"
-                f"{json.dumps(context_payload, indent=2)}\n\n"
                 f"### STRUCTURED ENCOUNTERS TIMELINE ###\n"
-                f"{json.dumps(encounters_object, indent=2)}\n\n"
+                f"{encounters_text}\n\n"
                 f"### INSTRUCTION ###\n"
                 f"Act as a Clinical Risk Manager. Analyze the patient records to generate two aligned timelines: Risk Progression and Key Events.\n\n"
                 f"1. **Risk Analysis:** For every significant encounter or date, calculate a `riskScore` (0-10 scale) based on clinical severity.\n"
@@ -2038,7 +2384,7 @@ class RawDataProcessing(BaseLogicAgent):
             )
 
             # 5. Call Model
-            response = await self.client.aio.models.generate_content(
+            response = await self.generate_content(
                 model=MODEL, 
                 contents=prompt_content,
                 config=types.GenerateContentConfig(
@@ -2046,14 +2392,12 @@ class RawDataProcessing(BaseLogicAgent):
                     response_schema=response_schema, 
                     system_instruction=system_instruction, 
                     temperature=0.1 # Low temp for consistent scoring and date extraction
-                )
+                ),
+                shared_context=run_context.shared_context,
+                use_cache=True
             )
             result_obj = json.loads(response.text)
-            self.gcs.create_file_from_string(
-                json.dumps(result_obj, indent=4),
-                f"patient_data/{patient_id}/board_items/dashboard_risk_event_track.json",
-                content_type="application/json"
-            )
+            await self._save_board_item(patient_id, "dashboard_risk_event_track", result_obj, run_context)
             
             return {
                 "status": "success"
@@ -0,0 +1,120 @@
+import os
+import json
+import threading
+
+# System prompts, response schemas and JSON templates are loaded once at
+# startup and served from memory. Set PROMPT_HOT_RELOAD=1 in development to
+# pick up edits without restarting (each lookup then stats its source file).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# kind -> (folder, extension)
+ASSET_DIRS = {
+    "prompt": ("system_prompts", ".md"),
+    "schema": ("response_schema", ".json"),
+    "template": ("utils", ".json"),
+}
+
+
+class PromptRegistry:
+    def __init__(self, base_dir=BASE_DIR, hot_reload=False):
+        """
+        :param base_dir: Folder containing system_prompts/, response_schema/ and utils/.
+        :param hot_reload: Re-read an asset when its file changes on disk.
+        """
+        self.base_dir = base_dir
+        self.hot_reload = hot_reload
+        self._assets = {kind: {} for kind in ASSET_DIRS}  # kind -> name -> (mtime, value)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Loads and validates every asset. Raises on the first malformed file
+        so a broken deployment fails at boot instead of mid-request.
+        """
+        assets = {kind: {} for kind in ASSET_DIRS}
+        for kind, (folder, ext) in ASSET_DIRS.items():
+            directory = os.path.join(self.base_dir, folder)
+            if not os.path.isdir(directory):
+                raise FileNotFoundError(f"Asset folder '{directory}' is missing.")
+
+            for filename in sorted(os.listdir(directory)):
+                if not filename.endswith(ext):
+                    continue
+                name = filename[:-len(ext)]
+                path = os.path.join(directory, filename)
+                assets[kind][name] = (os.path.getmtime(path), self._read(kind, path))
+
+        with self._lock:
+            self._assets = assets
+
+    def require(self, prompts=(), schemas=(), templates=()):
+        """
+        Asserts that the named assets exist. Call at import time with
+        everything a module uses.
+        """
+        missing = []
+        for kind, names in (("prompt", prompts), ("schema", schemas), ("template", templates)):
+            folder, ext = ASSET_DIRS[kind]
+            missing += [f"{folder}/{n}{ext}" for n in names if n not in self._assets[kind]]
+        if missing:
+            raise FileNotFoundError(f"Missing required assets: {', '.join(missing)}")
+
+    def get(self, kind, name):
+        entry = self._assets[kind].get(name)
+        if entry is None:
+            folder, ext = ASSET_DIRS[kind]
+            raise KeyError(f"Unknown {kind} '{name}' (expected {folder}/{name}{ext}).")
+
+        if self.hot_reload:
+            entry = self._refresh(kind, name, entry)
+        return entry[1]
+
+    def _refresh(self, kind, name, entry):
+        folder, ext = ASSET_DIRS[kind]
+        path = os.path.join(self.base_dir, folder, name + ext)
+        mtime = os.path.getmtime(path)
+        if mtime == entry[0]:
+            return entry
+
+        print(f"Reloading {folder}/{name}{ext}")
+        entry = (mtime, self._read(kind, path))
+        with self._lock:
+            self._assets[kind][name] = entry
+        return entry
+
+    @staticmethod
+    def _read(kind, path):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+
+        if kind == "prompt":
+            if not raw.strip():
+                raise ValueError(f"System prompt '{path}' is empty.")
+            return raw
+
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in '{path}': {e}")
+
+        if kind == "schema" and (not isinstance(value, dict) or "type" not in value):
+            raise ValueError(f"Response schema '{path}' must be an object with a 'type'.")
+        return value
+
+
+registry = PromptRegistry(hot_reload=os.getenv("PROMPT_HOT_RELOAD", "0") == "1")
+registry.load()
+
+
+# Returned objects are shared; callers must not mutate them.
+def get_prompt(name):
+    return registry.get("prompt", name)
+
+
+def get_schema(name):
+    return registry.get("schema", name)
+
+
+def get_template(name):
+    return registry.get("template", name)
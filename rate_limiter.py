@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+
+# Process-wide limits for model calls.
+# Every call goes through the limiter of its model, which enforces:
+#   - an adaptive concurrency window (AIMD: halves on quota errors, grows back
+#     by one slot per window of successful calls, never above the configured cap)
+#   - token buckets for requests/minute and tokens/minute
+#   - jittered exponential backoff retries on 429 / RESOURCE_EXHAUSTED / 503
+#
+# Defaults come from LLM_MAX_CONCURRENCY, LLM_RPM, LLM_TPM (0 = unlimited),
+# LLM_MAX_RETRIES, LLM_BACKOFF_BASE and LLM_BACKOFF_MAX. Per-model overrides:
+#   LLM_LIMITS='{"gemini-3-pro-image-preview": {"concurrency": 2, "rpm": 20}}'
+
+# Global limits (env var -> default) shared by every model without an override
+LIMIT_DEFAULTS = {"LLM_MAX_CONCURRENCY": "8", "LLM_RPM": "0", "LLM_TPM": "0"}
+
+# Rough Gemini accounting used before the real usage is known
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 258
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        """
+        :param rate_per_minute: Refill rate; also the bucket capacity (one minute of burst).
+        """
+        self.capacity = float(rate_per_minute)
+        self.rate = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / 60.0)
+        self.updated = now
+
+    def reserve(self, amount):
+        """
+        Takes `amount` tokens and returns how long the caller must wait
+        before the reservation is covered (0 if available now).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens * 60.0 / self.rate
+
+    def adjust(self, delta):
+        """
+        Corrects an earlier reservation once the real cost is known.
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+def is_retryable_error(exc):
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code in (429, 503):
+        return True
+    message = str(exc)
+    return "RESOURCE_EXHAUSTED" in message or "429" in message or "UNAVAILABLE" in message
+
+
+def estimate_tokens(contents, config=None):
+    def count(item):
+        if item is None:
+            return 0
+        if isinstance(item, str):
+            return len(item) // CHARS_PER_TOKEN
+        if isinstance(item, (list, tuple)):
+            return sum(count(i) for i in item)
+        if getattr(item, "inline_data", None) is not None:
+            return TOKENS_PER_IMAGE
+        if getattr(item, "text", None):
+            return len(item.text) // CHARS_PER_TOKEN
+        if getattr(item, "parts", None):
+            return count(item.parts)
+        return 0
+
+    system_instruction = getattr(config, "system_instruction", None) if config is not None else None
+    return max(1, count(contents) + count(system_instruction))
+
+
+class ModelLimiter:
+    def __init__(self, model, max_concurrency, rpm=0, tpm=0, max_retries=5, backoff_base=1.0, backoff_max=60.0):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+
+        self._limit = max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = None
+
+        # Stats
+        self.calls = 0
+        self.retries = 0
+        self.quota_errors = 0
+        self.failures = 0
+        self.wait_seconds = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    async def _acquire_slot(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+
+    async def _release_slot(self, quota_error=False):
+        async with self._condition:
+            self._in_flight -= 1
+            if quota_error:
+                # Multiplicative decrease
+                self._limit = max(1, self._limit // 2)
+                self._successes = 0
+            elif self._limit < self.max_concurrency:
+                # Additive increase: one extra slot per window of successes
+                self._successes += 1
+                if self._successes >= self._limit:
+                    self._limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+    async def _throttle(self, estimated_tokens):
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            self.wait_seconds += wait
+            await asyncio.sleep(wait)
+
+    def _record_usage(self, response, estimated_tokens):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        prompt = usage.prompt_token_count or 0
+        output = usage.candidates_token_count or 0
+        self.prompt_tokens += prompt
+        self.output_tokens += output
+        if self.tokens is not None:
+            self.tokens.adjust(estimated_tokens - (prompt + output))
+
+    async def call(self, make_request, estimated_tokens=1):
+        """
+        Runs `make_request()` (a zero-argument function returning an awaitable)
+        under this model's limits, retrying quota errors with full-jitter backoff.
+        """
+        attempt = 0
+        while True:
+            await self._throttle(estimated_tokens)
+            await self._acquire_slot()
+            quota_error = False
+            try:
+                self.calls += 1
+                response = await make_request()
+                self._record_usage(response, estimated_tokens)
+                return response
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                quota_error = True
+                self.quota_errors += 1
+            finally:
+                await self._release_slot(quota_error=quota_error)
+
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+            attempt += 1
+            self.retries += 1
+            print(f"Quota/availability error on {self.model}; retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "concurrency_limit": self._limit,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "quota_errors": self.quota_errors,
+            "failures": self.failures,
+            "throttle_wait_s": round(self.wait_seconds, 3),
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens
+        }
+
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def _model_settings(model):
+    settings = {
+        "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", LIMIT_DEFAULTS["LLM_MAX_CONCURRENCY"])),
+        "rpm": int(os.getenv("LLM_RPM", LIMIT_DEFAULTS["LLM_RPM"])),
+        "tpm": int(os.getenv("LLM_TPM", LIMIT_DEFAULTS["LLM_TPM"])),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "5")),
+        "backoff_base": float(os.getenv("LLM_BACKOFF_BASE", "1.0")),
+        "backoff_max": float(os.getenv("LLM_BACKOFF_MAX", "60"))
+    }
+    overrides = json.loads(os.getenv("LLM_LIMITS", "{}")).get(model, {})
+    if "concurrency" in overrides:
+        settings["max_concurrency"] = int(overrides["concurrency"])
+    for key in ("rpm", "tpm"):
+        if key in overrides:
+            settings[key] = int(overrides[key])
+    return settings
+
+
+def get_limiter(model):
+    """
+    Returns the shared limiter for `model`, creating it on first use.
+    """
+    with _LIMITERS_LOCK:
+        if model not in _LIMITERS:
+            _LIMITERS[model] = ModelLimiter(model, **_model_settings(model))
+        return _LIMITERS[model]
+
+
+def stats():
+    with _LIMITERS_LOCK:
+        return {model: limiter.stats() for model, limiter in _LIMITERS.items()}
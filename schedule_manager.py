@@ -1,12 +1,12 @@
 import pandas as pd
 import io
-from bucket_ops import GCSBucketManager
+from bucket_ops import BaseBucketManager
 
 class ScheduleCSVManager:
     # Strict column order matching your CSV
     COLUMNS = ['id', 'patient', 'date', 'time', 'status']
 
-    def __init__(self, gcs_manager: GCSBucketManager, csv_blob_path: str):
+    def __init__(self, gcs_manager: BaseBucketManager, csv_blob_path: str):
         self.gcs = gcs_manager
         self.csv_path = csv_blob_path
 
@@ -5,6 +5,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import json
+import asyncio
+import functools
 import base64 
 import pandas as pd
 # Import your agent class
@@ -12,9 +14,16 @@ import my_agents
 from my_agents import PreConsulteAgent
 import schedule_manager
 import bucket_ops
+import blob_cache
+import llm_cache
+import rate_limiter
+import hedging
+import client_registry
+import job_queue
 import traceback
 import uuid
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from fastapi import FastAPI, Request, Response, Form
 from google.cloud import dialogflowcx_v3beta1 as dialogflow
 from twilio.twiml.messaging_response import MessagingResponse
@@ -39,8 +48,11 @@ app.add_middleware(
 # Initialize the Agent
 # We instantiate it once so we don't reconnect to GCS/VertexAI on every request
 chat_agent = PreConsulteAgent()
+data_agent = my_agents.RawDataProcessing()
 
-gcs = bucket_ops.GCSBucketManager(bucket_name="clinic_sim")
+gcs = bucket_ops.get_bucket_manager()
+# Awaitable view of the same bucket; blocking calls run on the storage executor
+gcs_async = bucket_ops.AsyncBucketManager(gcs)
 
 
 # --- Pydantic Models ---
@@ -116,6 +128,8 @@ class PatientGenerate(BaseModel):
     description: str
     encounters_count: int # Changed from str to dict to handle the rich JSON
     imaging_count_in_encounters: int
+    # Set to resume a previous (failed or interrupted) generation
+    patient_id: Optional[str] = None
 
 # --- Endpoints ---
 
@@ -123,45 +137,107 @@ class PatientGenerate(BaseModel):
 async def root():
     return {"status": "MedForce Server is Running"}
 
+@app.get("/stats")
+async def get_stats():
+    """
+    Runtime counters for the caching layers.
+    """
+    storage_cache = blob_cache.get_blob_cache()
+    response_cache = llm_cache.get_llm_cache()
+    return {
+        "storage_cache": storage_cache.stats() if storage_cache else None,
+        "llm_cache": response_cache.stats() if response_cache else None,
+        "llm_limits": rate_limiter.stats(),
+        "image_hedging": hedging.get_image_hedge_policy().stats(),
+        "jobs": job_queue.get_job_queue().stats()
+    }
+
+async def run_patient_generation(seed: dict, progress):
+    """
+    Job handler: full ground-truth generation followed by board processing.
+    Resumable; a requeued job restores its finished generation stages.
+    """
+    patient_id = seed["patient_id"]
+
+    PM = my_agents.PatientManager(dict(seed))
+    report = await PM.generate_ground_truth_patient(on_update=progress)
+
+    # Board items built here are assembled in memory instead of re-read
+    board_items = {}
+    for stage, step in (
+        ("preconsult", data_agent.process_raw_data),
+        ("board", functools.partial(data_agent.process_dashboard_content, board_items=board_items)),
+        ("board_update", functools.partial(data_agent.process_board_object, board_items=board_items)),
+    ):
+        progress(stage, "running")
+        try:
+            await step(patient_id)
+        except Exception:
+            progress(stage, "failed")
+            raise
+        progress(stage, "done")
+
+    return {
+        "patient_id": patient_id,
+        "wall_time_s": report["wall_time_s"],
+        "critical_path": report["critical_path"]
+    }
+
+
+job_queue.get_job_queue().register("generate_patient", run_patient_generation)
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_queue.get_job_queue().start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.get_job_queue().stop()
+
+
 @app.post("/generate/patient")
 async def handle_chat(payload: PatientGenerate):
     """
-    Receives JSON payload with Base64 encoded files.
-    Decodes files -> Saves to GCS -> Passes filenames to Agent.
+    Queues generation of a synthetic patient and returns immediately.
+    Poll GET /jobs/{job_id} for stage-level progress.
     """
 
     try:
-        # 1. HANDLE FILE UPLOADS (Base64 -> GCS)
         # patient_seed = {
         #     "description" : "",
         #     "encounters_count" : 3,
         #     "imaging_count_in_encounters" : 2
         # }
-        patient_id = f"PT-{str(uuid.uuid4())[:8].upper()}"
+        # Completed stages of an earlier run with the same seed are restored
+        patient_id = payload.patient_id or f"PT-{str(uuid.uuid4())[:8].upper()}"
         seed_dict = payload.__dict__
         seed_dict["patient_id"] = patient_id
 
-        PM = my_agents.PatientManager(payload.__dict__)
-        await PM.generate_ground_truth_patient()
-
-        await process_pre_consult(patient_id)
-        await process_board(patient_id)
-        await process_board_update(patient_id)
+        job_id = await job_queue.get_job_queue().submit("generate_patient", seed_dict)
 
         return {
-            "status": "success",
+            "status": "queued",
+            "job_id": job_id,
             "patient_id": patient_id
         }
 
-    except FileNotFoundError:
-        logger.error(f"Patient data not found for ID: {payload.patient_id}")
-        raise HTTPException(status_code=404, detail="Patient data not found.")
-    
     except Exception as e:
-        logger.error(f"Error processing chat: {str(e)}")
+        logger.error(f"Error queueing patient generation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status, per-stage progress and result of a background job.
+    """
+    job = await job_queue.get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
 
 @app.post("/chat", response_model=ChatResponse)
 async def handle_chat(payload: ChatRequest):
@@ -196,7 +272,7 @@ async def handle_chat(payload: ChatRequest):
                     elif att.filename.lower().endswith(".jpg"): content_type = "image/jpeg"
                     elif att.filename.lower().endswith(".pdf"): content_type = "application/pdf"
 
-                    chat_agent.gcs.create_file_from_string(
+                    await chat_agent.gcs.create_file_from_string(
                         file_bytes, 
                         file_path, 
                         content_type=content_type
@@ -249,7 +325,7 @@ async def get_chat_history(patient_id: str):
         file_path = f"patient_data/{patient_id}/pre_consultation_chat.json"
 
         # Read file from GCS using the agent's existing GCS manager
-        content_str = chat_agent.gcs.read_file_as_string(file_path)
+        content_str = await chat_agent.gcs.read_file_as_string(file_path)
 
         if not content_str:
             raise HTTPException(status_code=404, detail="Chat history file is empty or missing.")
@@ -271,14 +347,19 @@ async def get_patients():
     """
     patient_pool = []
     try:
-        file_list = chat_agent.gcs.list_files("patient_data")
-        for p in file_list:
+        file_list = await chat_agent.gcs.list_files("patient_data")
+
+        async def read_basic_info(p):
             try:
                 patient_id = p.replace('/',"")  # Extract patient ID from path
-                basic_data = json.loads(chat_agent.gcs.read_file_as_string(f"patient_data/{patient_id}/basic_info.json"))
-                patient_pool.append(basic_data)
+                return json.loads(await chat_agent.gcs.read_file_as_string(f"patient_data/{patient_id}/basic_info.json"))
             except Exception as e:
                 print(f"Error reading basic info for {p}: {e}")
+                return None
+
+        # Fetch every patient's basic info concurrently, keeping listing order
+        results = await asyncio.gather(*[read_basic_info(p) for p in file_list])
+        patient_pool = [r for r in results if r is not None]
         return patient_pool
     except Exception as e:
         traceback.print_exc()
@@ -308,7 +389,7 @@ async def reset_chat_history(patient_id: str):
         json_content = json.dumps(default_chat_state, indent=4)
         
         # Overwrite the file in GCS using the agent's bucket manager
-        chat_agent.gcs.create_file_from_string(
+        await chat_agent.gcs.create_file_from_string(
             json_content, 
             file_path, 
             content_type="application/json"
@@ -328,17 +409,21 @@ async def reset_chat_history(patient_id: str):
 
 
 @app.get("/process/{patient_id}/preconsult")
-async def process_pre_consult(patient_id: str):
+async def process_pre_consult(patient_id: str, force: bool = False, ground_truth: Optional[bool] = None):
     """
     Resets the chat history for a specific patient to the default initial greeting.
+    Only new or changed raw_data images are OCR'd; pass ?force=true to redo all.
+    ?ground_truth=true takes generated documents' text as-is and only OCRs
+    uploads (default: OCR_GROUND_TRUTH).
     """
     try:
-        data_process = my_agents.RawDataProcessing()
-        await data_process.process_raw_data(patient_id)
+        summary = await data_agent.process_raw_data(patient_id, force=force, use_ground_truth=ground_truth)
         
         return {
             "status": "success", 
-            "message": "Chat history has been reset."
+            "message": "Chat history has been reset.",
+            "ground_truth_files": summary["ground_truth"],
+            "failed_files": summary["failed"]
             }
 
     except Exception as e:
@@ -346,31 +431,100 @@ async def process_pre_consult(patient_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to process patient: {str(e)}")
     
 @app.get("/process/{patient_id}/board")
-async def process_board(patient_id: str):
+async def process_board(patient_id: str, no_cache: bool = False, force: bool = False, dry_run: bool = False):
     """
     Resets the chat history for a specific patient to the default initial greeting.
+    Pass ?no_cache=true to force fresh model calls instead of cached responses.
+    Only board items whose inputs changed are rebuilt; ?force=true rebuilds
+    all of them and ?dry_run=true only lists what would be rebuilt.
     """
     try:
-        data_process = my_agents.RawDataProcessing()
-        await data_process.process_dashboard_content(patient_id)
+        if dry_run:
+            plan = await data_agent.process_dashboard_content(patient_id, force=force or no_cache, dry_run=True)
+            return {"status": "success", "dry_run": True, **plan}
+
+        if no_cache:
+            with llm_cache.bypass_cache():
+                results = await data_agent.process_dashboard_content(patient_id, force=True)
+        else:
+            results = await data_agent.process_dashboard_content(patient_id, force=force)
         
         return {
             "status": "success", 
-            "message": "Board objects have been processed."
+            "message": "Board objects have been processed.",
+            "rebuilt": list(results)
             }
 
     except Exception as e:
         logger.error(f"Error processing patient for {patient_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process patient: {str(e)}")
     
+BOARD_STREAM_TASKS = set()
+
+
+@app.get("/process/{patient_id}/board/stream")
+async def stream_board(patient_id: str, force: bool = False):
+    """
+    Builds the board like /process/{patient_id}/board but streams it as
+    Server-Sent Events:
+      component  one board component ({"item", "component"}) as soon as its
+                 item is available (up-to-date items first, then each
+                 rebuilt item when its builder finishes)
+      status     builder progress ({"item", "status"})
+      complete   board_objects.json written ({"rebuilt", "components"})
+      error      the build failed ({"message"})
+    The build carries on if the client disconnects.
+    """
+    queue = asyncio.Queue()
+    board_items = {}
+
+    async def build():
+        try:
+            results = await data_agent.process_dashboard_content(
+                patient_id,
+                force=force,
+                board_items=board_items,
+                on_item=lambda item, value: queue.put_nowait(("component", {"item": item, "value": value})),
+                on_update=lambda item, status: queue.put_nowait(("status", {"item": item, "status": status}))
+            )
+            board_objects = await data_agent.process_board_object(patient_id, board_items=board_items)
+            queue.put_nowait(("complete", {"rebuilt": list(results), "components": len(board_objects)}))
+        except Exception as e:
+            logger.error(f"Error streaming board for {patient_id}: {str(e)}")
+            queue.put_nowait(("error", {"message": str(e)}))
+
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    async def events():
+        task = asyncio.create_task(build())
+        # Held until done so a disconnected client doesn't leave it unreferenced
+        BOARD_STREAM_TASKS.add(task)
+        task.add_done_callback(BOARD_STREAM_TASKS.discard)
+        while True:
+            name, data = await queue.get()
+            if name == "component":
+                for component in my_agents.assemble_board_objects({data["item"]: data["value"]}):
+                    yield event("component", {"item": data["item"], "component": component})
+                continue
+            yield event(name, data)
+            if name in ("complete", "error"):
+                await task
+                break
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/process/{patient_id}/board-update")
 async def process_board_update(patient_id: str):
     """
     Resets the chat history for a specific patient to the default initial greeting.
     """
     try:
-        data_process = my_agents.RawDataProcessing()
-        await data_process.process_board_object(patient_id)
+        await data_agent.process_board_object(patient_id)
         
         return {
             "status": "success", 
@@ -388,7 +542,7 @@ async def read_patient_file(patient_id: str,file_path: str):
     """
     try:
         blob_file_path = f"patient_data/{patient_id}/{file_path}"
-        content_str = chat_agent.gcs.read_file_as_string(blob_file_path)
+        content_str = await chat_agent.gcs.read_file_as_string(blob_file_path)
         data_json = json.loads(content_str)
         
         return data_json
@@ -402,7 +556,7 @@ async def get_image(patient_id:str, file_path: str):
 
     try:
         # 1. Read the raw bytes
-        byte_data = chat_agent.gcs.read_file_as_bytes(f"patient_data/{patient_id}/raw_data/{file_path}")
+        byte_data = await chat_agent.gcs.read_file_as_bytes(f"patient_data/{patient_id}/raw_data/{file_path}")
         
         # 2. Determine media type (optional but good practice)
         media_type = "image/png"
@@ -431,7 +585,7 @@ async def get_schedule(clinician_id: str):
 
 
         schedule_ops = schedule_manager.ScheduleCSVManager(gcs_manager=gcs, csv_blob_path=f"clinic_data/{doc_file}")
-        return schedule_ops.get_all()
+        return await gcs_async.run(schedule_ops.get_all)
 
     except Exception as e:
         logger.error(f"Error getting schedule for {clinician_id}: {str(e)}")
@@ -472,7 +626,8 @@ async def update_schedule_details(request: UpdateSlotRequest):
             return {"message": "No changes requested."}
 
         # 4. Perform Update
-        success = schedule_ops.update_slot(
+        success = await gcs_async.run(
+            schedule_ops.update_slot,
             nurse_id=request.clinician_id,
             date=request.date,
             time=request.time,
@@ -526,7 +681,8 @@ async def update_schedule_details(request: SwitchSchedule):
             return {"message": "No changes requested."}
 
         # 4. Perform Update
-        success = schedule_ops.update_slot(
+        success = await gcs_async.run(
+            schedule_ops.update_slot,
             nurse_id=request.clinician_id,
             date=request.item1.date,
             time=request.item1.time,
@@ -545,7 +701,8 @@ async def update_schedule_details(request: SwitchSchedule):
             return {"message": "No changes requested."}
 
         # 4. Perform Update
-        success = schedule_ops.update_slot(
+        success = await gcs_async.run(
+            schedule_ops.update_slot,
             nurse_id=request.clinician_id,
             date=request.item2.date,
             time=request.item2.time,
@@ -584,7 +741,8 @@ async def switch_slots(request: SwitchSchedule):
         )
 
         # 3. Perform Slot Switch
-        success = schedule_ops.switch_appointments(
+        success = await gcs_async.run(
+            schedule_ops.switch_appointments,
             nurse_id=request.clinician_id,
             date1=request.item1.date,
             time1=request.item1.time,
@@ -626,7 +784,7 @@ async def register_patient(patient: PatientRegistrationRequest):
     json_content = json.dumps(patient_data, indent=4)
     
     # Overwrite the file in GCS using the agent's bucket manager
-    gcs.create_file_from_string(
+    await gcs_async.create_file_from_string(
         json_content, 
         file_path, 
         content_type="application/json"
@@ -647,7 +805,7 @@ async def get_available_slots(doctor_type: Optional[str] = "General"):
     # SIMULATION: logic to get dates relative to 'today'
 
     schedule_ops = schedule_manager.ScheduleCSVManager(gcs_manager=gcs, csv_blob_path=f"clinic_data/doctor_schedule.csv")
-    slots = schedule_ops.get_empty_schedule()
+    slots = await gcs_async.run(schedule_ops.get_empty_schedule)
 
     return {"available_slots": slots}
 
@@ -665,11 +823,8 @@ async def sms_webhook(request: Request):
 
     # 2. Setup Dialogflow Client
     #    Cloud Run automatically provides credentials here!
-    client_options = None
     api_endpoint = f"europe-west2-dialogflow.googleapis.com:443"
-    client_options = {"api_endpoint": api_endpoint}
-
-    session_client = dialogflow.SessionsClient(client_options=client_options)
+    session_client = client_registry.get_dialogflow_sessions_client(api_endpoint)
     
     # Use Sender Phone Number as Session ID
     session_path = f"projects/{PROJECT_ID}/locations/europe-west2/agents/{AGENT_ID}/sessions/{sender_id}"
@@ -682,7 +837,7 @@ async def sms_webhook(request: Request):
         request_df = dialogflow.DetectIntentRequest(
             session=session_path, query_input=query_input
         )
-        response_df = session_client.detect_intent(request=request_df)
+        response_df = await asyncio.to_thread(session_client.detect_intent, request=request_df)
         
         # 4. Extract Bot Reply
         bot_reply = "..."
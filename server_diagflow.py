@@ -14,7 +14,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 app = FastAPI(title="Clinic Agent Backend")
-gcs = bucket_ops.GCSBucketManager(bucket_name="clinic_sim")
+gcs = bucket_ops.get_bucket_manager()
 
 # ==========================================
 # 1. DATA MODELS (Matching your Dialogflow Parameters)
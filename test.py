@@ -81,7 +81,7 @@ print("Response JSON:", response.json())
 # labs = asyncio.run(PM.generate_labs(patient_profile, encounters))
 
 
-# asyncio.run(PM.generate_ground_truth())
+# asyncio.run(PM.generate_ground_truth_patient())
 # asyncio.run(PM.generate_pre_consultation_chat())
 
 # with open("output/P0001/encounters.json", "r", encoding="utf-8") as f:
@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+import board_context
+import lab_engine
+import my_agents
+import prompt_registry
+
+RAW_OBJECTS = [
+    {"source_file": "encounter_report_0_2025-01-01.png", "type": "encounter", "content": "visit"},
+    {"source_file": "lab_report_0_2025-01-01.png", "type": "lab", "content": "ALT 52"},
+]
+CHAT = {"conversation": [{"sender": "admin", "message": "Hello"}]}
+LABS = [{"biomarker": "ALT", "unit": "U/L", "values": [{"t": "2025-01-01", "value": 52}]}]
+
+
+def fingerprints(chat=CHAT):
+    run_context = board_context.PatientRunContext(None, "PT-FP", RAW_OBJECTS, chat, LABS)
+    return my_agents.RawDataProcessing().board_fingerprints(run_context)
+
+
+def changed(before, after):
+    return {item for item in before if before[item] != after[item]}
+
+
+class BoardFingerprintTest(unittest.TestCase):
+    def test_stable_for_unchanged_inputs(self):
+        self.assertEqual(fingerprints(), fingerprints())
+
+    def test_chat_change_rebuilds_record_items_only(self):
+        before = fingerprints()
+        after = fingerprints(chat={"conversation": []})
+        self.assertEqual(changed(before, after), {
+            "patient_context", "dashboard_analysis", "dashboard_pre_diagnosis",
+            "dashboard_encounters_track", "dashboard_medication_track", "dashboard_risk_event_track",
+        })
+
+    def test_prompt_edit_rebuilds_the_item_and_its_dependants(self):
+        before = fingerprints()
+        original = prompt_registry.get_prompt
+
+        def edited(name):
+            text = original(name)
+            return text + "\nEdited." if name == "encounter_generator" else text
+
+        with mock.patch.object(prompt_registry, "get_prompt", edited):
+            after = fingerprints()
+        self.assertEqual(changed(before, after), {
+            "encounters", "dashboard_encounters_track", "dashboard_medication_track", "dashboard_risk_event_track",
+        })
+
+    def test_schema_edit_rebuilds_the_item(self):
+        before = fingerprints()
+        original = prompt_registry.get_schema
+
+        def edited(name):
+            schema = original(name)
+            return dict(schema, description="edited") if name == "dashboard_analysis" else schema
+
+        with mock.patch.object(prompt_registry, "get_schema", edited):
+            after = fingerprints()
+        self.assertEqual(changed(before, after), {"dashboard_analysis"})
+
+    def test_lab_mode_rebuilds_lab_items(self):
+        before = fingerprints()
+        with mock.patch.object(lab_engine, "LAB_ENGINE", not lab_engine.LAB_ENGINE):
+            after = fingerprints()
+        self.assertEqual(changed(before, after), {"dashboard_lab_latest", "dashboard_lab_chart", "dashboard_lab_track"})
+
+
+if __name__ == "__main__":
+    unittest.main()
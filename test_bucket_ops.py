@@ -0,0 +1,67 @@
+import unittest
+
+import blob_cache
+import bucket_ops
+
+
+class CountingBackend(bucket_ops.InMemoryBucketManager):
+    """
+    In-memory backend that counts full downloads.
+    """
+    def __init__(self):
+        super().__init__("test")
+        self.downloads = 0
+
+    def read_file_at_generation(self, source_blob_name, generation):
+        self.downloads += 1
+        return super().read_file_at_generation(source_blob_name, generation)
+
+
+class CachedBucketManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = CountingBackend()
+        self.cache = blob_cache.BlobLRUCache(max_bytes=1024)
+        self.manager = bucket_ops.CachedBucketManager(self.backend, self.cache)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        self.backend.create_file_from_string("v1", "a.txt")
+        self.assertEqual(self.manager.read_file_as_string("a.txt"), "v1")
+        self.assertEqual(self.manager.read_file_as_string("a.txt"), "v1")
+        self.assertEqual(self.backend.downloads, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_write_by_another_client_bumps_the_generation(self):
+        self.backend.create_file_from_string("v1", "a.txt")
+        self.manager.read_file_as_string("a.txt")
+
+        # Written straight to the backend, as another instance would
+        self.backend.create_file_from_string("v2", "a.txt")
+        self.assertEqual(self.manager.read_file_as_string("a.txt"), "v2")
+        self.assertEqual(self.backend.downloads, 2)
+        self.assertEqual(self.cache.stats()["stale"], 1)
+
+    def test_own_writes_and_deletes_invalidate(self):
+        self.manager.create_file_from_string("v1", "a.txt")
+        self.manager.read_file_as_string("a.txt")
+        self.manager.create_file_from_string("v2", "a.txt")
+        self.assertEqual(self.manager.read_file_as_string("a.txt"), "v2")
+
+        self.manager.delete_file("a.txt")
+        self.assertIsNone(self.manager.read_file_as_string("a.txt"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_lru_eviction_respects_the_byte_budget(self):
+        for name in ("a", "b", "c"):
+            self.backend.create_file_from_string("x" * 400, name)
+            self.manager.read_file_as_bytes(name)
+        stats = self.cache.stats()
+        self.assertLessEqual(stats["bytes"], 1024)
+        self.assertEqual(stats["evictions"], 1)
+
+        # 'a' was least recently used and had to be downloaded again
+        self.manager.read_file_as_bytes("a")
+        self.assertEqual(self.backend.downloads, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
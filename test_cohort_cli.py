@@ -0,0 +1,51 @@
+import json
+import unittest
+
+import cohort_cli
+
+
+class SplitLimitsTest(unittest.TestCase):
+    def test_defaults_are_split_too(self):
+        overrides = cohort_cli.split_limits({}, 4)
+        self.assertEqual(overrides["LLM_MAX_CONCURRENCY"], "2")
+        # 0 = unlimited stays unlimited
+        self.assertEqual(overrides["LLM_RPM"], "0")
+        self.assertEqual(overrides["LLM_TPM"], "0")
+
+    def test_explicit_and_per_model_limits(self):
+        overrides = cohort_cli.split_limits({
+            "LLM_RPM": "100",
+            "LLM_MAX_CONCURRENCY": "3",
+            "LLM_LIMITS": json.dumps({"image-model": {"concurrency": 2, "rpm": 0}})
+        }, 4)
+        self.assertEqual(overrides["LLM_RPM"], "25")
+        self.assertEqual(overrides["LLM_MAX_CONCURRENCY"], "1")
+        self.assertEqual(json.loads(overrides["LLM_LIMITS"]), {"image-model": {"concurrency": 1, "rpm": 0}})
+
+
+class BuildReportTest(unittest.TestCase):
+    def test_failed_runs_count_in_stage_latency(self):
+        chunks = [{
+            "patients": [
+                {"patient_id": "A", "status": "succeeded", "error": None, "wall_time_s": 10.0,
+                 "stages": {"encounter_0_img": 4.0, "profile": 1.0}, "failed_stages": {}},
+                {"patient_id": "B", "status": "failed", "error": "boom", "wall_time_s": 60.0,
+                 "stages": {"profile": 3.0}, "failed_stages": {"encounter_0_img": 50.0}},
+                # Worker died: no timings at all
+                {"patient_id": "C", "status": "failed", "error": "killed", "wall_time_s": 0.0, "stages": {}},
+            ],
+            "llm": {}
+        }]
+        report = cohort_cli.build_report(chunks, wall_time=60.0)
+
+        self.assertEqual((report["succeeded"], report["failed"]), (1, 2))
+        self.assertEqual(report["stage_latency"]["profile"]["count"], 2)
+        self.assertEqual(report["stage_latency"]["profile"]["max_s"], 3.0)
+        self.assertEqual(report["stage_latency"]["encounter_img"]["count"], 1)
+        self.assertEqual(report["failed_stage_latency"], {
+            "encounter_img": {"count": 1, "mean_s": 50.0, "p50_s": 50.0, "p95_s": 50.0, "max_s": 50.0}
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import context_cache
+
+CONTEXT = "### PATIENT RECORDS ###\n" + "record line\n" * 2000
+
+
+class Config(SimpleNamespace):
+    def model_copy(self, update):
+        return Config(**dict(vars(self), **update))
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    async def create(self, model, config):
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+class FakeModels:
+    async def generate_content_stream(self, model, contents, config):
+        async def chunks():
+            for text in ("Hello", " world"):
+                await asyncio.sleep(0.01)
+                yield SimpleNamespace(text=text, usage_metadata=None)
+            yield SimpleNamespace(text=None, usage_metadata=SimpleNamespace(prompt_token_count=10, cached_content_token_count=0))
+        return chunks()
+
+
+def fake_client():
+    return SimpleNamespace(aio=SimpleNamespace(caches=FakeCaches(), models=FakeModels()))
+
+
+class SharedContextTest(unittest.TestCase):
+    def test_system_instruction_stays_on_the_cached_content(self):
+        client = fake_client()
+        shared = context_cache.SharedContext(client, "model", CONTEXT, mode="vertex", instruction="cache")
+
+        async def run():
+            requests = await asyncio.gather(
+                shared.prepare("task a", Config(system_instruction="Instruction A", cached_content=None)),
+                shared.prepare("task a again", Config(system_instruction="Instruction A", cached_content=None)),
+                shared.prepare("task b", Config(system_instruction="Instruction B", cached_content=None)),
+            )
+            await shared.close()
+            return requests
+
+        requests = asyncio.run(run())
+        self.assertEqual([c.system_instruction for c in client.aio.caches.created], ["Instruction A", "Instruction B"])
+        (contents_a, config_a), (_, config_a2), (contents_b, config_b) = requests
+        self.assertEqual(contents_a, ["task a"])
+        self.assertIsNone(config_a.system_instruction)
+        self.assertEqual(config_a.cached_content, config_a2.cached_content)
+        self.assertNotEqual(config_a.cached_content, config_b.cached_content)
+        self.assertEqual(len(client.aio.caches.deleted), 2)
+
+    def test_inline_instruction_shares_one_cache(self):
+        client = fake_client()
+        shared = context_cache.SharedContext(client, "model", CONTEXT, mode="vertex", instruction="inline")
+
+        contents, config = asyncio.run(shared.prepare("task", Config(system_instruction="Instruction A", cached_content=None)))
+        asyncio.run(shared.prepare("task", Config(system_instruction="Instruction B", cached_content=None)))
+        self.assertEqual(len(client.aio.caches.created), 1)
+        self.assertIn("Instruction A", contents[0])
+        self.assertEqual(contents[1], "task")
+
+    def test_small_context_stays_local(self):
+        client = fake_client()
+        shared = context_cache.SharedContext(client, "model", "short", mode="vertex")
+        contents, config = asyncio.run(shared.prepare("task", Config(system_instruction="A", cached_content=None)))
+        self.assertEqual(contents, ["short", "task"])
+        self.assertEqual(config.system_instruction, "A")
+        self.assertEqual(client.aio.caches.created, [])
+
+    def test_streamed_call_reports_time_to_first_token(self):
+        response = asyncio.run(context_cache.stream_content(fake_client(), "model", ["task"], Config()))
+        self.assertEqual(response.text, "Hello world")
+        self.assertEqual(response.usage_metadata.prompt_token_count, 10)
+        self.assertGreater(response.first_token, 0)
+
+        shared = context_cache.SharedContext(None, "model", CONTEXT, mode="local")
+        shared.record(response, 0.5, response.first_token)
+        summary = shared.summary()
+        self.assertEqual(summary["avg_latency_s"], 0.5)
+        self.assertLess(summary["avg_time_to_first_token_s"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import unittest
+
+import dag_scheduler
+
+
+class MemoryCheckpoints:
+    def __init__(self):
+        self.saved = {}
+
+    async def load(self, stage, fingerprint):
+        return self.saved.get((stage, fingerprint))
+
+    async def save(self, stage, fingerprint, result):
+        self.saved[(stage, fingerprint)] = result
+
+
+def stage(log, name, seconds=0.0, result=None):
+    async def fn():
+        log.append(("start", name))
+        await asyncio.sleep(seconds)
+        log.append(("end", name))
+        return result if result is not None else name
+    return fn
+
+
+class DAGSchedulerTest(unittest.TestCase):
+    def test_dependencies_finish_before_dependants_start(self):
+        log = []
+        scheduler = dag_scheduler.DAGScheduler(max_concurrency=4)
+        scheduler.add("a", stage(log, "a"))
+        scheduler.add("b", stage(log, "b"), ["a"])
+        scheduler.add("c", stage(log, "c"), ["a"])
+        scheduler.add("d", stage(log, "d"), ["b", "c"])
+        results = asyncio.run(scheduler.run())
+
+        self.assertEqual(set(results), {"a", "b", "c", "d"})
+        for before, after in (("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")):
+            self.assertLess(log.index(("end", before)), log.index(("start", after)))
+
+    def test_independent_stages_overlap_and_critical_path(self):
+        log = []
+        scheduler = dag_scheduler.DAGScheduler(max_concurrency=4)
+        scheduler.add("root", stage(log, "root", 0.01))
+        scheduler.add("slow", stage(log, "slow", 0.1), ["root"])
+        scheduler.add("fast", stage(log, "fast", 0.01), ["root"])
+        scheduler.add("tail", stage(log, "tail", 0.01), ["fast"])
+        asyncio.run(scheduler.run())
+
+        report = scheduler.report()
+        self.assertEqual(report["critical_path"], ["root", "slow"])
+        self.assertLess(report["wall_time_s"], report["sum_stage_time_s"])
+
+    def test_expand_adds_stages_at_runtime(self):
+        log = []
+        scheduler = dag_scheduler.DAGScheduler()
+
+        def expand(items):
+            for item in items:
+                scheduler.add(f"item_{item}", stage(log, f"item_{item}"), ["list"])
+
+        scheduler.add("list", stage(log, "list", result=[1, 2]), expand=expand)
+        results = asyncio.run(scheduler.run())
+        self.assertEqual(set(results), {"list", "item_1", "item_2"})
+
+    def test_failure_skips_dependants_when_not_fail_fast(self):
+        async def boom():
+            raise RuntimeError("boom")
+
+        log = []
+        scheduler = dag_scheduler.DAGScheduler(fail_fast=False)
+        scheduler.add("bad", boom)
+        scheduler.add("after_bad", stage(log, "after_bad"), ["bad"])
+        scheduler.add("independent", stage(log, "independent"))
+        asyncio.run(scheduler.run())
+
+        statuses = {name: s["status"] for name, s in scheduler.report()["stages"].items()}
+        self.assertEqual(statuses, {"bad": "failed", "after_bad": "skipped", "independent": "done"})
+
+    def test_checkpoints_restore_finished_stages(self):
+        store = MemoryCheckpoints()
+        first = []
+        scheduler = dag_scheduler.DAGScheduler(checkpoints=store, salt="seed")
+        scheduler.add("a", stage(first, "a"))
+        scheduler.add("b", stage(first, "b"), ["a"])
+        asyncio.run(scheduler.run())
+
+        second = []
+        resumed = dag_scheduler.DAGScheduler(checkpoints=store, salt="seed")
+        resumed.add("a", stage(second, "a"))
+        resumed.add("b", stage(second, "b"), ["a"])
+        asyncio.run(resumed.run())
+        self.assertEqual(second, [])
+        self.assertEqual(resumed.report()["restored_stages"], 2)
+
+        # A different salt (seed) invalidates every checkpoint
+        third = []
+        other = dag_scheduler.DAGScheduler(checkpoints=store, salt="other seed")
+        other.add("a", stage(third, "a"))
+        asyncio.run(other.run())
+        self.assertEqual(third, [("start", "a"), ("end", "a")])
+
+    def test_unknown_dependency_is_reported(self):
+        scheduler = dag_scheduler.DAGScheduler()
+        scheduler.add("orphan", stage([], "orphan"), ["missing"])
+        with self.assertRaises(RuntimeError):
+            asyncio.run(scheduler.run())
+
+
+if __name__ == "__main__":
+    unittest.main()
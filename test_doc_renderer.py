@@ -0,0 +1,47 @@
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+import doc_renderer
+
+TEXT = "PATIENT SUMMARY\nALT 52 U/L HIGH\nAlbumin 30 g/L LOW\n---\nFollow up in 4 weeks."
+
+
+def decode(png):
+    image = Image.open(BytesIO(png))
+    image.load()
+    return image
+
+
+class RenderDocumentTest(unittest.TestCase):
+    def test_clean_page_for_every_type(self):
+        for doc_type in doc_renderer.DOC_TYPES:
+            with self.subTest(doc_type=doc_type):
+                image = decode(doc_renderer.render_document(TEXT, doc_type, photo=False))
+                self.assertEqual(image.format, "PNG")
+                self.assertEqual(image.size, (doc_renderer.PAGE_WIDTH, doc_renderer.PAGE_HEIGHT))
+
+    def test_photo_adds_border_and_skew(self):
+        for doc_type in doc_renderer.DOC_TYPES:
+            with self.subTest(doc_type=doc_type):
+                image = decode(doc_renderer.render_document(TEXT, doc_type, photo=True))
+                # 40px desk border on each side, plus whatever the rotation adds
+                self.assertGreaterEqual(image.width, doc_renderer.PAGE_WIDTH + 80)
+                self.assertGreaterEqual(image.height, doc_renderer.PAGE_HEIGHT + 80)
+
+    def test_long_text_grows_the_page(self):
+        text = "\n".join(f"Line {i}" for i in range(200))
+        image = decode(doc_renderer.render_document(text, "lab", photo=False))
+        self.assertEqual(image.width, doc_renderer.PAGE_WIDTH)
+        self.assertGreater(image.height, doc_renderer.PAGE_HEIGHT)
+
+    def test_output_is_deterministic(self):
+        self.assertEqual(
+            doc_renderer.render_document(TEXT, "encounter", photo=True),
+            doc_renderer.render_document(TEXT, "encounter", photo=True)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import json
+import asyncio
+import unittest
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["LLM_CACHE_BACKEND"] = "off"
+
+import my_agents
+
+ENCOUNTERS = [
+    {"encounter": {"meta": {"date_time": "2025-01-01T10:00"}, "plan": {}}, "patient": {"name": "Test Patient"}}
+]
+
+
+def make_manager(gcs=None, encounter_text=None, images=None, referral_images=None, patient_id="PT-RESUME"):
+    """
+    PatientManager with every model call replaced by a canned result.
+    encounter_text / images / referral_images are lists of successive
+    encounter_doc_parser / generate_encounter_img / generate_referral_img
+    returns (the image lists default to always succeeding).
+    """
+    pm = my_agents.PatientManager({"patient_id": patient_id, "description": "test"})
+    if gcs is not None:
+        pm.gcs = gcs
+    calls = {"encounter_doc": 0, "image": 0, "referral": 0, "referral_image": 0}
+
+    async def value(v):
+        return v
+
+    async def profile(input_criteria=None, with_basic_info=True):
+        return "profile"
+
+    async def encounter_doc(encounter):
+        calls["encounter_doc"] += 1
+        return encounter_text.pop(0)
+
+    async def image(text, output_filename=None, **kwargs):
+        calls["image"] += 1
+        return images.pop(0) if images is not None else b"png"
+
+    async def referral(with_image=True):
+        calls["referral"] += 1
+        return "referral letter"
+
+    async def referral_image(text, output_filename=None):
+        calls["referral_image"] += 1
+        return referral_images.pop(0) if referral_images is not None else b"png"
+
+    pm.generate_patient_profile = profile
+    pm.generate_basic_info = lambda text: value({"name": "Test Patient"})
+    pm.generate_system_prompt = lambda text: value("system prompt")
+    pm.generate_encounters = lambda text: value(ENCOUNTERS)
+    pm.generate_labs = lambda text, encounters: value([])
+    pm.generate_referral_letter = referral
+    pm.generate_referral_img = referral_image
+    pm.encounter_doc_parser = encounter_doc
+    pm.generate_encounter_img = image
+    return pm, calls
+
+
+class GenerationResumeTest(unittest.TestCase):
+    def test_failed_document_is_not_checkpointed(self):
+        pm, calls = make_manager(encounter_text=["Error parsing document."])
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(pm.generate_ground_truth_patient())
+        self.assertEqual(calls["encounter_doc"], 1)
+        self.assertEqual(pm.generation_report["stages"]["encounter_0_doc"]["status"], "failed")
+        self.assertIsNone(pm.gcs.sync.read_file_as_string("patient_data/PT-RESUME/checkpoints/encounter_0_doc.json"))
+
+        # Resume with the same seed: finished stages are restored, the failed one reruns
+        resumed, resumed_calls = make_manager(gcs=pm.gcs, encounter_text=["encounter report"])
+        report = asyncio.run(resumed.generate_ground_truth_patient())
+
+        self.assertEqual(resumed_calls["encounter_doc"], 1)
+        self.assertEqual(report["stages"]["encounter_0_doc"]["status"], "done")
+        self.assertFalse(report["stages"]["encounter_0_doc"]["restored"])
+        self.assertTrue(report["stages"]["profile"]["restored"])
+        self.assertEqual(
+            pm.gcs.sync.read_file_as_string("patient_data/PT-RESUME/raw_data/encounter_report_0_2025-01-01.txt"),
+            "encounter report"
+        )
+        manifest = json.loads(pm.gcs.sync.read_file_as_string("patient_data/PT-RESUME/generation_manifest.json"))
+        self.assertEqual(manifest["status"], "complete")
+
+    def test_failed_image_is_retried_on_resume(self):
+        pm, calls = make_manager(encounter_text=["encounter report"], images=[None], patient_id="PT-IMAGE")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(pm.generate_ground_truth_patient())
+        manifest = json.loads(pm.gcs.sync.read_file_as_string("patient_data/PT-IMAGE/generation_manifest.json"))
+        self.assertEqual(manifest["status"], "failed")
+        self.assertIsNone(pm.gcs.sync.read_file_as_string("patient_data/PT-IMAGE/checkpoints/encounter_0_img.json"))
+
+        # The text is restored; only the image is generated again
+        resumed, resumed_calls = make_manager(gcs=pm.gcs, encounter_text=[], images=[b"png"], patient_id="PT-IMAGE")
+        report = asyncio.run(resumed.generate_ground_truth_patient())
+
+        self.assertEqual(resumed_calls["encounter_doc"], 0)
+        self.assertEqual(resumed_calls["image"], 1)
+        self.assertTrue(report["stages"]["encounter_0_doc"]["restored"])
+        self.assertFalse(report["stages"]["encounter_0_img"]["restored"])
+        self.assertEqual(
+            pm.gcs.sync.read_file_as_string("patient_data/PT-IMAGE/raw_data/encounter_report_0_2025-01-01.png"),
+            "png"
+        )
+
+    def test_referral_image_failure_keeps_the_letter(self):
+        pm, calls = make_manager(encounter_text=["encounter report"], referral_images=[None], patient_id="PT-REFERRAL")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(pm.generate_ground_truth_patient())
+        self.assertIsNotNone(pm.gcs.sync.read_file_as_string("patient_data/PT-REFERRAL/checkpoints/referral_letter.json"))
+        self.assertIsNone(pm.gcs.sync.read_file_as_string("patient_data/PT-REFERRAL/checkpoints/referral_letter_img.json"))
+
+        # The encounter document may have been cancelled by the failure, so allow one more
+        resumed, resumed_calls = make_manager(gcs=pm.gcs, encounter_text=["encounter report"], referral_images=[b"png"], patient_id="PT-REFERRAL")
+        report = asyncio.run(resumed.generate_ground_truth_patient())
+
+        self.assertEqual(resumed_calls["referral"], 0)
+        self.assertEqual(resumed_calls["referral_image"], 1)
+        self.assertFalse(report["stages"]["referral_letter_img"]["restored"])
+        self.assertEqual(pm.gcs.sync.read_file_as_string("patient_data/PT-REFERRAL/raw_data/referral_letter.png"), "png")
+
+
+if __name__ == "__main__":
+    unittest.main()
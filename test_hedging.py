@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+
+import hedging
+
+
+def attempt(seconds, result="image"):
+    async def make_attempt():
+        await asyncio.sleep(seconds)
+        return result
+    return make_attempt
+
+
+class HedgePolicyTest(unittest.TestCase):
+    def test_deadline_stays_up_under_slow_tail(self):
+        # 30% of primary calls are far slower than the deadline. Those are
+        # cancelled by the hedge; their elapsed time must still count.
+        policy = hedging.HedgePolicy(percentile=0.9, default_deadline=0.05, min_samples=5, min_deadline=0.001)
+
+        async def runs():
+            for i in range(20):
+                primary = attempt(1.0 if i % 10 < 3 else 0.005)
+                await policy.run([("primary", primary), ("fallback", attempt(0))])
+
+        asyncio.run(runs())
+        self.assertGreaterEqual(policy.deadline("primary"), 0.045)
+        self.assertEqual(policy.stats()["models"]["primary"]["cancelled"], 6)
+
+    def test_deadline_floor(self):
+        policy = hedging.HedgePolicy(default_deadline=45.0, min_samples=2, min_deadline=5.0)
+        for _ in range(3):
+            policy.record("primary", "success", 0.1)
+        self.assertEqual(policy.deadline("primary"), 5.0)
+
+    def test_failed_primary_falls_back(self):
+        policy = hedging.HedgePolicy(default_deadline=10.0)
+        model, result = asyncio.run(policy.run([("primary", attempt(0, None)), ("fallback", attempt(0, "fallback"))]))
+        self.assertEqual((model, result), ("fallback", "fallback"))
+        self.assertEqual(policy.stats()["hedges_launched"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
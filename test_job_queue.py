@@ -0,0 +1,99 @@
+import os
+import asyncio
+import tempfile
+import unittest
+
+import job_queue
+
+
+async def wait_for_status(queue, job_id, statuses=("succeeded", "failed"), timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError(f"Job {job_id} stuck in {job['status']}")
+        await asyncio.sleep(0.01)
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, "jobs.db")
+
+    def test_unfinished_jobs_are_requeued_on_restart(self):
+        # The previous process died with one job running and one still queued
+        store = job_queue.JobStore(self.db_path)
+        interrupted = store.create("generate", {"patient_id": "PT-1"})
+        store.mark_running(interrupted)
+        waiting = store.create("generate", {"patient_id": "PT-2"})
+        store._conn.close()
+
+        handled = []
+
+        async def handler(payload, progress):
+            progress("profile", "running")
+            progress("profile", "done")
+            handled.append(payload["patient_id"])
+            return {"patient_id": payload["patient_id"]}
+
+        async def restart():
+            queue = job_queue.JobQueue(job_queue.JobStore(self.db_path), workers=1)
+            queue.register("generate", handler)
+            await queue.start()
+            jobs = [await wait_for_status(queue, job_id) for job_id in (interrupted, waiting)]
+            await queue.stop()
+            return jobs
+
+        first, second = asyncio.run(restart())
+        self.assertEqual(sorted(handled), ["PT-1", "PT-2"])
+        self.assertEqual((first["status"], second["status"]), ("succeeded", "succeeded"))
+        self.assertEqual(first["attempts"], 2)
+        self.assertEqual(first["result"], {"patient_id": "PT-1"})
+        self.assertEqual(first["stages"]["profile"]["status"], "done")
+
+    def test_job_interrupted_too_often_is_failed(self):
+        store = job_queue.JobStore(self.db_path)
+        job_id = store.create("generate", {})
+        for _ in range(3):
+            store.mark_running(job_id)
+        store._conn.close()
+
+        async def handler(payload, progress):
+            raise AssertionError("must not run")
+
+        async def restart():
+            queue = job_queue.JobQueue(job_queue.JobStore(self.db_path), workers=1, max_attempts=3)
+            queue.register("generate", handler)
+            await queue.start()
+            await queue.stop()
+            return await queue.get(job_id)
+
+        job = asyncio.run(restart())
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "Interrupted too many times.")
+
+    def test_handler_error_fails_the_job(self):
+        async def handler(payload, progress):
+            progress("profile", "failed")
+            raise RuntimeError("model unavailable")
+
+        async def run():
+            queue = job_queue.JobQueue(job_queue.JobStore(":memory:"), workers=1)
+            queue.register("generate", handler)
+            await queue.start()
+            job_id = await queue.submit("generate", {})
+            job = await wait_for_status(queue, job_id)
+            await queue.stop()
+            return job
+
+        job = asyncio.run(run())
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "model unavailable")
+        self.assertEqual(job["stages"]["profile"]["status"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+import board_context
+import lab_engine
+
+LABS = [
+    {"biomarker": "Albumin", "unit": "g/L", "referenceRange": {"min": 35, "max": 50},
+     "values": [{"t": "2025-01-01T09:00:00", "value": 17}]},
+    {"biomarker": "Bilirubin", "unit": "mg/dL", "referenceRange": {"min": 0.1, "max": 1.2},
+     "values": [{"t": "2025-01-01", "value": 1.0}]},
+    {"biomarker": "SGPT", "unit": "IU/L", "referenceRange": {"min": 7, "max": 56},
+     "values": [{"t": "2025-02-01", "value": 200}, {"t": "2025-01-01", "value": "40"}]},
+    # Same biomarker reported in SI units by another lab
+    {"biomarker": "Total bilirubin", "unit": "umol/L", "referenceRange": {"min": 2, "max": 21},
+     "values": [{"t": "2025-02-01", "value": 34.2}]},
+    {"biomarker": "Glucose", "unit": "mg/mL", "referenceRange": {},
+     "values": [{"t": "2025-01-01", "value": "n/a"}, {"t": "2025-01-02", "value": 0.9}]},
+]
+
+
+class LabFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = lab_engine.LabFrame(LABS)
+        self.latest = {row["name"]: row for row in self.frame.latest()}
+
+    def test_units_are_converted_to_the_first_series_unit(self):
+        bilirubin = self.latest["Total Bilirubin"]
+        self.assertEqual(bilirubin["unit"], "mg/dL")
+        self.assertAlmostEqual(bilirubin["value"], 2.0)
+        # The SI reference range is converted with the value
+        self.assertEqual(bilirubin["normalRange"], "0.117-1.2281")
+
+    def test_flags(self):
+        self.assertEqual(self.latest["ALT"]["status"], "critical")       # >= 3x upper limit
+        self.assertEqual(self.latest["Total Bilirubin"]["status"], "high")
+        self.assertEqual(self.latest["Albumin"]["status"], "critical")   # <= half the lower limit
+        self.assertEqual(self.latest["Glucose"]["status"], "normal")     # no reference range
+
+    def test_latest_and_previous(self):
+        alt = self.latest["ALT"]
+        self.assertEqual((alt["value"], alt["previousValue"], alt["date"]), (200, 40, "2025-02-01"))
+        self.assertEqual(self.latest["Total Bilirubin"]["previousValue"], 1)
+        self.assertIsNone(self.latest["Albumin"]["previousValue"])
+        # Unparseable values are skipped
+        self.assertIsNone(self.latest["Glucose"]["previousValue"])
+
+    def test_priority_order_and_series(self):
+        self.assertEqual([row["name"] for row in self.frame.latest()], ["ALT", "Total Bilirubin", "Albumin", "Glucose"])
+        alt_chart = self.frame.chart()[0]
+        self.assertEqual([point["date"] for point in alt_chart["data"]], ["2025-01-01", "2025-02-01"])
+        alt_track = self.frame.track()[0]
+        self.assertEqual(alt_track["referenceRange"], {"min": 7, "max": 56})
+        self.assertEqual(alt_track["values"][-1], {"t": "2025-02-01T00:00:00", "value": 200})
+
+    def test_empty_input(self):
+        for labs in (None, [], [{"biomarker": "ALT", "values": []}]):
+            frame = lab_engine.LabFrame(labs)
+            self.assertEqual(len(frame), 0)
+            self.assertEqual((frame.latest(), frame.chart(), frame.track()), ([], [], []))
+
+
+class RunContextLabFrameTest(unittest.TestCase):
+    def run_context(self, lab_files, generated_labs):
+        raw_objects = [{"source_file": name, "type": "lab", "content": "..."} for name in lab_files]
+        return board_context.PatientRunContext(None, "PT-LAB", raw_objects, {}, LABS, generated_labs)
+
+    def test_generated_labs_use_the_engine(self):
+        run_context = self.run_context(["lab_report_0_2025-01-01.png"], ["lab_report_0_2025-01-01.txt"])
+        self.assertIsNotNone(run_context.lab_frame())
+
+    def test_lab_not_in_the_manifest_uses_the_model(self):
+        # Named like a generated report, but raw_data.json doesn't list it
+        run_context = self.run_context(
+            ["lab_report_0_2025-01-01.png", "lab_report_7_2025-03-01.png"],
+            ["lab_report_0_2025-01-01.txt"]
+        )
+        self.assertIsNone(run_context.lab_frame())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import blob_cache
+import bucket_ops
+import llm_cache
+
+
+class ShouldCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = llm_cache.LLMResponseCache(store=None, ttl_seconds=60, max_temperature=0.3)
+
+    def test_only_opted_in_calls_are_cached(self):
+        config = SimpleNamespace(temperature=0.1)
+        self.assertFalse(self.cache.should_cache(config))
+        self.assertTrue(self.cache.should_cache(config, use_cache=True))
+
+    def test_hot_or_bypassed_calls_are_not_cached(self):
+        self.assertFalse(self.cache.should_cache(SimpleNamespace(temperature=0.9), use_cache=True))
+        with llm_cache.bypass_cache():
+            self.assertFalse(self.cache.should_cache(SimpleNamespace(temperature=0.1), use_cache=True))
+
+
+class DiskCacheStoreTest(unittest.TestCase):
+    def test_overwrite_does_not_grow_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = llm_cache.DiskCacheStore(directory, max_bytes=1024 * 1024)
+            for _ in range(5):
+                store.set("ab" * 32, {"text": "x" * 100})
+            self.assertEqual(store._size, os.path.getsize(store._path("ab" * 32)))
+
+            store.delete("ab" * 32)
+            self.assertEqual(store._size, 0)
+
+
+class BucketCacheStoreTest(unittest.TestCase):
+    def test_entries_bypass_the_blob_lru(self):
+        lru = blob_cache.BlobLRUCache(max_bytes=1024 * 1024)
+        manager = bucket_ops.CachedBucketManager(bucket_ops.InMemoryBucketManager("test"), lru)
+        store = llm_cache.BucketCacheStore(manager, max_bytes=1024 * 1024)
+
+        store.set("key", {"text": "hello"})
+        self.assertEqual(store.get("key"), {"text": "hello"})
+        self.assertEqual(lru.stats()["entries"], 0)
+
+    def test_size_cap_evicts_oldest_entries(self):
+        backend = bucket_ops.InMemoryBucketManager("test")
+        store = llm_cache.BucketCacheStore(backend, max_bytes=1000)
+        for i in range(10):
+            store.set(f"key{i}", {"text": "x" * 200})
+
+        remaining = backend.list_files_with_metadata("llm_cache")
+        self.assertLessEqual(sum(meta["size"] for meta in remaining.values()), 1000)
+        self.assertIn("key9.json", remaining)
+        self.assertNotIn("key0.json", remaining)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+
+import rate_limiter
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_reserve_waits_once_the_burst_is_spent(self):
+        bucket = rate_limiter.TokenBucket(60)  # one per second
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0, places=2)
+
+    def test_adjust_refunds_an_overestimate(self):
+        bucket = rate_limiter.TokenBucket(600)
+        bucket.reserve(600)
+        bucket.adjust(300)
+        self.assertEqual(bucket.reserve(300), 0.0)
+
+
+class ModelLimiterTest(unittest.TestCase):
+    def test_concurrency_never_exceeds_the_cap(self):
+        limiter = rate_limiter.ModelLimiter("model", max_concurrency=3)
+        peak = {"now": 0, "max": 0}
+
+        async def request():
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.01)
+            peak["now"] -= 1
+            return SimpleNamespace(usage_metadata=None)
+
+        async def run():
+            await asyncio.gather(*(limiter.call(request) for _ in range(12)))
+
+        asyncio.run(run())
+        self.assertEqual(peak["max"], 3)
+        self.assertEqual(limiter.stats()["calls"], 12)
+
+    def test_aimd_halves_on_quota_errors_and_grows_back(self):
+        limiter = rate_limiter.ModelLimiter("model", max_concurrency=8, backoff_base=0, backoff_max=0)
+        outcomes = [QuotaError(), QuotaError()]
+
+        async def request():
+            if outcomes:
+                raise outcomes.pop(0)
+            return SimpleNamespace(usage_metadata=None)
+
+        async def run():
+            await limiter.call(request)
+            limits = [limiter.stats()["concurrency_limit"]]
+            # Additive increase: one slot per window of `limit` successes
+            for _ in range(2 + 3):
+                await limiter.call(request)
+            limits.append(limiter.stats()["concurrency_limit"])
+            return limits
+
+        self.assertEqual(asyncio.run(run()), [2, 4])
+        self.assertEqual(limiter.stats()["quota_errors"], 2)
+
+    def test_non_retryable_errors_propagate(self):
+        limiter = rate_limiter.ModelLimiter("model", max_concurrency=2)
+
+        async def request():
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(limiter.call(request))
+        self.assertEqual(limiter.stats()["failures"], 1)
+        self.assertEqual(limiter.stats()["retries"], 0)
+
+    def test_token_bucket_throttles_calls(self):
+        limiter = rate_limiter.ModelLimiter("model", max_concurrency=4, tpm=600)
+
+        async def request():
+            return SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=600, candidates_token_count=0))
+
+        async def run():
+            await limiter.call(request, estimated_tokens=600)
+            with mock.patch("asyncio.sleep") as sleep:
+                await limiter.call(request, estimated_tokens=300)
+            return sleep.call_args[0][0]
+
+        # 300 tokens at 600/minute refill is ~30 s of waiting
+        self.assertAlmostEqual(asyncio.run(run()), 30.0, delta=0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
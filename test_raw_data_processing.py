@@ -0,0 +1,101 @@
+import json
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import bucket_ops
+import my_agents
+
+BASE = "patient_data/PT-OCR"
+
+
+def make_agent():
+    """
+    RawDataProcessing on a private in-memory bucket; every model call is an
+    OCR call returning the image bytes as its text.
+    """
+    agent = my_agents.RawDataProcessing()
+    agent.gcs = bucket_ops.AsyncBucketManager(bucket_ops.InMemoryBucketManager("test"))
+    calls = []
+
+    async def generate_content(model, contents, config, **kwargs):
+        image = contents[1].inline_data.data
+        calls.append(image)
+        return SimpleNamespace(text=json.dumps({"type": "scan", "content": image.decode("utf-8")}))
+
+    agent.generate_content = generate_content
+    return agent, calls
+
+
+def write(agent, name, data):
+    agent.gcs.sync.create_file_from_string(data, f"{BASE}/raw_data/{name}")
+
+
+def parsed(agent):
+    records = json.loads(agent.gcs.sync.read_file_as_string(f"{BASE}/parsed_raw_data.json"))
+    return {record["source_file"]: record for record in records}
+
+
+def process(agent, **kwargs):
+    return asyncio.run(agent.process_raw_data("PT-OCR", **kwargs))
+
+
+class ProcessRawDataTest(unittest.TestCase):
+    def test_unchanged_patient_makes_no_model_calls(self):
+        agent, calls = make_agent()
+        write(agent, "a.png", b"first")
+        write(agent, "b.png", b"second")
+        self.assertEqual(process(agent)["processed"], 2)
+
+        del calls[:]
+        result = process(agent)
+        self.assertEqual(calls, [])
+        self.assertEqual(result, {"processed": 0, "reused": 2, "ground_truth": 0, "failed": []})
+
+    def test_changed_file_is_ocrd_once(self):
+        agent, calls = make_agent()
+        write(agent, "a.png", b"first")
+        write(agent, "b.png", b"second")
+        process(agent)
+
+        del calls[:]
+        write(agent, "b.png", b"second, rescanned")
+        result = process(agent)
+        self.assertEqual(calls, [b"second, rescanned"])
+        self.assertEqual((result["processed"], result["reused"]), (1, 1))
+        self.assertEqual(parsed(agent)["b.png"]["content"], "second, rescanned")
+
+    def test_removed_file_drops_out(self):
+        agent, calls = make_agent()
+        write(agent, "a.png", b"first")
+        write(agent, "b.png", b"second")
+        process(agent)
+
+        agent.gcs.sync.delete_file(f"{BASE}/raw_data/b.png")
+        process(agent)
+        self.assertEqual(list(parsed(agent)), ["a.png"])
+        manifest = json.loads(agent.gcs.sync.read_file_as_string(f"{BASE}/ocr_manifest.json"))
+        self.assertEqual(list(manifest["files"]), ["a.png"])
+
+    def test_ground_truth_siblings_skip_ocr(self):
+        agent, calls = make_agent()
+        write(agent, "encounter_report_0_2025-01-01.png", b"photo")
+        write(agent, "encounter_report_0_2025-01-01.txt", "Encounter text")
+        write(agent, "referral_letter.png", b"photo")
+        write(agent, "referral_letter.txt", "Dear colleague")
+        write(agent, "upload.png", b"patient upload")
+        agent.gcs.sync.create_file_from_string(json.dumps({
+            "encounter_reports": [{"file": "encounter_report_0_2025-01-01.txt", "encounter_report_text": "Encounter text"}]
+        }), f"{BASE}/raw_data.json")
+
+        result = process(agent, use_ground_truth=True)
+        self.assertEqual(calls, [b"patient upload"])
+        self.assertEqual(result["ground_truth"], 2)
+        records = parsed(agent)
+        self.assertEqual(records["encounter_report_0_2025-01-01.png"]["type"], "encounter")
+        self.assertEqual(records["encounter_report_0_2025-01-01.png"]["content"], "Encounter text")
+        self.assertEqual(records["referral_letter.png"], {"type": "referral", "content": "Dear colleague", "source_file": "referral_letter.png"})
+
+
+if __name__ == "__main__":
+    unittest.main()